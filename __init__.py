@@ -2,98 +2,209 @@
 # encoding: utf-8
 import unittest
 import pytest
+import atexit
 import json
 import os
+from collections import OrderedDict
 from selenium import webdriver
 from selenium.webdriver import ActionChains
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.chrome.options import Options
 import platform
-from common.logger import *
+from uitester.common.logger import *
+from uitester.common.browser_pool import BrowserPool
+from uitester.common.session_cache import SessionCache
+from uitester.common.timeouts import TimeoutManager, WAIT_STATS
+from uitester.common.profiler import PROFILER
+from uitester.common.launch_profiles import get_profile
+from uitester.common.artifacts import ARTIFACTS
+from uitester.common.replay import RECORD_REPLAY
+from uitester.page.finder import LOOKUP_STATS
+from uitester.page.actions import ActionBatch
+from uitester.page.readiness import wait_for_ready, READY_STATS
+from uitester.page.source import extract_source, iter_page_source, save_page_source
+from uitester.page.tabs import TabManager
+from uitester.page import native_str
 
 
 class UIFrame(unittest.TestCase):
     # UI自动化用例基类
+    # 进程内共享的浏览器池, 按启动配置区分, 测试类之间复用driver, 会话结束时统一关闭
+    browser_pools = {}
+    # 单个driver最多被多少个测试类复用, 设为1即每个测试类使用新的浏览器
+    pool_max_uses = 20
+    # 登录态缓存, 首次UI登录后保存, 之后的用例和复用的浏览器直接注入
+    session_cache = SessionCache()
+    # 并行执行时由 common.parallel 设置 UITESTER_HEADLESS=1
+    # 直接调用 driver 查找元素时的 implicit wait; BasePage 的显式等待期间由 TimeoutManager 临时置0
+    implicit_wait = 10
+    headless_flag = os.environ.get('UITESTER_HEADLESS', '') not in ('', '0')
+    # 浏览器启动配置: 'full' / 'fast' / 'debug' 或 LaunchProfile 对象, 为 None 时读取 UITESTER_LAUNCH_PROFILE
+    launch_profile = None
+    # get 后等待页面就绪, 含义同 BasePage 的同名属性, 默认关闭
+    wait_ready = False
+    ready_timeout = 10
+    ready_idle = 0.5
+    ready_hooks = []
 
     @classmethod
     def setUpClass(cls, headless_flag=False):
-        if platform.system() != 'Windows':
-            pytest.skip('ui自动化用例仅在windows环境执行', allow_module_level=True)
+        cls.headless_flag = cls.headless_flag or headless_flag or get_profile(cls.launch_profile).headless
+        if platform.system() != 'Windows' and not cls.headless_flag and not RECORD_REPLAY.replaying:
+            pytest.skip('ui自动化用例仅在windows环境或无头模式下执行', allow_module_level=True)
         LOG_DEBUG('初始化环境')
         cls.read_config()
-        chrome_options = Options()
-        if headless_flag:
-            chrome_options.add_argument('--headless')
-        chrome_options.add_argument('--disable-gpu')
-        chrome_options.add_argument('-start-maximized')
+        cls.index_url = r'https://something'
         try:
-            cls.driver = webdriver.Chrome(options=chrome_options)
+            cls.driver = cls.get_browser_pool().lease(cls.index_url)
+            TabManager.of(cls.driver).reset()
         except Exception as e:
             LOG_DEBUG(e)
             LOG_DEBUG('Chrome启动失败，此环境不可进行UI自动化，自动跳过所有UI自动化用例')
             pytest.skip('此环境异常，无法进行UI自动化', allow_module_level=True)
-        cls.driver.implicitly_wait(10)
-        cls.index_url = r'https://something'
-        cls.driver.get(cls.index_url)
 
     @classmethod
     def tearDownClass(cls):
         LOG_DEBUG('清除环境')
+        LOG_DEBUG('元素查找统计: {}'.format(LOOKUP_STATS.summary()))
+        LOG_DEBUG(lambda: '等待耗时最长的定位: {}'.format(WAIT_STATS.top(5)))
+        LOG_DEBUG(lambda: '就绪耗时最长的页面: {}'.format(READY_STATS.top(5)))
         try:
-            cls.driver.quit()
-            os.system('taskkill /F /im chrome.exe')
-            os.system('taskkill /F /im chromedriver.exe')
+            cls.get_browser_pool().release(cls.driver)
         except Exception as e:
             LOG_ERROR(e)
+        ARTIFACTS.flush()
+        LOG_FLUSH()
+
+    @classmethod
+    def create_driver(cls):
+        profile = get_profile(cls.launch_profile)
+        if RECORD_REPLAY.replaying:
+            # UITESTER_REPLAY: 不启动浏览器, 之后的命令按录制的磁带回放
+            driver = RECORD_REPLAY.replay_driver()
+        else:
+            LOG_DEBUG('启动浏览器, 启动配置: {}'.format(profile))
+            # UITESTER_RECORD: 录制之后发出的所有命令, 未开启时原样返回
+            driver = RECORD_REPLAY.record(webdriver.Chrome(options=profile.options(headless=cls.headless_flag)))
+        profile.apply(driver)
+        # implicit wait 由 TimeoutManager 统一管理, BasePage 显式等待期间会临时置0
+        TimeoutManager.of(driver).set_implicit_wait(cls.implicit_wait)
+        # UITESTER_PROFILE=1 时记录每条命令的耗时, 未开启时原样返回
+        return PROFILER.instrument(driver)
+
+    @classmethod
+    def get_browser_pool(cls):
+        key = (get_profile(cls.launch_profile).name, cls.headless_flag)
+        pool = UIFrame.browser_pools.get(key)
+        if pool is None:
+            pool = UIFrame.browser_pools[key] = BrowserPool(cls.create_driver, max_uses=cls.pool_max_uses)
+            atexit.register(pool.shutdown)
+        return pool
 
     def setUp(self, auto_login=True, username='', pwd=''):
+        PROFILER.begin_test(self.id())
+        RECORD_REPLAY.begin_test(self.driver, self.id())
         if auto_login:
             if self.index_page.check_login_success():
                 LOG_DEBUG('当前已处于登录状态')
+            elif self.restore_session(username):
+                LOG_DEBUG('已通过登录态缓存恢复登录')
             else:
                 LOG_DEBUG('当前未登录,开始自动登录')
                 self.user_login(username=username, pwd=pwd)
+                self.session_cache.save(self.driver, username)
+
+    def restore_session(self, username):
+        # 注入缓存的登录态, 校验失败时清除缓存, 由调用方回退到UI登录
+        if not self.session_cache.restore(self.driver, username):
+            return False
+        if self.index_page.check_login_success():
+            return True
+        LOG_DEBUG('登录态缓存已失效, 用户: {}'.format(username))
+        self.session_cache.invalidate(username)
+        return False
 
     def tearDown(self):
-        pass
+        PROFILER.end_test()
 
     @classmethod
     def read_config(cls):
         pass
 
-    def get(self, url):
+    def get(self, url, wait_ready=None):
+        """
+        :param wait_ready: 是否等待页面就绪, 默认使用类属性 wait_ready
+        :return: type: bool 页面是否就绪, 不等待时为 True
+        """
+        launch_url = self._launch_url(url)
+        # UIFrame.driver.get(launch_url)
+        if not (self.wait_ready if wait_ready is None else wait_ready):
+            self.driver.get(launch_url)
+            LOG_DEBUG('页面跳转到: {}'.format(launch_url))
+            return True
+        ready = wait_for_ready(self.driver, launch_url, lambda: self.driver.get(launch_url),
+                               timeout=self.ready_timeout, idle=self.ready_idle, hooks=self.ready_hooks)
+        LOG_DEBUG('页面跳转到: {}'.format(launch_url))
+        return ready
+
+    def _launch_url(self, url):
+        # 相对路径拼接到 mgr_ip 之后
         if not (url.startswith(r'http://') or url.startswith(r'https://')):
             if not url.startswith(r'/'):
                 url = '/' + url
-            launch_url = self.mgr_ip + url
-        else:
-            launch_url = url
-        # UIFrame.driver.get(launch_url)
-        self.driver.get(launch_url)
-        LOG_DEBUG('页面跳转到: {}'.format(launch_url))
+            return self.mgr_ip + url
+        return url
+
+    @property
+    def tabs(self):
+        return TabManager.of(self.driver)
+
+    def open_tabs(self, urls):
+        """
+        新建标签页并同时开始加载, 不切换当前窗口
+        :param urls: type: dict or list e.g. {'detail-1': '/detail/1', 'detail-2': '/detail/2'}, 列表时以url作为名称
+        :return: type: list 标签页名称
+        """
+        if isinstance(urls, dict):
+            urls = OrderedDict((name, self._launch_url(url)) for name, url in urls.items())
+            return self.tabs.open(urls)
+        return self.tabs.open(OrderedDict((url, self._launch_url(url)) for url in urls))
+
+    def switch_to_tab(self, name):
+        # 已在该标签页时不切换
+        return self.tabs.switch(name)
+
+    def for_each_tab(self, fn, names=None, wait=True):
+        """
+        依次切换到每个标签页执行 fn(name), 标签页已在后台并行加载
+        e.g.
+            self.open_tabs(dict(('detail-{}'.format(i), '/detail/{}'.format(i)) for i in range(10)))
+            titles = self.for_each_tab(lambda name: self.get_title())
+            self.close_tabs()
+        :return: type: OrderedDict 名称 -> fn 的返回值, fn 抛错时为异常对象
+        """
+        return self.tabs.for_each_tab(fn, names=names, wait=wait, timeout=self.ready_timeout)
+
+    def close_tabs(self, names=None):
+        # 关闭标签页, 默认关闭 open_tabs 打开的全部, 之后回到原窗口
+        self.tabs.close(names)
 
     def close_window(self):
         self.driver.close()
+        self.tabs.invalidate()
 
     def quit(self):
         self.driver.quit()
 
     def switch_to_new_window(self):
-        # 切换到其他窗口
+        # 切换到最后打开的其他窗口, 只有一个窗口时停留在当前窗口; 一次取句柄列表, 至多一次切换
         try:
-            window_handles = self.driver.window_handles
-            if len(window_handles) == 1:
-                self.driver.switch_to.window(window_handles[0])
-                LOG_DEBUG('切换窗口成功, 当前窗口为: {}'.format(self.get_title()))
-                return True
-            current_window_handle = self.driver.current_window_handle
-            LOG_DEBUG('当前窗口句柄为: {}, 所有句柄为: {}'.format(current_window_handle, window_handles))
-            for window_handle in window_handles:
-                if window_handle != current_window_handle:
-                    self.driver.switch_to.window(window_handle)
-                    LOG_DEBUG('切换窗口成功, 当前窗口为: {}'.format(self.get_title()))
+            handle = self.tabs.switch_to_new()
+            LOG_DEBUG(lambda: '切换窗口成功, 当前窗口为: {}, {}'.format(handle, self.get_title()))
+            return True
         except Exception as e:
             LOG_DEBUG('切换窗口失败: {}'.format(e))
+            self.tabs.invalidate()
 
     def back(self):
         LOG_DEBUG('页面回退')
@@ -109,16 +220,14 @@ class UIFrame(unittest.TestCase):
 
     def get_cookies(self):
         cookies_content = self.driver.get_cookies()
-        if isinstance(cookies_content, unicode):
-            cookies_content = cookies_content.encode('utf-8', errors='ignore')
+        cookies_content = native_str(cookies_content)
         LOG_DEBUG('获取所有cookies: {}'.format(cookies_content))
         return cookies_content
 
     def get_cookie(self, name):
         try:
             value = self.get_cookie(name)
-            if isinstance(value, unicode):
-                value = value.encode('utf-8', errors='ignore')
+            value = native_str(value)
             LOG_DEBUG('获取指定cookie: 名称: {}, 值: {}'.format(name, value))
             return value
         except Exception as e:
@@ -132,8 +241,7 @@ class UIFrame(unittest.TestCase):
     def get_alert_text(self):
         # 获取弹窗内容
         text = self.driver.switch_to.alert.text
-        if isinstance(text, unicode):
-            text = text.encode('utf-8', errors='ignore')
+        text = native_str(text)
         LOG_DEBUG('弹窗内容为: {}'.format(text))
 
     def accept_alert(self):
@@ -170,58 +278,123 @@ class UIFrame(unittest.TestCase):
             return None
 
     def scroll(self, key='end', loc=None, ele=None, strict=False, position=None, action='click'):
+        """
+        点击元素/坐标/当前位置获取焦点后按翻页键, 移动、点击和按键合并为一次 perform
+        :param key: type: str e.g. 'end', 'home', 'page_up', 'page_down'
+        """
         key_select = ['end', 'home', 'page_up', 'page_down']
         if key not in key_select:
             LOG_ERROR('参数key: {}输入错误, 可选有效参数为: {}'.format(key, key_select))
+            return
         key_map = {
             'end': Keys.END,
             'home': Keys.HOME,
             'page_up': Keys.PAGE_UP,
             'page_down': Keys.PAGE_DOWN
         }
-        if loc or ele:
-            self.move_to_element_and_click(loc=loc, ele=ele, strict=strict, action=action)
-        elif position:
-            self.move_by_offset_and_click(xoffset=position[0], yoffset=position[1], action=action)
-        else:
-            actions = ActionChains(self.driver)
+        try:
+            actions = ActionBatch(self.driver)
+            if loc or ele:
+                # UIFrame 没有显式等待的查找, 直接用 driver 查找(受 implicit wait 约束)
+                actions.move_to_element(ele or self.driver.find_element(*loc))
+            elif position:
+                actions.move_by_offset(position[0], position[1])
             if action == 'click':
                 actions.click()
             elif action == 'double_click':
                 actions.double_click()
             elif action == 'context_click':
                 actions.context_click()
-            else:
-                pass
+            actions.key_down(key_map[key])
+            actions.key_up(key_map[key])
             actions.perform()
-        actions = ActionChains(self.driver)
-        actions.key_down(key_map[key])
-        actions.key_up(key_map[key])
-        actions.perform()
-
-    def screenshot(self, filepath):
-        success_flag = self.driver.save_screenshot(filepath)
-        if success_flag:
+        except Exception as e:
+            LOG_DEBUG('ERROR [scroll]: {}'.format(e))
+            if strict:
+                raise e
+
+    def screenshot(self, filepath, wait=True):
+        """
+        截图, 图片由后台线程写入 filepath
+        :param wait: 是否等待图片写入完成后返回, False 时返回后文件可能尚未写完
+        :return: 图片路径, 截图失败返回 None
+        """
+        try:
+            filepath = ARTIFACTS.save_screenshot(self.driver, filepath)
+            if wait:
+                ARTIFACTS.flush()
             LOG_DEBUG('截图成功, 图片路径: {}'.format(filepath))
-        else:
-            LOG_DEBUG('截图失败!')
+            return filepath
+        except Exception as e:
+            LOG_DEBUG('截图失败: {}'.format(e))
+            return None
+
+    def capture_artifacts(self, name, screenshot=True, page_source=True, console=True):
+        """
+        保存当前页面现场(截图/源码/控制台日志)到 ARTIFACTS.output_dir, 用于记录步骤
+        :return: type: list 文件路径
+        """
+        return ARTIFACTS.capture(self.driver, name, screenshot=screenshot, page_source=page_source, console=console)
 
     def get_cur_url(self):
         cur_url = self.driver.current_url
         LOG_DEBUG('当前url为: {}'.format(cur_url))
         return cur_url
 
-    def get_page_source(self):
+    def get_page_source(self, loc=None, ele=None, mode='html'):
+        """
+        获取页面源码
+        :param loc: 传入 loc 或 ele 时只在页面内提取该元素子树, 不传输整页
+        :param ele:
+        :param mode: type: str e.g. 'html': outerHTML, 'text': 可见文本
+        :return: utf-8 编码的内容, 失败返回 ''
+        """
         try:
-            page_content = self.driver.page_source
+            if not (loc or ele) and mode == 'html':
+                page_content = self.driver.page_source
+            else:
+                page_content = extract_source(self.driver, loc=loc, ele=ele, mode=mode)
+                if page_content is None:
+                    LOG_DEBUG('页面未找到元素: {}'.format(loc))
+                    return ''
             LOG_DEBUG('获取当前页面源码成功')
-            if isinstance(page_content, unicode):
-                page_content = page_content.encode('utf-8', errors='ignore')
+            page_content = native_str(page_content)
             return page_content
         except Exception as e:
-            LOG_DEBUG('获取当前页面源码失败')
+            LOG_DEBUG('获取当前页面源码失败: {}'.format(e))
             return ''
 
+    def get_dom_snapshot(self, loc=None, ele=None, max_depth=None, max_text=200, max_nodes=5000):
+        """
+        在页面内生成精简的结构快照, 只包含标签/id/class/自身文本, 比整页源码小得多
+        :return: type: list of dict e.g. [{'tag': 'div', 'depth': 0, 'id': 'app', 'class': 'main', 'text': '...'}]
+        """
+        try:
+            nodes = extract_source(self.driver, loc=loc, ele=ele, mode='snapshot', max_depth=max_depth,
+                                   max_text=max_text, max_nodes=max_nodes)
+            LOG_DEBUG(lambda: '获取页面结构快照 loc: {}, 节点数: {}'.format(loc, len(nodes or [])))
+            return nodes or []
+        except Exception as e:
+            LOG_DEBUG('ERROR [get_dom_snapshot]: {}'.format(e))
+            return []
+
+    def iter_page_source(self, chunk_size=256 * 1024):
+        # 分段读取整页源码, 逐段返回 utf-8 编码的内容
+        return iter_page_source(self.driver, chunk_size)
+
+    def save_page_source(self, filepath, chunk_size=256 * 1024):
+        """
+        分段读取整页源码并写入文件, 不在内存中拼接整页内容
+        :return: 写入的字节数, 失败返回 0
+        """
+        try:
+            written = save_page_source(self.driver, filepath, chunk_size)
+            LOG_DEBUG('保存页面源码成功: {}, 大小: {}'.format(filepath, written))
+            return written
+        except Exception as e:
+            LOG_DEBUG('ERROR [save_page_source]: {}'.format(e))
+            return 0
+
     def get_attribute(self, name, loc=None, ele=None, strict=False):
         if not (loc or ele):
             LOG_ERROR('loc: {}, ele: {}, 请至少输入一个有效参数!'.format(loc, ele))
@@ -230,9 +403,8 @@ class UIFrame(unittest.TestCase):
                 ele = self.find_element(loc, strict=strict)
         try:
             value = ele.get_attribute(name)
-            if isinstance(value, unicode):
-                value = value.encode('utf-8', errors='ignore')
-            LOG_DEBUG('获取元素 loc: {} ,location: {} ,属性名: {},属性值: {}'.format(loc, ele.location, name, value))
+            value = native_str(value)
+            LOG_DEBUG(lambda: '获取元素 loc: {} ,location: {} ,属性名: {},属性值: {}'.format(loc, ele.location, name, value))
             return value
         except Exception as e:
             LOG_DEBUG('ERROR [get_attribute]: {}'.format(e))
@@ -252,9 +424,8 @@ class UIFrame(unittest.TestCase):
                 ele = self.find_element(loc, strict=strict)
         try:
             text = ele.text
-            if isinstance(text, unicode):
-                text = text.encode('utf-8', errors='ignore')
-            LOG_DEBUG('元素 loc: {} ,location: {}, 获取文本信息为: {}'.format(loc, ele.location, text))
+            text = native_str(text)
+            LOG_DEBUG(lambda: '元素 loc: {} ,location: {}, 获取文本信息为: {}'.format(loc, ele.location, text))
             return text
         except Exception as e:
             LOG_DEBUG('获取文本信息失败: {}'.format(e))
@@ -262,14 +433,12 @@ class UIFrame(unittest.TestCase):
 
     def get_title(self):
         title_content = self.driver.title
-        if isinstance(title_content, unicode):
-            title_content = title_content.encode('utf-8', errors='ignore')
+        title_content = native_str(title_content)
         LOG_DEBUG('获取当前页标题: {}'.format(title_content))
         return title_content
 
     def get_current_url(self):
         current_url = self.driver.current_url
-        if isinstance(current_url, unicode):
-            current_url = current_url.encode('utf-8', errors='ignore')
+        current_url = native_str(current_url)
         LOG_DEBUG('当前url为: {}'.format(current_url))
         return current_url
@@ -0,0 +1,3 @@
+#!/usr/bin/env python
+# encoding: utf-8
+# 框架开销基准: python -m uitester.benchmark.run --help
@@ -0,0 +1,659 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+进程内的假 WebDriver: 解析 fixtures 下的静态页面构造简易DOM, 所有操作都经过 execute(command, params),
+每条命令可配置固定延迟, 用于在没有浏览器和网络的环境下衡量框架自身的开销和命令数
+"""
+import itertools
+import os
+import re
+import time
+try:
+    from html.parser import HTMLParser
+except ImportError:
+    from HTMLParser import HTMLParser
+try:
+    from urllib.parse import urljoin, urlparse
+except ImportError:
+    from urlparse import urljoin, urlparse
+from selenium.common.exceptions import NoSuchElementException, NoAlertPresentException, \
+    StaleElementReferenceException, TimeoutException
+from selenium.webdriver.remote.webelement import WebElement
+from uitester.page import scripts
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'fixtures')
+VOID_TAGS = ('area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'wbr')
+ALERT_RE = re.compile(r'''(?:alert|confirm|prompt)\(['"](.*?)['"]\)''')
+CSS_TOKEN_RE = re.compile(r'''([#.]?[\w-]+|\*|\[\s*[\w-]+\s*(?:[*^$~]?=\s*["']?[^"'\]]*["']?\s*)?\])''')
+XPATH_STEP_RE = re.compile(r'''(//|/)([\w*-]+)((?:\[[^\]]+\])*)''')
+
+
+class Node(object):
+    def __init__(self, tag, attrs, parent):
+        self.tag = tag
+        self.attrs = dict((name, value if value is not None else '') for name, value in attrs)
+        self.parent = parent
+        self.content = []
+        self.value = self.attrs.get('value', '')
+        self.checked = 'checked' in self.attrs
+        self.selected = 'selected' in self.attrs
+
+    @property
+    def children(self):
+        return [item for item in self.content if isinstance(item, Node)]
+
+    @property
+    def text(self):
+        parts = []
+        for item in self.content:
+            parts.append(item.text if isinstance(item, Node) else item)
+        return re.sub(r'\s+', ' ', ''.join(parts)).strip()
+
+    def descendants(self):
+        for child in self.children:
+            yield child
+            for node in child.descendants():
+                yield node
+
+    def ancestors(self):
+        node = self.parent
+        while node is not None:
+            yield node
+            node = node.parent
+
+    @property
+    def displayed(self):
+        for node in itertools.chain([self], self.ancestors()):
+            style = node.attrs.get('style', '').replace(' ', '')
+            if node.tag == 'head' or 'hidden' in node.attrs or 'display:none' in style:
+                return False
+        return True
+
+    def has_class(self, name):
+        return name in self.attrs.get('class', '').split()
+
+
+class _DomParser(HTMLParser):
+    def __init__(self):
+        HTMLParser.__init__(self)
+        self.root = Node('#document', [], None)
+        self.stack = [self.root]
+
+    def handle_starttag(self, tag, attrs):
+        node = Node(tag, attrs, self.stack[-1])
+        self.stack[-1].content.append(node)
+        if tag not in VOID_TAGS:
+            self.stack.append(node)
+
+    def handle_startendtag(self, tag, attrs):
+        node = Node(tag, attrs, self.stack[-1])
+        self.stack[-1].content.append(node)
+
+    def handle_endtag(self, tag):
+        for index in range(len(self.stack) - 1, 0, -1):
+            if self.stack[index].tag == tag:
+                del self.stack[index:]
+                break
+
+    def handle_data(self, data):
+        self.stack[-1].content.append(data)
+
+
+def parse_html(source):
+    parser = _DomParser()
+    parser.feed(source)
+    parser.close()
+    return parser.root
+
+
+def _match_css_compound(node, compound):
+    for token in CSS_TOKEN_RE.findall(compound):
+        if token == '*':
+            continue
+        if token.startswith('#'):
+            if node.attrs.get('id') != token[1:]:
+                return False
+        elif token.startswith('.'):
+            if not node.has_class(token[1:]):
+                return False
+        elif token.startswith('['):
+            match = re.match(r'''\[\s*([\w-]+)\s*(?:([*^$~]?=)\s*["']?([^"'\]]*)["']?\s*)?\]''', token)
+            name, operator, expected = match.groups()
+            actual = node.attrs.get(name)
+            if actual is None:
+                return False
+            if operator == '=' and actual != expected:
+                return False
+            if operator == '*=' and expected not in actual:
+                return False
+            if operator == '^=' and not actual.startswith(expected):
+                return False
+            if operator == '$=' and not actual.endswith(expected):
+                return False
+            if operator == '~=' and expected not in actual.split():
+                return False
+        elif node.tag != token.lower():
+            return False
+    return True
+
+
+def css_select(root, selector):
+    # 支持复合选择器和后代/子代组合, 满足基准页面的需要
+    results = []
+    for part in selector.split(','):
+        steps = re.findall(r'\s*(>)?\s*([^\s>]+)', part.strip())
+        candidates = [root]
+        for combinator, compound in steps:
+            matched = []
+            for parent in candidates:
+                pool = parent.children if combinator else parent.descendants()
+                matched.extend(node for node in pool if _match_css_compound(node, compound) and node not in matched)
+            candidates = matched
+        results.extend(node for node in candidates if node not in results)
+    return results
+
+
+def _match_xpath_predicate(node, predicate, position):
+    predicate = predicate.strip()
+    if predicate.isdigit():
+        return position == int(predicate)
+    match = re.match(r'''^@([\w-]+)\s*=\s*["'](.*)["']$''', predicate)
+    if match:
+        return node.attrs.get(match.group(1)) == match.group(2)
+    match = re.match(r'''^contains\(\s*(@[\w-]+|text\(\)|\.)\s*,\s*["'](.*)["']\s*\)$''', predicate)
+    if match:
+        source = match.group(1)
+        actual = node.attrs.get(source[1:], '') if source.startswith('@') else node.text
+        return match.group(2) in actual
+    match = re.match(r'''^(?:text\(\)|normalize-space\(\.?\))\s*=\s*["'](.*)["']$''', predicate)
+    if match:
+        return node.text == match.group(1)
+    match = re.match(r'^@([\w-]+)$', predicate)
+    if match:
+        return match.group(1) in node.attrs
+    raise NotImplementedError('unsupported xpath predicate: {}'.format(predicate))
+
+
+def xpath_select(root, expression):
+    # 支持 / 和 // 步骤、属性/文本/下标谓词, 满足基准页面的需要
+    expression = expression.strip()
+    if expression.startswith('.'):
+        expression = expression[1:]
+    candidates = [root]
+    for axis, tag, predicates in XPATH_STEP_RE.findall(expression):
+        matched = []
+        for parent in candidates:
+            pool = parent.children if axis == '/' else list(parent.descendants())
+            pool = [node for node in pool if tag == '*' or node.tag == tag]
+            for predicate in re.findall(r'\[([^\]]+)\]', predicates):
+                pool = [node for position, node in enumerate(pool, 1)
+                        if _match_xpath_predicate(node, predicate, position)]
+            matched.extend(node for node in pool if node not in matched)
+        candidates = matched
+    return candidates
+
+
+def locate(root, by, value):
+    nodes = list(root.descendants())
+    if by == 'id':
+        return [node for node in nodes if node.attrs.get('id') == value]
+    if by == 'name':
+        return [node for node in nodes if node.attrs.get('name') == value]
+    if by == 'tag name':
+        return [node for node in nodes if node.tag == value]
+    if by == 'class name':
+        return [node for node in nodes if node.has_class(value)]
+    if by == 'link text':
+        return [node for node in nodes if node.tag == 'a' and node.text == value]
+    if by == 'partial link text':
+        return [node for node in nodes if node.tag == 'a' and value in node.text]
+    if by == 'xpath':
+        return xpath_select(root, value)
+    return css_select(root, value)
+
+
+class FakeElement(WebElement):
+    # 继承 WebElement 以通过 Select/ActionChains 的类型检查, 命令全部转发到 FakeWebDriver.execute
+    def __init__(self, parent, node, element_id):
+        self._parent = parent
+        self._node = node
+        self._id = element_id
+        self._w3c = True
+
+    def __eq__(self, other):
+        return isinstance(other, FakeElement) and other.id == self.id
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def _execute(self, command, params=None):
+        params = dict(params or {})
+        params['id'] = self.id
+        return self._parent.execute(command, params)
+
+    @property
+    def tag_name(self):
+        return self._execute('getElementTagName')['value']
+
+    @property
+    def text(self):
+        return self._execute('getElementText')['value']
+
+    @property
+    def location(self):
+        return self._execute('getElementRect')['value']
+
+    @property
+    def size(self):
+        rect = self._execute('getElementRect')['value']
+        return {'width': rect['width'], 'height': rect['height']}
+
+    @property
+    def rect(self):
+        return self._execute('getElementRect')['value']
+
+    def get_attribute(self, name):
+        return self._execute('getElementAttribute', {'name': name})['value']
+
+    def get_property(self, name):
+        return self._execute('getElementProperty', {'name': name})['value']
+
+    def is_displayed(self):
+        return self._execute('isElementDisplayed')['value']
+
+    def is_enabled(self):
+        return self._execute('isElementEnabled')['value']
+
+    def is_selected(self):
+        return self._execute('isElementSelected')['value']
+
+    def click(self):
+        self._execute('clickElement')
+
+    def clear(self):
+        self._execute('clearElement')
+
+    def send_keys(self, *value):
+        self._execute('sendKeysToElement', {'text': ''.join(value)})
+
+    def submit(self):
+        self._execute('submitElement')
+
+    def find_element(self, by='id', value=None):
+        return self._execute('findChildElement', {'using': by, 'value': value})['value']
+
+    def find_elements(self, by='id', value=None):
+        return self._execute('findChildElements', {'using': by, 'value': value})['value']
+
+
+class _FakeAlert(object):
+    def __init__(self, driver):
+        self.driver = driver
+
+    @property
+    def text(self):
+        return self.driver.execute('getAlertText')['value']
+
+    def accept(self):
+        self.driver.execute('acceptAlert')
+
+    def dismiss(self):
+        self.driver.execute('dismissAlert')
+
+    def send_keys(self, text):
+        self.driver.execute('setAlertValue', {'text': text})
+
+
+class _FakeSwitchTo(object):
+    def __init__(self, driver):
+        self.driver = driver
+
+    @property
+    def alert(self):
+        self.driver.execute('getAlertText')
+        return _FakeAlert(self.driver)
+
+    def window(self, handle):
+        self.driver.execute('switchToWindow', {'handle': handle})
+
+    def frame(self, reference):
+        self.driver.execute('switchToFrame', {'id': reference})
+
+    def parent_frame(self):
+        self.driver.execute('switchToParentFrame')
+
+    def default_content(self):
+        self.driver.execute('switchToFrame', {'id': None})
+
+
+class FakeWebDriver(object):
+    """
+    :param latency: 每条命令的默认延迟(秒), 模拟 chromedriver 的 HTTP 往返
+    :param command_latency: 按命令名覆盖延迟 e.g. {'get': 0.05}
+    """
+
+    def __init__(self, fixture_dir=FIXTURE_DIR, latency=0.0, command_latency=None):
+        self.fixture_dir = fixture_dir
+        self.latency = latency
+        self.command_latency = command_latency or {}
+        self.session_id = 'fake-session'
+        self.w3c = True
+        self.switch_to = _FakeSwitchTo(self)
+        self.commands = 0
+        self._ids = itertools.count(1)
+        self._elements = {}
+        self._history = []
+        self._position = -1
+        self._alert = None
+        self._cookies = {}
+        self._root = parse_html('<html></html>')
+        self._url = 'about:blank'
+        self._handlers = {
+            'get': self._get, 'refresh': self._refresh, 'goBack': self._back, 'goForward': self._forward,
+            'getTitle': self._title, 'getCurrentUrl': lambda params: self._url,
+            'getPageSource': self._page_source, 'findElement': self._find_element,
+            'findElements': self._find_elements, 'findChildElement': self._find_element,
+            'findChildElements': self._find_elements, 'getElementTagName': lambda params: self._node(params).tag,
+            'getElementText': self._element_text, 'getElementRect': self._element_rect,
+            'getElementAttribute': self._element_attribute, 'getElementProperty': self._element_attribute,
+            'isElementDisplayed': lambda params: self._node(params).displayed,
+            'isElementEnabled': lambda params: 'disabled' not in self._node(params).attrs,
+            'isElementSelected': self._element_selected, 'clickElement': self._click,
+            'clearElement': self._clear, 'sendKeysToElement': self._send_keys, 'submitElement': self._submit,
+            'executeScript': self._execute_script, 'executeAsyncScript': self._execute_async_script,
+            'getAlertText': self._alert_text, 'acceptAlert': self._close_alert, 'dismissAlert': self._close_alert,
+            'setAlertValue': lambda params: None, 'setTimeouts': lambda params: None,
+            'getCurrentWindowHandle': lambda params: 'main', 'getWindowHandles': lambda params: ['main'],
+            'switchToWindow': lambda params: None, 'switchToFrame': lambda params: None,
+            'switchToParentFrame': lambda params: None, 'getAllCookies': lambda params: list(self._cookies.values()),
+            'addCookie': self._add_cookie, 'deleteAllCookies': lambda params: self._cookies.clear(),
+            'screenshot': lambda params: '', 'actions': lambda params: None, 'quit': lambda params: None,
+            'close': lambda params: None,
+        }
+
+    def execute(self, driver_command, params=None):
+        self.commands += 1
+        delay = self.command_latency.get(driver_command, self.latency)
+        if delay:
+            time.sleep(delay)
+        return {'value': self._handlers[driver_command](params or {})}
+
+    # ---------- selenium WebDriver 接口 ----------
+    def get(self, url):
+        self.execute('get', {'url': url})
+
+    def refresh(self):
+        self.execute('refresh')
+
+    def back(self):
+        self.execute('goBack')
+
+    def forward(self):
+        self.execute('goForward')
+
+    @property
+    def title(self):
+        return self.execute('getTitle')['value']
+
+    @property
+    def current_url(self):
+        return self.execute('getCurrentUrl')['value']
+
+    @property
+    def page_source(self):
+        return self.execute('getPageSource')['value']
+
+    @property
+    def current_window_handle(self):
+        return self.execute('getCurrentWindowHandle')['value']
+
+    @property
+    def window_handles(self):
+        return self.execute('getWindowHandles')['value']
+
+    def find_element(self, by='id', value=None):
+        return self.execute('findElement', {'using': by, 'value': value})['value']
+
+    def find_elements(self, by='id', value=None):
+        return self.execute('findElements', {'using': by, 'value': value})['value']
+
+    def execute_script(self, script, *args):
+        return self.execute('executeScript', {'script': script, 'args': list(args)})['value']
+
+    def execute_async_script(self, script, *args):
+        return self.execute('executeAsyncScript', {'script': script, 'args': list(args)})['value']
+
+    def implicitly_wait(self, seconds):
+        self.execute('setTimeouts', {'implicit': seconds * 1000})
+
+    def set_script_timeout(self, seconds):
+        self.execute('setTimeouts', {'script': seconds * 1000})
+
+    def set_page_load_timeout(self, seconds):
+        self.execute('setTimeouts', {'pageLoad': seconds * 1000})
+
+    def get_cookies(self):
+        return self.execute('getAllCookies')['value']
+
+    def add_cookie(self, cookie_dict):
+        self.execute('addCookie', {'cookie': cookie_dict})
+
+    def delete_all_cookies(self):
+        self.execute('deleteAllCookies')
+
+    def save_screenshot(self, filename):
+        self.execute('screenshot')
+        return True
+
+    def get_screenshot_as_base64(self):
+        return self.execute('screenshot')['value']
+
+    def maximize_window(self):
+        pass
+
+    def close(self):
+        self.execute('close')
+
+    def quit(self):
+        self.execute('quit')
+
+    # ---------- 命令实现 ----------
+    def _load(self, url):
+        path = os.path.join(self.fixture_dir, urlparse(url).path.lstrip('/') or 'index.html')
+        with open(path, 'rb') as f:
+            self._root = parse_html(f.read().decode('utf-8'))
+        self._url = url
+        self._elements = {}
+
+    def _navigate(self, url):
+        self._load(url)
+        del self._history[self._position + 1:]
+        self._history.append(url)
+        self._position = len(self._history) - 1
+
+    def _get(self, params):
+        self._navigate(params['url'])
+
+    def _refresh(self, params):
+        self._load(self._url)
+
+    def _back(self, params):
+        if self._position > 0:
+            self._position -= 1
+            self._load(self._history[self._position])
+
+    def _forward(self, params):
+        if self._position < len(self._history) - 1:
+            self._position += 1
+            self._load(self._history[self._position])
+
+    def _title(self, params):
+        nodes = locate(self._root, 'tag name', 'title')
+        return nodes[0].text if nodes else ''
+
+    def _page_source(self, params):
+        return '<html>{}</html>'.format(''.join(node.text for node in self._root.children))
+
+    def _wrap(self, node):
+        for element_id, known in self._elements.items():
+            if known is node:
+                return FakeElement(self, node, element_id)
+        element_id = 'fake-{}'.format(next(self._ids))
+        self._elements[element_id] = node
+        return FakeElement(self, node, element_id)
+
+    def _node(self, params):
+        node = self._elements.get(params['id'])
+        if node is None:
+            raise StaleElementReferenceException('element is not attached to the page document')
+        return node
+
+    def _find_elements(self, params):
+        root = self._node(params) if 'id' in params else self._root
+        return [self._wrap(node) for node in locate(root, params['using'], params['value'])]
+
+    def _find_element(self, params):
+        elements = self._find_elements(params)
+        if not elements:
+            raise NoSuchElementException('no such element: {}={}'.format(params['using'], params['value']))
+        return elements[0]
+
+    def _element_text(self, params):
+        node = self._node(params)
+        return node.text if node.displayed else ''
+
+    def _element_rect(self, params):
+        return {'x': 0, 'y': 0, 'width': 100, 'height': 20}
+
+    def _element_attribute(self, params):
+        node, name = self._node(params), params['name']
+        if name == 'value':
+            return node.value
+        if name in ('checked', 'selected'):
+            return 'true' if getattr(node, name) else None
+        return node.attrs.get(name)
+
+    def _element_selected(self, params):
+        node = self._node(params)
+        return node.selected if node.tag == 'option' else node.checked
+
+    def _click(self, params):
+        node = self._node(params)
+        message = ALERT_RE.search(node.attrs.get('onclick', ''))
+        if message:
+            self._alert = message.group(1)
+        elif node.tag == 'a' and node.attrs.get('href'):
+            self._navigate(urljoin(self._url, node.attrs['href']))
+        elif node.tag == 'option':
+            for option in node.parent.children:
+                option.selected = option is node
+        elif node.attrs.get('type') == 'checkbox':
+            node.checked = not node.checked
+        elif node.attrs.get('type') == 'radio':
+            for other in locate(self._root, 'name', node.attrs.get('name')):
+                other.checked = other is node
+        elif node.tag == 'button' and node.attrs.get('type', 'submit') == 'submit':
+            self._submit(params)
+
+    def _clear(self, params):
+        self._node(params).value = ''
+
+    def _send_keys(self, params):
+        node = self._node(params)
+        node.value += params['text']
+
+    def _submit(self, params):
+        node = self._node(params)
+        form = node if node.tag == 'form' else next((a for a in node.ancestors() if a.tag == 'form'), None)
+        if form is not None and form.attrs.get('action'):
+            self._navigate(urljoin(self._url, form.attrs['action']))
+
+    def _alert_text(self, params):
+        if self._alert is None:
+            raise NoAlertPresentException('no such alert')
+        return self._alert
+
+    def _close_alert(self, params):
+        self._alert_text(params)
+        self._alert = None
+
+    def _add_cookie(self, params):
+        cookie = params['cookie']
+        self._cookies[cookie['name']] = cookie
+
+    def _args_nodes(self, args):
+        return [self._node({'id': arg.id}) if isinstance(arg, FakeElement) else arg for arg in args]
+
+    def _read_field(self, node, field):
+        if field.startswith('@'):
+            return self._element_attribute({'id': self._wrap(node).id, 'name': field[1:]})
+        if field == 'text':
+            return node.text if node.displayed else ''
+        if field == 'displayed':
+            return node.displayed
+        if field == 'enabled':
+            return 'disabled' not in node.attrs
+        if field == 'selected':
+            return node.selected if node.tag == 'option' else node.checked
+        if field == 'tag_name':
+            return node.tag
+        if field == 'value':
+            return node.value
+        if field in ('location', 'size'):
+            return self._element_rect({})
+        return None
+
+    def _execute_script(self, params):
+        # 只模拟框架注入的脚本, 其余脚本视为无返回值
+        script, args = params['script'], params.get('args', [])
+        if script == scripts.READ_MANY_JS:
+            by, value, elements, fields = args
+            nodes = self._args_nodes(elements) if elements else locate(self._root, by, value)
+            return [dict((field, self._read_field(node, field)) for field in fields) for node in nodes]
+        if script == scripts.FILL_FORM_JS:
+            return [self._fill(item) for item in args[0]]
+        if 'location.origin' in script:
+            parsed = urlparse(self._url)
+            return '{}://{}'.format(parsed.scheme, parsed.netloc)
+        return None
+
+    def _fill(self, item):
+        if item['element'] is not None:
+            node = self._node({'id': item['element'].id})
+        else:
+            nodes = locate(self._root, item['by'], item['value'])
+            if not nodes:
+                return 'not found'
+            node = nodes[0]
+        value, kind = item['val'], node.attrs.get('type')
+        if node.tag == 'select':
+            for option in node.children:
+                option.selected = option.attrs.get('value') == value or option.text == value
+        elif kind == 'radio' and not isinstance(value, bool):
+            for other in locate(self._root, 'name', node.attrs.get('name')):
+                other.checked = other.attrs.get('value') == str(value)
+        elif kind in ('checkbox', 'radio'):
+            node.checked = bool(value)
+        else:
+            node.value = '' if value is None else '{}'.format(value)
+        return None
+
+    def _execute_async_script(self, params):
+        script, args = params['script'], params.get('args', [])
+        if script.endswith(scripts.WAIT_FOR_READY_JS):
+            return {'ready': True, 'elapsed': 0, 'readyState': 'complete', 'inflight': 0, 'pendingHooks': []}
+        if script == scripts.WAIT_FOR_ELEMENT_JS:
+            by, value, timeout, multiple, gone = args
+            nodes = [node for node in locate(self._root, by, value)]
+            visible = bool(nodes) and nodes[0].displayed
+            if gone:
+                if visible:
+                    raise TimeoutException('script timeout')
+                return True
+            if not visible:
+                raise TimeoutException('script timeout')
+            return [self._wrap(node) for node in nodes] if multiple else self._wrap(nodes[0])
+        return None
@@ -0,0 +1,286 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+框架开销基准: 用 BasePage / UIFrame 的方法跑表单填写、表格读取、页面跳转、弹窗处理四个典型流程,
+统计每个动作的 WebDriver 命令数、耗时分位数和各流程总耗时
+    python -m uitester.benchmark.run --backend fake --latency 0.002 -n 20
+    python -m uitester.benchmark.run --backend chrome --json result.json
+    python -m uitester.benchmark.run --implicit-wait 10   # 对比非0 implicit wait 下的命令数
+fake 后端为进程内假 driver, 不需要浏览器和网络; chrome 后端为无头 Chrome 访问本地静态服务器上的同一套页面
+"""
+import argparse
+import atexit
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from selenium.webdriver.common.by import By
+try:
+    from http.server import HTTPServer, SimpleHTTPRequestHandler
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import HTTPServer
+    from SimpleHTTPServer import SimpleHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+from uitester import UIFrame
+from uitester.common.logger import *
+from uitester.common.logger import logger
+from uitester.common.timeouts import TimeoutManager
+from uitester.common.timing_store import TimingStore
+from uitester.common.profiler import PROFILER
+from uitester.common.launch_profiles import get_profile, PROFILES
+from uitester.page import BasePage
+from uitester.benchmark.fake_driver import FakeWebDriver, FIXTURE_DIR
+
+
+class FixtureRequestHandler(SimpleHTTPRequestHandler):
+    # 固定从 fixtures 目录提供文件, 不依赖当前工作目录, 也不输出访问日志
+    def translate_path(self, path):
+        path = path.split('?', 1)[0].split('#', 1)[0]
+        return os.path.join(FIXTURE_DIR, os.path.normpath(path).lstrip('/\\') or 'index.html')
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FixtureServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=0):
+        HTTPServer.__init__(self, ('127.0.0.1', port), FixtureRequestHandler)
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+
+    @property
+    def base_url(self):
+        return 'http://127.0.0.1:{}'.format(self.server_address[1])
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class CommandCounter(object):
+    # 代理 driver.execute 统计命令数, driver 和 WebElement 的命令都经过它
+    def __init__(self, driver):
+        self.count = 0
+        original = driver.execute
+
+        def execute(driver_command, params=None):
+            self.count += 1
+            return original(driver_command, params)
+
+        driver.execute = execute
+
+
+class ActionRecorder(object):
+    # 按 流程/动作 记录每次调用的耗时和命令数
+    def __init__(self, counter):
+        self.counter = counter
+        self.samples = {}
+        self.flows = {}
+
+    def __call__(self, flow, action, func, *args, **kwargs):
+        commands = self.counter.count
+        start = time.time()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            sample = (time.time() - start, self.counter.count - commands)
+            self.samples.setdefault((flow, action), []).append(sample)
+
+    def run_flow(self, flow, func, iterations):
+        for _ in range(iterations):
+            commands = self.counter.count
+            start = time.time()
+            func(self)
+            self.flows.setdefault(flow, []).append((time.time() - start, self.counter.count - commands))
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    index = min(int(round(pct / 100.0 * (len(values) - 1))), len(values) - 1)
+    return values[index]
+
+
+def _summary(samples):
+    durations = [duration * 1000 for duration, _ in samples]
+    return {
+        'calls': len(samples),
+        'commands': round(sum(commands for _, commands in samples) / float(len(samples)), 2),
+        'p50_ms': round(percentile(durations, 50), 3),
+        'p90_ms': round(percentile(durations, 90), 3),
+        'p99_ms': round(percentile(durations, 99), 3),
+    }
+
+
+class BenchFrame(UIFrame):
+    # 只借用 UIFrame 的页面级方法, 不走 setUpClass 的浏览器池和登录流程
+    def runTest(self):
+        pass
+
+
+class BenchPage(BasePage):
+    default_timeout = 2
+    # run() 中替换为临时文件上的记录
+    timing_store = None
+
+
+def form_fill(record, frame, page):
+    record('form_fill', 'get', frame.get, '/form.html')
+    for field, value in [('username', 'admin'), ('password', 'pwd@123'), ('email', 'admin@example.com'),
+                         ('phone', '13800000000'), ('remark', 'benchmark')]:
+        record('form_fill', 'text_content', page.text_content, value, loc=(By.ID, field))
+    record('form_fill', 'choice_select', page.choice_select, 'value', 'admin', loc=(By.ID, 'role'))
+    record('form_fill', 'click', page.click, loc=(By.ID, 'agree'))
+    record('form_fill', 'click', page.click, loc=(By.CSS_SELECTOR, '#level-2'))
+    record('form_fill', 'is_selected', page.is_selected, loc=(By.ID, 'agree'))
+    record('form_fill', 'click', page.click, loc=(By.ID, 'save'))
+    record('form_fill', 'get', frame.get, '/form.html')
+    record('form_fill', 'fill_form', page.fill_form, [
+        ((By.ID, 'username'), 'admin'), ((By.ID, 'password'), 'pwd@123'), ((By.ID, 'email'), 'admin@example.com'),
+        ((By.ID, 'phone'), '13800000000'), ((By.ID, 'remark'), 'benchmark'), ((By.ID, 'role'), 'admin'),
+        ((By.ID, 'agree'), True), ((By.ID, 'level-1'), '2')])
+    record('form_fill', 'click', page.click, loc=(By.ID, 'save'))
+
+
+def table_read(record, frame, page):
+    record('table_read', 'get', frame.get, '/table.html')
+    rows = record('table_read', 'find_elements', page.find_elements, (By.CSS_SELECTOR, '#users tr.row'))
+    names = record('table_read', 'find_elements', page.find_elements, (By.CSS_SELECTOR, '#users td.name'))
+    record('table_read', 'get_text[batch]', page.get_text, ele=names)
+    record('table_read', 'read_many', page.read_many, (By.CSS_SELECTOR, '#users tr.row td'), fields=['text', '@class'])
+    for row in (rows or [])[:10]:
+        record('table_read', 'get_text', page.get_text, ele=row)
+    record('table_read', 'get_attribute', page.get_attribute, 'class',
+           loc=(By.XPATH, "//tbody/tr[7]/td[@class='state']/span"))
+
+
+def navigation(record, frame, page):
+    record('navigation', 'get', frame.get, '/index.html')
+    record('navigation', 'click', page.click, loc=(By.ID, 'to-table'))
+    record('navigation', 'get_title', frame.get_title)
+    record('navigation', 'back', frame.back)
+    record('navigation', 'forward', frame.forward)
+    record('navigation', 'refresh', frame.refresh)
+    record('navigation', 'get_current_url', frame.get_current_url)
+
+
+def alert_handling(record, frame, page):
+    record('alert', 'get', frame.get, '/alert.html')
+    record('alert', 'click', page.click, loc=(By.ID, 'show-alert'))
+    record('alert', 'get_alert_text', frame.get_alert_text)
+    record('alert', 'accept_alert', frame.accept_alert)
+    record('alert', 'click', page.click, loc=(By.ID, 'show-confirm'))
+    record('alert', 'dismiss_alert', frame.dismiss_alert)
+
+
+FLOWS = [('form_fill', form_fill), ('table_read', table_read), ('navigation', navigation),
+         ('alert', alert_handling)]
+
+
+def create_fake_backend(args):
+    driver = FakeWebDriver(latency=args.latency)
+    return driver, 'http://fixtures.local', lambda: None
+
+
+def create_chrome_backend(args):
+    from selenium import webdriver
+    server = FixtureServer().start()
+    profile = get_profile(args.launch_profile)
+    driver = profile.apply(webdriver.Chrome(options=profile.options(headless=True)))
+
+    def cleanup():
+        driver.quit()
+        server.stop()
+
+    return driver, server.base_url, cleanup
+
+
+BACKENDS = {'fake': create_fake_backend, 'chrome': create_chrome_backend}
+
+
+def create_timing_store():
+    # 基准页面的耗时记录写到临时目录, 不混入 log/timings.json; 进程退出时先保存(后注册先执行)再删除
+    path = tempfile.mkdtemp(prefix='uitester-bench-')
+    atexit.register(shutil.rmtree, path, True)
+    return TimingStore(path=os.path.join(path, 'timings.json'))
+
+
+def run(args):
+    driver, base_url, cleanup = BACKENDS[args.backend](args)
+    try:
+        # 与 UIFrame.create_driver 相同的 implicit wait, 非0时计入显式等待前后切换的开销
+        TimeoutManager.of(driver).set_implicit_wait(args.implicit_wait)
+        recorder = ActionRecorder(CommandCounter(driver))
+        frame = BenchFrame()
+        frame.driver = driver
+        frame.mgr_ip = base_url
+        BenchPage.timing_store = create_timing_store()
+        page = BenchPage(driver)
+        flows = [flow for flow in FLOWS if not args.flow or flow[0] in args.flow]
+        for name, func in flows:
+            # 预热一轮, 不计入统计
+            func(lambda flow, action, f, *a, **kw: f(*a, **kw), frame, page)
+            recorder.run_flow(name, lambda record: func(record, frame, page), args.iterations)
+    finally:
+        cleanup()
+    return {
+        'backend': args.backend,
+        'latency': args.latency if args.backend == 'fake' else None,
+        'launch_profile': args.launch_profile if args.backend == 'chrome' else None,
+        'iterations': args.iterations,
+        'implicit_wait': args.implicit_wait,
+        'flows': dict((flow, dict(_summary(samples), wall_s=round(sum(d for d, _ in samples), 4)))
+                      for flow, samples in recorder.flows.items()),
+        'actions': dict(('{}.{}'.format(*key), _summary(samples)) for key, samples in recorder.samples.items()),
+    }
+
+
+def format_text(result):
+    lines = ['backend: {backend}, latency: {latency}, iterations: {iterations}, implicit_wait: {implicit_wait}'.format(
+        **result),
+             '{:<32}{:>8}{:>10}{:>10}{:>10}{:>10}'.format('flow', 'calls', 'commands', 'p50_ms', 'p90_ms', 'wall_s')]
+    for flow, row in sorted(result['flows'].items()):
+        lines.append('{:<32}{calls:>8}{commands:>10}{p50_ms:>10}{p90_ms:>10}{wall_s:>10}'.format(flow, **row))
+    lines.append('{:<32}{:>8}{:>10}{:>10}{:>10}{:>10}'.format('action', 'calls', 'commands', 'p50_ms', 'p90_ms',
+                                                            'p99_ms'))
+    for action, row in sorted(result['actions'].items()):
+        lines.append('{:<32}{calls:>8}{commands:>10}{p50_ms:>10}{p90_ms:>10}{p99_ms:>10}'.format(action, **row))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='uitester 框架开销基准')
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default='fake')
+    parser.add_argument('--latency', type=float, default=0.0, help='fake 后端每条命令的延迟(秒)')
+    parser.add_argument('--launch-profile', choices=sorted(PROFILES), default='fast', help='chrome 后端的启动配置')
+    parser.add_argument('-n', '--iterations', type=int, default=10)
+    parser.add_argument('--implicit-wait', type=float, default=UIFrame.implicit_wait,
+                        help='driver 的 implicit wait, 默认与 UIFrame 相同')
+    parser.add_argument('--flow', action='append', choices=[name for name, _ in FLOWS], help='只运行指定流程, 可重复')
+    parser.add_argument('--json', help='把结果写入json文件')
+    parser.add_argument('--debug-log', action='store_true', help='保留DEBUG日志, 默认以性能模式运行')
+    args = parser.parse_args(argv)
+    logger.set_performance_mode(not args.debug_log)
+    # 命令剖析会给每条命令加开销, 且退出时写 log/ 下的报告, 基准中始终关闭
+    PROFILER.enable(False)
+    result = run(args)
+    print(format_text(result))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2, sort_keys=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
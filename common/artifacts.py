@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+异步保存截图、页面源码、浏览器控制台日志
+用例线程只负责从浏览器取回 base64 截图和文本, 解码、缩放/转JPEG、压缩和写盘由后台线程完成
+待写入的数据总量受 max_pending_bytes 限制, 超出时采集方阻塞等待, 内存占用有上限
+作为pytest插件(-p uitester.common.artifacts)加载时, 用例失败自动采集
+"""
+import atexit
+import base64
+import gzip
+import io
+import json
+import re
+import threading
+import time
+from collections import deque
+import pytest
+from uitester.common.logger import *
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+ARTIFACT_DIR = os.environ.get('UITESTER_ARTIFACT_DIR') or os.path.join(LOG_DIR, 'artifacts')
+
+
+class ArtifactPipeline(object):
+    """
+    :param workers: 后台写盘线程数
+    :param max_pending_bytes: 排队中的数据总量上限
+    :param image_format: type: str e.g. 'png', 'jpeg', 非png格式需要安装 PIL(Pillow), 未安装时按png保存
+    :param max_width: 截图宽度上限, 超出时等比缩小, 需要 PIL
+    :param jpeg_quality:
+    :param compress_text: 页面源码和控制台日志是否 gzip 压缩保存
+    """
+
+    def __init__(self, output_dir=ARTIFACT_DIR, workers=2, max_pending_bytes=64 * 1024 * 1024, image_format='png',
+                 max_width=None, jpeg_quality=80, compress_text=False):
+        self.output_dir = output_dir
+        self.workers = workers
+        self.max_pending_bytes = max_pending_bytes
+        self.image_format = image_format
+        self.max_width = max_width
+        self.jpeg_quality = jpeg_quality
+        self.compress_text = compress_text
+        self._jobs = deque()
+        self._pending_bytes = 0
+        self._pending_jobs = 0
+        self._condition = threading.Condition()
+        self._threads = []
+        self._closed = False
+        self._registered = False
+        self._sequence = 0
+        self.stats = {'captured': 0, 'written': 0, 'failed': 0, 'capture_time': 0.0, 'write_time': 0.0,
+                      'blocked_time': 0.0}
+
+    def _start(self):
+        if self._threads:
+            return
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name='uitester-artifacts-{}'.format(index))
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+        if not self._registered:
+            self._registered = True
+            atexit.register(self.shutdown)
+
+    def _submit(self, writer, path, data):
+        size = len(data)
+        start = time.time()
+        with self._condition:
+            self._start()
+            # 超出内存上限时等待后台线程消化, 单个超大文件在队列为空时仍允许提交
+            while self._pending_bytes and self._pending_bytes + size > self.max_pending_bytes:
+                self._condition.wait(1)
+            self.stats['blocked_time'] += time.time() - start
+            self._jobs.append((writer, path, data))
+            self._pending_bytes += size
+            self._pending_jobs += 1
+            self._condition.notify_all()
+        return path
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self._jobs and not self._closed:
+                    self._condition.wait()
+                if not self._jobs:
+                    return
+                writer, path, data = self._jobs.popleft()
+            start = time.time()
+            result = 'written'
+            try:
+                directory = os.path.dirname(path)
+                if directory and not os.path.isdir(directory):
+                    try:
+                        os.makedirs(directory)
+                    except OSError:
+                        pass
+                writer(path, data)
+            except Exception as e:
+                result = 'failed'
+                LOG_ERROR('保存文件失败: {}, {}'.format(path, e))
+            finally:
+                with self._condition:
+                    self.stats[result] += 1
+                    self.stats['write_time'] += time.time() - start
+                    self._pending_bytes -= len(data)
+                    self._pending_jobs -= 1
+                    self._condition.notify_all()
+
+    def _write_image(self, path, data):
+        raw = base64.b64decode(data)
+        if Image is None or (self.image_format == 'png' and not self.max_width):
+            with open(path, 'wb') as f:
+                f.write(raw)
+            return
+        image = Image.open(io.BytesIO(raw))
+        if self.max_width and image.size[0] > self.max_width:
+            height = int(image.size[1] * self.max_width / float(image.size[0]))
+            image = image.resize((self.max_width, height), Image.LANCZOS if hasattr(Image, 'LANCZOS') else 0)
+        if self.image_format == 'png':
+            image.save(path, 'PNG', optimize=True)
+        else:
+            image.convert('RGB').save(path, 'JPEG', quality=self.jpeg_quality, optimize=True)
+
+    def _write_text(self, path, data):
+        if self.compress_text:
+            with gzip.open(path, 'wb') as f:
+                f.write(data)
+        else:
+            with open(path, 'wb') as f:
+                f.write(data)
+
+    def _image_path(self, path):
+        if Image is not None and self.image_format != 'png':
+            return os.path.splitext(path)[0] + '.jpg'
+        return path
+
+    def _text_path(self, path):
+        return path + '.gz' if self.compress_text else path
+
+    def _next_prefix(self, name):
+        with self._condition:
+            self._sequence += 1
+            sequence = self._sequence
+        name = re.sub(r'[^\w.-]+', '_', name).strip('_') or 'artifact'
+        return os.path.join(self.output_dir, '{}-{:04d}-{}'.format(time.strftime('%Y%m%d-%H%M%S'), sequence, name))
+
+    def save_screenshot(self, driver, filepath):
+        """
+        截图并在后台保存到指定路径
+        :return: 实际保存的路径, 转为JPEG时扩展名为 .jpg
+        """
+        start = time.time()
+        data = driver.get_screenshot_as_base64()
+        if not isinstance(data, bytes):
+            data = data.encode('ascii')
+        with self._condition:
+            self.stats['captured'] += 1
+            self.stats['capture_time'] += time.time() - start
+        return self._submit(self._write_image, self._image_path(filepath), data)
+
+    def capture(self, driver, name, screenshot=True, page_source=True, console=True):
+        """
+        采集当前页面的截图/源码/控制台日志, 在后台写入 output_dir, 采集失败的部分跳过
+        :param name: 文件名前缀, 一般为用例名或步骤名
+        :return: type: list 提交保存的文件路径
+        """
+        prefix = self._next_prefix(name)
+        paths = []
+        start = time.time()
+        if screenshot:
+            try:
+                paths.append(self.save_screenshot(driver, prefix + '.png'))
+            except Exception as e:
+                LOG_DEBUG('截图失败: {}'.format(e))
+        if page_source:
+            try:
+                source = driver.page_source
+                if not isinstance(source, bytes):
+                    source = source.encode('utf-8', 'ignore')
+                paths.append(self._submit(self._write_text, self._text_path(prefix + '.html'), source))
+            except Exception as e:
+                LOG_DEBUG('获取页面源码失败: {}'.format(e))
+        if console:
+            try:
+                entries = driver.get_log('browser')
+                if entries:
+                    data = '\n'.join(json.dumps(entry, sort_keys=True) for entry in entries).encode('utf-8')
+                    paths.append(self._submit(self._write_text, self._text_path(prefix + '.console.log'), data))
+            except Exception as e:
+                LOG_DEBUG('获取控制台日志失败: {}'.format(e))
+        LOG_DEBUG(lambda: '采集页面现场耗时 {:.3f}s: {}'.format(time.time() - start, paths))
+        return paths
+
+    def flush(self, timeout=30):
+        # 等待已提交的文件全部写完
+        deadline = time.time() + timeout
+        with self._condition:
+            while self._pending_jobs:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    LOG_WARN('等待保存文件超时, 剩余: {}'.format(self._pending_jobs))
+                    return False
+                self._condition.wait(min(remaining, 1))
+        return True
+
+    def shutdown(self, timeout=30):
+        self.flush(timeout)
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        self._closed = False
+
+
+ARTIFACTS = ArtifactPipeline()
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item, call):
+    # 用例执行失败时采集现场, driver 取自 UIFrame 用例实例
+    outcome = yield
+    report = outcome.get_result()
+    if report.when != 'call' or not report.failed:
+        return
+    instance = getattr(item, '_testcase', None) or getattr(item, 'instance', None)
+    driver = getattr(instance, 'driver', None)
+    if driver is None:
+        return
+    try:
+        paths = ARTIFACTS.capture(driver, item.nodeid.split('::', 1)[-1])
+        LOG_INFO('用例失败, 已保存现场: {}'.format(paths))
+    except Exception as e:
+        LOG_DEBUG('用例失败现场采集失败: {}'.format(e))
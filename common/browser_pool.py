@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# encoding: utf-8
+import threading
+from uitester.common.logger import *
+
+
+class BrowserPool(object):
+    """
+    浏览器池: 按测试类租借driver, 归还时重置浏览器状态后放回池中复用
+    driver 使用次数达到 max_uses 或健康检查失败时关闭并重新创建, 只在会话结束时 shutdown
+    """
+
+    def __init__(self, factory, max_uses=20):
+        """
+        :param factory: 无参函数, 返回新启动的 driver
+        :param max_uses: 单个 driver 最多被租借的次数
+        """
+        self.factory = factory
+        self.max_uses = max_uses
+        self._idle = []
+        self._uses = {}
+        self._drivers = []
+        self._lock = threading.Lock()
+
+    def lease(self, url=None):
+        """
+        租借一个 driver, 优先复用池中健康的 driver
+        :param url: 租借后打开的页面, 一般为 index_url
+        :return: driver
+        """
+        driver = None
+        while driver is None:
+            with self._lock:
+                candidate = self._idle.pop() if self._idle else None
+            if candidate is None:
+                driver = self.factory()
+                with self._lock:
+                    self._drivers.append(driver)
+                    self._uses[id(driver)] = 0
+                LOG_DEBUG('浏览器池新建driver, 当前driver数: {}'.format(len(self._drivers)))
+            elif self.is_healthy(candidate):
+                driver = candidate
+                LOG_DEBUG('浏览器池复用driver, 已使用次数: {}'.format(self._uses[id(driver)]))
+            else:
+                LOG_DEBUG('driver健康检查失败, 回收重建')
+                self._dispose(candidate)
+        self._uses[id(driver)] += 1
+        if url:
+            driver.get(url)
+        return driver
+
+    def release(self, driver):
+        # 归还 driver, 达到使用上限或重置失败时直接回收
+        if driver not in self._drivers:
+            return
+        if self._uses.get(id(driver), 0) >= self.max_uses:
+            LOG_DEBUG('driver已使用 {} 次, 回收'.format(self._uses[id(driver)]))
+            self._dispose(driver)
+            return
+        try:
+            self.reset(driver)
+        except Exception as e:
+            LOG_DEBUG('driver重置失败, 回收: {}'.format(e))
+            self._dispose(driver)
+            return
+        with self._lock:
+            self._idle.append(driver)
+
+    @staticmethod
+    def is_healthy(driver):
+        try:
+            driver.current_window_handle
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def reset(driver):
+        # 关闭多余窗口, 清除当前源的存储和所有cookie
+        handles = driver.window_handles
+        for handle in handles[1:]:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(handles[0])
+        try:
+            driver.execute_script('window.localStorage.clear(); window.sessionStorage.clear();')
+        except Exception:
+            pass
+        try:
+            driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+        except Exception:
+            driver.delete_all_cookies()
+
+    def _dispose(self, driver):
+        with self._lock:
+            if driver in self._drivers:
+                self._drivers.remove(driver)
+            if driver in self._idle:
+                self._idle.remove(driver)
+            self._uses.pop(id(driver), None)
+        try:
+            driver.quit()
+        except Exception as e:
+            LOG_DEBUG('driver退出失败, 结束其chromedriver进程: {}'.format(e))
+            # 只结束本池启动的chromedriver, 不影响机器上的其他浏览器
+            process = getattr(getattr(driver, 'service', None), 'process', None)
+            if process is not None:
+                try:
+                    process.kill()
+                except Exception:
+                    pass
+
+    def shutdown(self):
+        # 会话结束时关闭池中所有 driver
+        for driver in list(self._drivers):
+            self._dispose(driver)
@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+# encoding: utf-8
+import atexit
+import copy
+import shutil
+import tempfile
+import threading
+from selenium.webdriver.chrome.options import Options
+from uitester.common.logger import *
+
+# 用例从不校验的静态资源和第三方脚本, fast 配置下通过 CDP 直接拦截
+BLOCKED_RESOURCES = [
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.svg', '*.ico',
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot',
+    '*.mp4', '*.webm', '*.mp3',
+    '*google-analytics.com*', '*googletagmanager.com*', '*hm.baidu.com*', '*doubleclick.net*',
+]
+
+# 关闭页面内的 css 动画和过渡, 元素出现即处于最终位置, 不需要等待动画结束
+DISABLE_ANIMATIONS_JS = '''
+(function () {
+    var css = '*, *::before, *::after {transition: none !important; animation: none !important;' +
+              ' caret-color: transparent !important; scroll-behavior: auto !important;}';
+    function inject() {
+        var style = document.createElement('style');
+        style.setAttribute('data-uitester', 'no-animation');
+        style.textContent = css;
+        (document.head || document.documentElement).appendChild(style);
+    }
+    if (document.documentElement) {
+        inject();
+    } else {
+        document.addEventListener('DOMContentLoaded', inject);
+    }
+})();
+'''
+
+
+class LaunchProfile(object):
+    """
+    浏览器启动配置: 启动参数、页面加载策略、资源拦截和用户目录模板
+    options() 生成启动 Chrome 的 Options, driver 启动后由 apply() 下发 CDP 设置
+    """
+
+    def __init__(self, name, headless=False, page_load_strategy='normal', blocked_urls=None,
+                 disable_extensions=False, disable_animations=False, user_data_template=None, arguments=None,
+                 prefs=None):
+        """
+        :param name:
+        :param headless: 是否无头模式
+        :param page_load_strategy: type: str e.g. 'normal': 等待load事件, 'eager': DOMContentLoaded即返回,
+                                   'none': 发出导航请求即返回
+        :param blocked_urls: type: list 拦截的url通配模式, 通过 CDP Network.setBlockedURLs 生效
+        :param disable_extensions: 禁用扩展和组件更新等后台任务
+        :param disable_animations: 禁用css动画和过渡
+        :param user_data_template: 预热好的用户目录, 每个driver启动时复制一份使用, 为 None 时使用临时目录
+        :param arguments: type: list 额外的启动参数
+        :param prefs: type: dict Chrome 首选项
+        """
+        self.name = name
+        self.headless = headless
+        self.page_load_strategy = page_load_strategy
+        self.blocked_urls = list(blocked_urls or [])
+        self.disable_extensions = disable_extensions
+        self.disable_animations = disable_animations
+        self.user_data_template = user_data_template
+        self.arguments = list(arguments or [])
+        self.prefs = dict(prefs or {})
+        self._user_data_dirs = []
+        self._lock = threading.Lock()
+        self._registered = False
+
+    def __repr__(self):
+        return '<LaunchProfile {} headless={} pageLoadStrategy={} blocked={}>'.format(
+            self.name, self.headless, self.page_load_strategy, len(self.blocked_urls))
+
+    def replace(self, **kwargs):
+        # 基于当前配置生成修改了部分字段的新配置 e.g. PROFILES['fast'].replace(headless=False)
+        profile = copy.copy(self)
+        profile.blocked_urls = list(self.blocked_urls)
+        profile.arguments = list(self.arguments)
+        profile.prefs = dict(self.prefs)
+        profile._user_data_dirs = []
+        profile._lock = threading.Lock()
+        profile._registered = False
+        for key, value in kwargs.items():
+            if not hasattr(profile, key):
+                raise AttributeError('LaunchProfile has no field: {}'.format(key))
+            setattr(profile, key, value)
+        return profile
+
+    def options(self, headless=False):
+        """
+        :param headless: 为 True 时不论配置如何都以无头模式启动, 用于并行执行和无界面环境
+        :return: Options
+        """
+        chrome_options = Options()
+        if self.headless or headless:
+            chrome_options.add_argument('--headless')
+            chrome_options.add_argument('--disable-dev-shm-usage')
+            chrome_options.add_argument('--window-size=1920,1080')
+        chrome_options.add_argument('--disable-gpu')
+        chrome_options.add_argument('-start-maximized')
+        if self.disable_extensions:
+            for argument in ['--disable-extensions', '--disable-component-update', '--disable-default-apps',
+                             '--disable-background-networking', '--disable-sync', '--no-first-run',
+                             '--disable-features=Translate,OptimizationHints,MediaRouter']:
+                chrome_options.add_argument(argument)
+        if self.disable_animations:
+            chrome_options.add_argument('--force-prefers-reduced-motion')
+        user_data_dir = self._copy_user_data()
+        if user_data_dir:
+            chrome_options.add_argument('--user-data-dir={}'.format(user_data_dir))
+        for argument in self.arguments:
+            chrome_options.add_argument(argument)
+        if self.prefs:
+            chrome_options.add_experimental_option('prefs', self.prefs)
+        chrome_options.set_capability('pageLoadStrategy', self.page_load_strategy)
+        # 失败现场采集需要读取浏览器控制台日志
+        chrome_options.set_capability('goog:loggingPrefs', {'browser': 'ALL'})
+        return chrome_options
+
+    def apply(self, driver):
+        # 启动后通过 CDP 下发资源拦截和禁用动画, 非 Chrome 或不支持 CDP 时忽略
+        if not (self.blocked_urls or self.disable_animations):
+            return driver
+        try:
+            if self.blocked_urls:
+                driver.execute_cdp_cmd('Network.enable', {})
+                driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': self.blocked_urls})
+            if self.disable_animations:
+                driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {'source': DISABLE_ANIMATIONS_JS})
+                driver.execute_cdp_cmd('Animation.enable', {})
+                driver.execute_cdp_cmd('Animation.setPlaybackRate', {'playbackRate': 100})
+        except Exception as e:
+            LOG_DEBUG('启动配置 {} 的CDP设置未生效: {}'.format(self.name, e))
+        return driver
+
+    def _copy_user_data(self):
+        # Chrome 会锁定用户目录, 每个 driver 使用模板的独立副本, 进程退出时删除
+        if not self.user_data_template:
+            return None
+        if not os.path.isdir(self.user_data_template):
+            LOG_WARN('用户目录模板不存在: {}'.format(self.user_data_template))
+            return None
+        target = os.path.join(tempfile.mkdtemp(prefix='uitester-profile-'), 'user-data')
+        shutil.copytree(self.user_data_template, target,
+                        ignore=shutil.ignore_patterns('Singleton*', 'lockfile', '*.lock', 'Crash Reports'))
+        with self._lock:
+            self._user_data_dirs.append(os.path.dirname(target))
+            if not self._registered:
+                self._registered = True
+                atexit.register(self.cleanup)
+        LOG_DEBUG('复制用户目录模板到: {}'.format(target))
+        return target
+
+    def cleanup(self):
+        with self._lock:
+            dirs, self._user_data_dirs = self._user_data_dirs, []
+        for path in dirs:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+PROFILES = {
+    # 与原有行为一致: 有界面, 等待页面完全加载
+    'full': LaunchProfile('full'),
+    # 导航密集的用例: 无头, DOMContentLoaded 即返回, 拦截图片字体和统计脚本, 禁用扩展和动画
+    'fast': LaunchProfile('fast', headless=True, page_load_strategy='eager', blocked_urls=BLOCKED_RESOURCES,
+                          disable_extensions=True, disable_animations=True,
+                          user_data_template=os.environ.get('UITESTER_USER_DATA_TEMPLATE') or None,
+                          prefs={'profile.managed_default_content_settings.images': 2}),
+    # 本地排查: 有界面, 完全加载, 自动打开开发者工具
+    'debug': LaunchProfile('debug', arguments=['--auto-open-devtools-for-tabs']),
+}
+
+
+def get_profile(profile=None):
+    """
+    :param profile: type: str or LaunchProfile, 为 None 时读取环境变量 UITESTER_LAUNCH_PROFILE, 默认 'full'
+    :return: LaunchProfile
+    """
+    if isinstance(profile, LaunchProfile):
+        return profile
+    name = profile or os.environ.get('UITESTER_LAUNCH_PROFILE') or 'full'
+    if name not in PROFILES:
+        raise ValueError('未知的启动配置: {}, 可选: {}'.format(name, sorted(PROFILES)))
+    return PROFILES[name]
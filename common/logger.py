@@ -1,17 +1,136 @@
 #!/usr/bin/env python
 # encoding: utf-8
+import atexit
 import logging
 import os
+import threading
 import time
+try:
+    import queue
+except ImportError:
+    import Queue as queue
 LOG_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "log")
 if not os.path.exists(LOG_DIR):
     os.mkdir(LOG_DIR)
 
 
+def log_file_path(worker_id=None):
+    # 并行执行时每个worker进程写独立的日志文件
+    name = time.strftime("%Y-%m-%d", time.localtime())
+    if worker_id is not None:
+        name += '.worker-{}'.format(worker_id)
+    return os.path.join(LOG_DIR, name + '.log')
+
+
+class QueueLogHandler(logging.Handler):
+    # 将日志记录放入有界队列, 由后台线程写入; 队列满时阻塞调用线程, 不丢日志
+    def __init__(self, log_queue):
+        logging.Handler.__init__(self)
+        self.queue = log_queue
+
+    def prepare(self, record):
+        # 在调用线程完成消息格式化, 避免参数对象跨线程被修改
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def emit(self, record):
+        try:
+            self.queue.put(self.prepare(record))
+        except Exception:
+            self.handleError(record)
+
+
+class _FlushRequest(object):
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class BatchQueueListener(object):
+    """
+    后台线程消费日志队列, 每次最多取 batch_size 条, 批量写入后统一 flush
+    """
+    _stop = object()
+
+    def __init__(self, log_queue, handlers, batch_size=200):
+        self.queue = log_queue
+        self.handlers = handlers
+        self.batch_size = batch_size
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='uitester-log')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            records = [item for item in batch if isinstance(item, logging.LogRecord)]
+            for handler in self.handlers:
+                try:
+                    self._write_batch(handler, [r for r in records if r.levelno >= handler.level])
+                except Exception:
+                    pass
+            for item in batch:
+                if isinstance(item, _FlushRequest):
+                    item.done.set()
+            if any(item is self._stop for item in batch):
+                return
+
+    @staticmethod
+    def _write_batch(handler, records):
+        # 只会挂载 FileHandler / StreamHandler, 二者都直接写 stream
+        if not records:
+            return
+        text = ''.join(handler.format(record) + '\n' for record in records)
+        handler.acquire()
+        try:
+            try:
+                handler.stream.write(text)
+            except UnicodeError:
+                handler.stream.write(text.encode('utf-8'))
+            handler.flush()
+        finally:
+            handler.release()
+
+    def flush(self, timeout=10):
+        # 等待此前入队的日志全部写完
+        if not (self._thread and self._thread.is_alive()):
+            return
+        request = _FlushRequest()
+        self.queue.put(request)
+        request.done.wait(timeout)
+
+    def stop(self, timeout=10):
+        if self._thread and self._thread.is_alive():
+            self.queue.put(self._stop)
+            self._thread.join(timeout)
+
+
 class Logger(object):
-    def __init__(self, cmd_level=logging.DEBUG, file_level=logging.DEBUG):
-        log_file = time.strftime("%Y-%m-%d.log", time.localtime())
-        path = os.path.join(LOG_DIR, log_file)
+    def __init__(self, cmd_level=logging.DEBUG, file_level=logging.DEBUG, performance_mode=None, async_mode=None,
+                 queue_size=10000):
+        """
+        :param performance_mode: 性能模式, 关闭DEBUG日志; 默认读取环境变量 UITESTER_PERFORMANCE_MODE
+        :param async_mode: 异步模式, 文件/控制台写入由后台线程完成; 默认读取环境变量 UITESTER_ASYNC_LOG
+        :param queue_size: 异步模式下日志队列上限
+        """
+        if performance_mode is None:
+            performance_mode = os.environ.get('UITESTER_PERFORMANCE_MODE', '') not in ('', '0')
+        if async_mode is None:
+            async_mode = os.environ.get('UITESTER_ASYNC_LOG', '') not in ('', '0')
+        self.performance_mode = performance_mode
+        self.listener = None
+        path = log_file_path(os.environ.get('UITESTER_WORKER_ID'))
         self.logger = logging.getLogger(path)
         self.logger.setLevel(cmd_level)
         fmt = logging.Formatter('[%(asctime)s] [%(levelname)s] %(message)s')
@@ -19,54 +138,77 @@ class Logger(object):
         fh = logging.FileHandler(path)
         fh.setFormatter(fmt)
         fh.setLevel(file_level)
-        self.logger.addHandler(fh)
         # 设置CMD日志
         sh = logging.StreamHandler()
         sh.setFormatter(fmt)
         sh.setLevel(cmd_level)
-        self.logger.addHandler(sh)
+        if async_mode:
+            log_queue = queue.Queue(maxsize=queue_size)
+            self.listener = BatchQueueListener(log_queue, [fh, sh])
+            self.listener.start()
+            self.logger.addHandler(QueueLogHandler(log_queue))
+        else:
+            self.logger.addHandler(fh)
+            self.logger.addHandler(sh)
+
+    def flush(self, timeout=10):
+        # 确保已记录的日志全部落盘, 异步模式下等待后台线程写完
+        if self.listener:
+            self.listener.flush(timeout)
+        for handler in self.logger.handlers:
+            handler.flush()
+
+    def close(self):
+        if self.listener:
+            self.listener.stop()
+            self.listener = None
+
+    def set_performance_mode(self, flag=True):
+        # 性能模式: 完全关闭DEBUG日志, 延迟格式化的回调也不会被执行
+        self.performance_mode = flag
+
+    def is_enabled_for(self, level):
+        if level <= logging.DEBUG and self.performance_mode:
+            return False
+        return self.logger.isEnabledFor(level)
+
+    def debug_enabled(self):
+        return self.is_enabled_for(logging.DEBUG)
+
+    def log(self, level, msg, *args, **kwargs):
+        """
+        msg 可以是字符串或无参回调, 回调仅在该级别日志开启时才执行;
+        args 作为 %-style 参数透传给 logging, 同样只在输出时才格式化
+        """
+        if not self.is_enabled_for(level):
+            return
+        if callable(msg):
+            try:
+                msg = msg()
+            except Exception as e:
+                msg = '日志内容生成失败: {}'.format(e)
+        if isinstance(msg, bytes):
+            msg = msg.decode('utf-8', 'ignore')
+        self.logger.log(level, msg, *args, **kwargs)
 
     def debug(self, msg, *args, **kwargs):
-        try:
-            unicode_msg = msg.decode(encoding='utf-8', errors='ignore')
-        except Exception:
-            unicode_msg = msg
-        self.logger.debug(msg=unicode_msg, *args, **kwargs)
+        self.log(logging.DEBUG, msg, *args, **kwargs)
 
     def info(self, msg, *args, **kwargs):
-        try:
-            unicode_msg = msg.decode(encoding='utf-8', errors='ignore')
-        except Exception:
-            unicode_msg = msg
-        self.logger.info(msg=unicode_msg, *args, **kwargs)
+        self.log(logging.INFO, msg, *args, **kwargs)
 
     def warn(self, msg, *args, **kwargs):
-        try:
-            unicode_msg = msg.decode(encoding='utf-8', errors='ignore')
-        except Exception:
-            unicode_msg = msg
-        self.logger.warn(msg=unicode_msg, *args, **kwargs)
+        self.log(logging.WARNING, msg, *args, **kwargs)
 
     def error(self, msg, *args, **kwargs):
-        try:
-            unicode_msg = msg.decode(encoding='utf-8', errors='ignore')
-        except Exception:
-            unicode_msg = msg
-        self.logger.error(msg=unicode_msg, *args, **kwargs)
+        self.log(logging.ERROR, msg, *args, **kwargs)
 
     def critical(self, msg, *args, **kwargs):
-        try:
-            unicode_msg = msg.decode(encoding='utf-8', errors='ignore')
-        except Exception:
-            unicode_msg = msg
-        self.logger.critical(msg=unicode_msg, *args, **kwargs)
+        self.log(logging.CRITICAL, msg, *args, **kwargs)
 
     def exception(self, msg, *args, **kwargs):
-        try:
-            unicode_msg = msg.decode(encoding='utf-8', errors='ignore')
-        except Exception:
-            unicode_msg = msg
-        self.logger.exception(msg=unicode_msg, *args, **kwargs)
+        kwargs.setdefault('exc_info', True)
+        self.log(logging.ERROR, msg, *args, **kwargs)
 
 
 logger = Logger()
@@ -76,6 +218,9 @@ LOG_WARN = logger.warn
 LOG_ERROR = logger.error
 LOG_EXCEPTION = logger.exception
 LOG_CRITICAL = logger.critical
+LOG_DEBUG_ENABLED = logger.debug_enabled
+LOG_FLUSH = logger.flush
+atexit.register(logger.close)
 
 
 def title(title):
@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+并行执行UI用例: 按历史耗时把测试类分片到多个worker进程, 每个worker使用独立的无头Chrome
+用法: python -m uitester.common.parallel -n 4 [pytest参数...]
+作为pytest插件(-p uitester.common.parallel)加载时记录每个测试类的耗时, worker 同时加载失败现场采集插件
+"""
+import argparse
+import heapq
+import json
+import multiprocessing
+import os
+import re
+import subprocess
+import sys
+import time
+from uitester.common.logger import *
+
+DURATIONS_FILE = os.path.join(LOG_DIR, 'durations.json')
+DEFAULT_DURATION = 30.0
+LOG_LINE_RE = re.compile(r'^\[(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3})\]')
+
+_class_durations = {}
+
+
+def shard_key(nodeid):
+    # 以测试类为分片单位, 模块级用例函数单独作为一个分片
+    return '::'.join(nodeid.split('::')[:2])
+
+
+def pytest_runtest_logreport(report):
+    key = shard_key(report.nodeid)
+    _class_durations[key] = _class_durations.get(key, 0.0) + report.duration
+
+
+def pytest_sessionfinish(session, exitstatus):
+    path = os.environ.get('UITESTER_DURATIONS_OUT')
+    if path:
+        with open(path, 'w') as f:
+            json.dump(_class_durations, f)
+
+
+def pytest_collection_finish(session):
+    # 收集阶段输出 pytest 解析出的用例路径参数, 供 worker 去掉这些参数而保留选项的取值
+    path = os.environ.get('UITESTER_ARGS_OUT')
+    if path:
+        with open(path, 'w') as f:
+            json.dump(list(session.config.args), f)
+
+
+def load_durations(path):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except ValueError:
+        return {}
+
+
+def collect_shards(pytest_args):
+    """
+    :return: type: tuple (测试类列表, pytest 参数中的用例路径)
+    """
+    # 去掉用户的 -q/-v, 保证收集结果按每行一个 nodeid 输出
+    args = [arg for arg in pytest_args if not re.match(r'^-(q+|v+)$|^--(quiet|verbose)$', arg)]
+    args_out = os.path.join(LOG_DIR, 'collect-args.{}.json'.format(os.getpid()))
+    env = dict(os.environ, UITESTER_ARGS_OUT=args_out)
+    command = [sys.executable, '-m', 'pytest', '-p', 'uitester.common.parallel', '--collect-only', '-q'] + args
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, env=env)
+    output = process.communicate()[0]
+    # 返回码 5 表示没有收集到用例, 由调用方按空分片处理
+    if process.returncode not in (0, 5):
+        raise subprocess.CalledProcessError(process.returncode, command, output)
+    try:
+        with open(args_out) as f:
+            paths = json.load(f)
+        os.remove(args_out)
+    except (IOError, OSError, ValueError) as e:
+        LOG_DEBUG('ERROR [collect args]: {}'.format(e))
+        paths = []
+    shards = []
+    for line in output.decode('utf-8', 'ignore').splitlines():
+        line = line.strip()
+        if '::' in line:
+            key = shard_key(line)
+            if key not in shards:
+                shards.append(key)
+    return shards, paths
+
+
+def strip_paths(pytest_args, paths):
+    # 从后往前去掉 pytest 解析为用例路径的位置参数, 与之同名的选项取值(e.g. --rootdir dir)保留
+    options = list(pytest_args)
+    for path in paths:
+        for index in range(len(options) - 1, -1, -1):
+            if options[index] == path:
+                del options[index]
+                break
+    return options
+
+
+def assign_shards(shards, durations, workers):
+    """
+    最长处理时间优先(LPT)的贪心分配, 没有历史记录的测试类按已知耗时的平均值估算
+    :return: type: list of list, 每个worker分到的测试类
+    """
+    known = [durations[key] for key in shards if key in durations]
+    default = sum(known) / len(known) if known else DEFAULT_DURATION
+    ordered = sorted(shards, key=lambda key: durations.get(key, default), reverse=True)
+    heap = [(0.0, index) for index in range(workers)]
+    buckets = [[] for _ in range(workers)]
+    for key in ordered:
+        load, index = heapq.heappop(heap)
+        buckets[index].append(key)
+        heapq.heappush(heap, (load + durations.get(key, default), index))
+    return [bucket for bucket in buckets if bucket]
+
+
+def _read_records(path, offset, worker_id):
+    # 按日志行首时间戳切分记录, 异常堆栈等续行归入上一条记录
+    records = []
+    if not os.path.exists(path):
+        return records
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        for raw in f:
+            line = raw.decode('utf-8', 'ignore').rstrip('\r\n')
+            match = LOG_LINE_RE.match(line)
+            if match or not records:
+                stamp = match.group(1) if match else ''
+                records.append((stamp, worker_id, len(records), ['[worker-{}] {}'.format(worker_id, line)]))
+            else:
+                records[-1][3].append(line)
+    return records
+
+
+def merge_logs(offsets, output):
+    # 合并各worker本次运行写入的日志, 按时间戳排序输出
+    streams = [_read_records(log_file_path(worker_id), offset, worker_id)
+               for worker_id, offset in sorted(offsets.items())]
+    with open(output, 'wb') as f:
+        for record in heapq.merge(*streams):
+            f.write(('\n'.join(record[3]) + '\n').encode('utf-8'))
+    return output
+
+
+def run(pytest_args, workers, durations_file=DURATIONS_FILE):
+    durations = load_durations(durations_file)
+    shards, paths = collect_shards(pytest_args)
+    if not shards:
+        LOG_INFO('没有收集到用例')
+        return 0
+    buckets = assign_shards(shards, durations, workers)
+    # 用例路径已展开为测试类, 其余参数原样透传给worker
+    options = strip_paths(pytest_args, paths)
+    start = time.time()
+    processes = []
+    offsets = {}
+    for worker_id, bucket in enumerate(buckets):
+        log_path = log_file_path(worker_id)
+        offsets[worker_id] = os.path.getsize(log_path) if os.path.exists(log_path) else 0
+        env = dict(os.environ)
+        env['UITESTER_WORKER_ID'] = str(worker_id)
+        env['UITESTER_HEADLESS'] = '1'
+        env['UITESTER_DURATIONS_OUT'] = os.path.join(LOG_DIR, 'durations.worker-{}.json'.format(worker_id))
+        command = [sys.executable, '-m', 'pytest', '-p', 'uitester.common.parallel',
+                   '-p', 'uitester.common.artifacts'] + options + bucket
+        LOG_INFO('启动worker-{}, 测试类数: {}'.format(worker_id, len(bucket)))
+        processes.append((worker_id, subprocess.Popen(command, env=env), env['UITESTER_DURATIONS_OUT']))
+    exit_code = 0
+    for worker_id, process, durations_out in processes:
+        code = process.wait()
+        LOG_INFO('worker-{} 结束, 退出码: {}'.format(worker_id, code))
+        exit_code = exit_code or code
+        durations.update(load_durations(durations_out))
+    with open(durations_file, 'w') as f:
+        json.dump(durations, f, indent=2, sort_keys=True)
+    report = merge_logs(offsets, os.path.join(LOG_DIR, time.strftime('%Y-%m-%d.parallel.log', time.localtime())))
+    LOG_INFO('并行执行完成, worker数: {}, 总耗时: {:.1f}s, 合并日志: {}'.format(len(buckets), time.time() - start, report))
+    return exit_code
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='并行执行UI自动化用例')
+    parser.add_argument('-n', '--workers', type=int, default=multiprocessing.cpu_count(), help='worker进程数')
+    parser.add_argument('--durations-file', default=DURATIONS_FILE, help='历史耗时记录文件')
+    args, pytest_args = parser.parse_known_args(argv)
+    return run(pytest_args, max(args.workers, 1), args.durations_file)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+# encoding: utf-8
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from uitester.common.logger import *
+from uitester.common.timeouts import WAIT_STATS
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+# 框架代码所在位置, 调用栈中只在这些文件内回溯调用方
+FRAMEWORK_PATHS = (os.path.join(PACKAGE_DIR, 'page') + os.sep, os.path.join(PACKAGE_DIR, 'common') + os.sep,
+                   os.path.join(PACKAGE_DIR, '__init__.py'))
+
+
+_framework_files = {}
+
+
+def _is_framework(filename):
+    result = _framework_files.get(filename)
+    if result is None:
+        path = os.path.realpath(filename)
+        result = _framework_files[filename] = any(path.startswith(prefix) for prefix in FRAMEWORK_PATHS)
+    return result
+
+
+def _stat_add(table, key, duration):
+    stat = table.get(key)
+    if stat is None:
+        stat = table[key] = [0, 0.0, 0.0]
+    stat[0] += 1
+    stat[1] += duration
+    stat[2] = max(stat[2], duration)
+
+
+def _stat_rows(table, sort_index, n):
+    rows = sorted(table.items(), key=lambda item: item[1][sort_index], reverse=True)[:n]
+    return [{'key': key, 'count': stat[0], 'total': round(stat[1], 4), 'max': round(stat[2], 4)}
+            for key, stat in rows]
+
+
+class CommandProfiler(object):
+    """
+    WebDriver 命令级耗时统计
+    instrument 把 driver.execute 替换为计时代理, driver 和 WebElement 的所有命令都经过它,
+    同时从调用栈中找出发起命令的 BasePage/UIFrame 方法和定位; 未开启时不做任何替换, 没有额外开销
+    """
+
+    def __init__(self, enabled=None):
+        if enabled is None:
+            enabled = os.environ.get('UITESTER_PROFILE', '') not in ('', '0')
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._registered = False
+        self.reset()
+
+    def reset(self):
+        self.by_command = {}
+        self.by_locator = {}
+        self.by_caller = {}
+        self.tests = {}
+        self.current_test = None
+        self.started_at = time.time()
+
+    def enable(self, flag=True):
+        self.enabled = flag
+
+    def instrument(self, driver):
+        # 幂等, 同一个 driver 只代理一次
+        if not self.enabled or getattr(driver, '_uitester_profiled', False):
+            return driver
+        original = driver.execute
+        profiler = self
+
+        def execute(driver_command, params=None):
+            start = time.time()
+            try:
+                return original(driver_command, params)
+            finally:
+                profiler.record(driver_command, time.time() - start)
+
+        driver.execute = execute
+        driver._uitester_profiled = True
+        if not self._registered:
+            self._registered = True
+            atexit.register(self.dump)
+        return driver
+
+    @staticmethod
+    def _caller():
+        """
+        从调用栈中找到框架内最外层的连续调用, 返回 (类名.方法名, loc)
+        e.g. click -> find_element -> ElementFinder.find -> selenium, 返回 ('LoginPage.click', ('id', 'kw'))
+        """
+        frame = sys._getframe(3)
+        method, loc, inside = None, None, False
+        while frame is not None:
+            if _is_framework(frame.f_code.co_filename):
+                inside = True
+                local_vars = frame.f_locals
+                owner = local_vars.get('self')
+                if owner is not None and hasattr(owner, 'driver'):
+                    method = '{}.{}'.format(type(owner).__name__, frame.f_code.co_name)
+                if loc is None and isinstance(local_vars.get('loc'), tuple):
+                    loc = local_vars['loc']
+            elif inside and not frame.f_globals.get('__name__', '').startswith('selenium'):
+                # WebDriverWait 等 selenium 内部调用位于框架代码之间, 继续向外回溯
+                break
+            frame = frame.f_back
+        return method or '<driver>', loc
+
+    def record(self, command, duration):
+        method, loc = self._caller()
+        loc_key = '{}={}'.format(loc[0], loc[1]) if loc else None
+        with self._lock:
+            _stat_add(self.by_command, command, duration)
+            _stat_add(self.by_caller, '{} [{}]'.format(method, command), duration)
+            if loc_key:
+                _stat_add(self.by_locator, loc_key, duration)
+            if self.current_test is not None:
+                test = self.tests[self.current_test]
+                test['commands'] += 1
+                test['total'] += duration
+                if loc_key:
+                    _stat_add(test['by_locator'], loc_key, duration)
+
+    def begin_test(self, test_id):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.current_test = test_id
+            self.tests.setdefault(test_id, {'commands': 0, 'total': 0.0, 'by_locator': {}})
+
+    def end_test(self):
+        self.current_test = None
+
+    def report(self, n=10):
+        """
+        :return: type: dict 按命令/调用方/定位汇总的热点报告
+        """
+        find_commands = [key for key in self.by_command if 'element' in key.lower() and 'find' in key.lower()]
+        return {
+            'wall_time': round(time.time() - self.started_at, 3),
+            'commands': sum(stat[0] for stat in self.by_command.values()),
+            'driver_time': round(sum(stat[1] for stat in self.by_command.values()), 4),
+            'find_time': round(sum(self.by_command[key][1] for key in find_commands), 4),
+            'wait_time': round(sum(row['total'] for row in WAIT_STATS.top(len(WAIT_STATS.waits))), 4),
+            'by_command': _stat_rows(self.by_command, 1, len(self.by_command)),
+            'slowest_locators': _stat_rows(self.by_locator, 1, n),
+            'frequent_round_trips': _stat_rows(self.by_caller, 0, n),
+            'tests': dict((test_id, {'commands': test['commands'], 'total': round(test['total'], 4),
+                                     'slowest_locators': _stat_rows(test['by_locator'], 1, 3)})
+                          for test_id, test in self.tests.items()),
+        }
+
+    @staticmethod
+    def format_text(report):
+        lines = ['WebDriver命令统计: 命令数 {commands}, driver耗时 {driver_time}s, 查找耗时 {find_time}s, '
+                 '显式等待耗时 {wait_time}s, 总耗时 {wall_time}s'.format(**report)]
+        for title, key in [('命令耗时', 'by_command'), ('最慢的定位', 'slowest_locators'),
+                           ('最频繁的请求', 'frequent_round_trips')]:
+            lines.append('--- {} ---'.format(title))
+            for row in report[key]:
+                lines.append('{total:>9.3f}s {count:>6}次 max {max:.3f}s  {key}'.format(**row))
+        lines.append('--- 用例耗时 ---')
+        for test_id, test in sorted(report['tests'].items(), key=lambda item: item[1]['total'], reverse=True):
+            lines.append('{:>9.3f}s {:>6}次  {}'.format(test['total'], test['commands'], test_id))
+        return '\n'.join(lines)
+
+    def dump(self, prefix=None):
+        # 写出 json 报告和文本摘要, 默认与当前进程的日志文件同名
+        if not self.by_command:
+            return None
+        prefix = prefix or log_file_path(os.environ.get('UITESTER_WORKER_ID'))[:-len('.log')] + '.profile'
+        report = self.report()
+        with open(prefix + '.json', 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        text = self.format_text(report)
+        with open(prefix + '.txt', 'wb') as f:
+            f.write(text.encode('utf-8') if not isinstance(text, bytes) else text)
+        LOG_INFO('命令耗时报告: {}.json'.format(prefix))
+        return prefix
+
+
+PROFILER = CommandProfiler()
@@ -0,0 +1,398 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+WebDriver 命令录制与回放
+录制: 包装 driver.command_executor, 把每条命令的参数和 chromedriver 的原始响应写入 gzip 压缩的 jsonl 磁带,
+      同一段js只在首次出现时保存全文, 之后按编号引用
+回放: ReplayWebDriver 不启动浏览器, 按磁带顺序直接返回录制的响应, 并与实际发出的命令逐条比对,
+      记录新增/缺少/参数变化的命令, 用于不开浏览器回归验证 BasePage / UIFrame 的重构
+设置环境变量 UITESTER_RECORD=<目录> 录制, UITESTER_REPLAY=<目录或磁带文件> 回放,
+UITESTER_REPLAY_STRICT=1 时出现偏差立即抛错
+"""
+import atexit
+import copy
+import glob
+import gzip
+import json
+import re
+import threading
+import time
+import selenium
+from selenium import webdriver
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from uitester.common.logger import *
+
+TAPE_VERSION = 1
+# 每次运行都会变化的脚本参数: 剩余超时毫秒数、分段读取源码的暂存token等, 比对时忽略具体值
+_VOLATILE_TOKEN = re.compile(r'^\d+-\d+-\d+$')
+_TEXT_TYPES = (type(u''), type(''))
+
+
+class ReplayError(WebDriverException):
+    # 回放时发出了磁带中没有的命令, 无法给出响应
+    pass
+
+
+def _volatile(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return '<number>'
+    if isinstance(value, _TEXT_TYPES) and _VOLATILE_TOKEN.match(value):
+        return '<token>'
+    return value
+
+
+def command_key(command, params):
+    """
+    命令比对用的键: 去掉 sessionId, 脚本参数中的数字和暂存token不参与比对
+    :return: type: tuple (command, 排序后的参数json)
+    """
+    params = dict(params or {})
+    params.pop('sessionId', None)
+    if isinstance(params.get('args'), list):
+        params['args'] = [_volatile(arg) for arg in params['args']]
+    return command, json.dumps(params, sort_keys=True)
+
+
+class CommandRecorder(object):
+    """
+    替换 driver.command_executor 的录制代理, 其余属性透传给原来的 RemoteConnection
+    :param executor: 原 command_executor
+    :param path: 磁带文件路径, 一般以 .jsonl.gz 结尾
+    :param header: 会话信息, 回放时用于构造 driver
+    """
+
+    def __init__(self, executor, path, header):
+        self._executor = executor
+        self.path = path
+        self.commands = 0
+        self._scripts = {}
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        self._file = gzip.open(path, 'wb')
+        header = dict(header, version=TAPE_VERSION)
+        self._write({'header': header})
+
+    def __getattr__(self, name):
+        return getattr(self._executor, name)
+
+    def _write(self, entry):
+        self._file.write((json.dumps(entry, sort_keys=True) + '\n').encode('utf-8'))
+
+    def execute(self, command, params):
+        try:
+            response = self._executor.execute(command, params)
+        except Exception as e:
+            self._record(command, params, error='{}: {}'.format(e.__class__.__name__, e))
+            raise
+        self._record(command, params, response=response)
+        return response
+
+    def _record(self, command, params, response=None, error=None):
+        params = dict(params or {})
+        params.pop('sessionId', None)
+        entry = {'c': command, 'p': params}
+        with self._lock:
+            if self._file is None:
+                return
+            script = params.get('script')
+            if isinstance(script, _TEXT_TYPES):
+                if script not in self._scripts:
+                    self._scripts[script] = len(self._scripts)
+                    self._write({'script': self._scripts[script], 'text': script})
+                params.pop('script')
+                entry['s'] = self._scripts[script]
+            if error is None:
+                entry['r'] = response
+            else:
+                entry['e'] = error
+            self._write(entry)
+            self.commands += 1
+
+    def mark(self, name):
+        # 用例边界, 回放时可直接定位到某个用例开始的位置; 同时把已录制的内容刷到磁盘
+        with self._lock:
+            if self._file is not None:
+                self._write({'mark': name})
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                LOG_DEBUG('命令录制完成: {}, 命令数: {}'.format(self.path, self.commands))
+
+
+class Tape(object):
+    # 读入内存的一盘磁带: header、命令列表和用例边界
+    def __init__(self, path):
+        self.path = path
+        self.header = {}
+        self.entries = []
+        self.marks = {}
+        scripts = {}
+        f = gzip.open(path, 'rb')
+        try:
+            for line in f:
+                entry = json.loads(line.decode('utf-8'))
+                if 'header' in entry:
+                    self.header = entry['header']
+                elif 'script' in entry:
+                    scripts[entry['script']] = entry['text']
+                elif 'mark' in entry:
+                    self.marks.setdefault(entry['mark'], len(self.entries))
+                else:
+                    if 's' in entry:
+                        entry['p']['script'] = scripts[entry.pop('s')]
+                    entry['key'] = command_key(entry['c'], entry['p'])
+                    self.entries.append(entry)
+        except (EOFError, IOError, ValueError) as e:
+            # 录制进程异常退出时磁带末尾不完整, 保留已读到的部分
+            LOG_WARN('磁带不完整, 已读取 {} 条命令: {}, {}'.format(len(self.entries), path, e))
+        finally:
+            f.close()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class ReplayExecutor(object):
+    """
+    回放用的 command_executor: 按顺序返回磁带中的响应
+    实际命令与磁带不一致时向后查找 lookahead 条内完全相同的命令, 中间跳过的记为 'missing';
+    找不到时同名命令记为 'changed' 并返回其录制的响应, 仍找不到记为 'unexpected' 并抛出 ReplayError
+    """
+
+    def __init__(self, session, tape):
+        self.session = session
+        self.tape = tape
+        self.cursor = 0
+        self.header = tape.header
+
+    def seek(self, test_id):
+        # 定位到用例开始的位置, 当前磁带没有该用例时在其余磁带中查找, 只回放部分用例时也能对齐
+        for other in [self.tape] + [other for other in self.session.tapes if other is not self.tape]:
+            if test_id in other.marks:
+                self.tape, self.cursor = other, other.marks[test_id]
+                return True
+        return False
+
+    def _match(self, key):
+        entries = self.tape.entries
+        end = min(self.cursor + self.session.lookahead, len(entries))
+        for index in range(self.cursor, end):
+            if entries[index]['key'] == key:
+                return index, None
+        for index in range(self.cursor, end):
+            if entries[index]['c'] == key[0]:
+                return index, 'changed'
+        return None, 'unexpected'
+
+    def execute(self, command, params):
+        key = command_key(command, params)
+        index, kind = self._match(key)
+        if index is None:
+            if command in ('quit', 'close'):
+                return {'value': None}
+            self.session.diverge(kind, self.tape, self.cursor, key, None)
+            raise ReplayError('回放磁带中没有对应的命令: {} {}'.format(command, key[1][:200]))
+        for skipped in range(self.cursor, index):
+            self.session.diverge('missing', self.tape, skipped, None, self.tape.entries[skipped]['key'])
+        entry = self.tape.entries[index]
+        if kind:
+            self.session.diverge(kind, self.tape, index, key, entry['key'])
+        self.cursor = index + 1
+        self.session.commands += 1
+        if 'e' in entry:
+            raise WebDriverException(entry['e'])
+        return copy.deepcopy(entry['r'])
+
+    def repeats(self, start):
+        # 录制时从 start 开始的一轮轮询之后是否还有下一轮
+        entries = self.tape.entries
+        return start < self.cursor < len(entries) and entries[self.cursor]['key'] == entries[start]['key']
+
+
+class ReplayWebDriver(webdriver.Remote):
+    """
+    不连接浏览器的 driver, 所有命令由 ReplayExecutor 按磁带回放
+    """
+
+    def __init__(self, executor):
+        super(ReplayWebDriver, self).__init__(command_executor=executor)
+
+    def start_session(self, capabilities, browser_profile=None):
+        # 会话信息取自磁带, 不发送 newSession
+        header = self.command_executor.header
+        self.session_id = header.get('session_id') or 'replay'
+        self.caps = header.get('capabilities') or {}
+        self.w3c = header.get('w3c', True)
+        if not isinstance(getattr(type(self), 'capabilities', None), property):
+            self.capabilities = self.caps
+
+    def replay_wait(self, condition, timeout):
+        """
+        代替 WebDriverWait: 不间隔地重复轮询, 磁带中没有下一轮相同的轮询时说明录制时在此超时
+        """
+        executor = self.command_executor
+        start = executor.cursor
+        while True:
+            result = condition(self)
+            if result:
+                return result
+            if not executor.repeats(start):
+                raise TimeoutException('replayed wait timed out after {}s'.format(timeout))
+
+    def execute_cdp_cmd(self, cmd, cmd_args):
+        return self.execute('executeCdpCommand', {'cmd': cmd, 'params': cmd_args})['value']
+
+    def get_log(self, log_type):
+        return self.execute('getLog', {'type': log_type})['value']
+
+
+class RecordReplay(object):
+    """
+    进程内的录制/回放入口, 由 UIFrame.create_driver 调用
+    :param record_dir: 录制目录, 每个新建的 driver 写一盘磁带
+    :param replay_path: 回放的磁带目录或单个磁带文件, 新建的第 n 个 driver 从第 n 盘磁带开始回放
+    :param strict: 回放出现偏差时是否立即抛 ReplayError
+    :param lookahead: 回放对齐时向后查找的命令数
+    """
+
+    def __init__(self, record_dir=None, replay_path=None, strict=None, lookahead=50):
+        if record_dir is None:
+            record_dir = os.environ.get('UITESTER_RECORD') or None
+        if replay_path is None:
+            replay_path = os.environ.get('UITESTER_REPLAY') or None
+        if strict is None:
+            strict = os.environ.get('UITESTER_REPLAY_STRICT', '') not in ('', '0')
+        self.record_dir = record_dir
+        self.replay_path = replay_path
+        self.strict = strict
+        self.lookahead = lookahead
+        self.commands = 0
+        self.divergences = []
+        self.current_test = None
+        self._tapes = None
+        self._recorders = []
+        self._created = 0
+        self._lock = threading.Lock()
+        self._registered = False
+
+    @property
+    def recording(self):
+        return bool(self.record_dir) and not self.replaying
+
+    @property
+    def replaying(self):
+        return bool(self.replay_path)
+
+    @property
+    def tapes(self):
+        if self._tapes is None:
+            if os.path.isdir(self.replay_path):
+                paths = sorted(glob.glob(os.path.join(self.replay_path, '*.jsonl.gz')))
+            else:
+                paths = [self.replay_path]
+            self._tapes = [Tape(path) for path in paths]
+            if not self._tapes:
+                raise ReplayError('没有可回放的磁带: {}'.format(self.replay_path))
+            LOG_INFO('加载回放磁带 {} 盘, 命令数: {}'.format(len(self._tapes), sum(len(tape) for tape in self._tapes)))
+        return self._tapes
+
+    def _register(self):
+        if not self._registered:
+            self._registered = True
+            atexit.register(self.finish)
+
+    def record(self, driver):
+        """
+        开始录制 driver 之后的所有命令, 未开启录制时原样返回
+        :return: driver
+        """
+        if not self.recording or isinstance(driver.command_executor, CommandRecorder):
+            return driver
+        with self._lock:
+            self._created += 1
+            path = os.path.join(self.record_dir, 'tape-{}-{:03d}.jsonl.gz'.format(os.getpid(), self._created))
+        header = {'session_id': driver.session_id, 'capabilities': driver.capabilities,
+                  'w3c': getattr(driver, 'w3c', True), 'selenium': selenium.__version__,
+                  'created': time.strftime('%Y-%m-%d %H:%M:%S')}
+        recorder = CommandRecorder(driver.command_executor, path, header)
+        driver.command_executor = recorder
+        self._recorders.append(recorder)
+        self._register()
+        LOG_INFO('开始录制WebDriver命令: {}'.format(path))
+        return driver
+
+    def replay_driver(self):
+        # 新建回放 driver, 第 n 个 driver 对应第 n 盘磁带, 超出时循环使用
+        with self._lock:
+            tape = self.tapes[self._created % len(self.tapes)]
+            self._created += 1
+        self._register()
+        LOG_INFO('回放磁带: {}'.format(tape.path))
+        return ReplayWebDriver(ReplayExecutor(self, tape))
+
+    def begin_test(self, driver, test_id):
+        # 录制时写入用例边界, 回放时定位到该用例
+        self.current_test = test_id
+        executor = getattr(driver, 'command_executor', None)
+        if isinstance(executor, CommandRecorder):
+            executor.mark(test_id)
+        elif isinstance(executor, ReplayExecutor) and not executor.seek(test_id):
+            self.diverge('unrecorded', executor.tape, executor.cursor, None, None)
+
+    def diverge(self, kind, tape, index, actual, expected):
+        """
+        :param kind: type: str e.g. 'missing': 录制过但未发出, 'changed': 同名命令参数不同,
+                     'unexpected': 发出了磁带中没有的命令, 'unrecorded': 磁带中没有该用例
+        """
+        divergence = {'test': self.current_test, 'kind': kind, 'tape': os.path.basename(tape.path), 'index': index,
+                      'actual': list(actual) if actual else None, 'expected': list(expected) if expected else None,
+                      'count': 1}
+        last = self.divergences[-1] if self.divergences else None
+        if last and all(last[field] == divergence[field] for field in ('test', 'kind', 'actual', 'expected')):
+            # 轮询等重复命令产生的相同偏差合并计数
+            last['count'] += 1
+            return
+        self.divergences.append(divergence)
+        if len(self.divergences) <= 20:
+            LOG_WARN('回放偏差 [{}] 用例: {}, 位置: {}, 实际: {}, 录制: {}'.format(
+                kind, self.current_test, index, actual and actual[0], expected and expected[0]))
+        if self.strict:
+            raise ReplayError('回放偏差 [{}]: {}'.format(kind, json.dumps(divergence, sort_keys=True)[:500]))
+
+    def report(self):
+        """
+        :return: type: dict e.g. {'commands': 120, 'divergences': 1, 'by_kind': {'changed': 1},
+                 'by_test': {'test_login': 1}, 'details': [...]}
+        """
+        by_kind, by_test = {}, {}
+        for divergence in self.divergences:
+            by_kind[divergence['kind']] = by_kind.get(divergence['kind'], 0) + divergence['count']
+            by_test[divergence['test']] = by_test.get(divergence['test'], 0) + divergence['count']
+        return {'commands': self.commands, 'divergences': sum(by_kind.values()), 'by_kind': by_kind,
+                'by_test': by_test, 'details': self.divergences}
+
+    def finish(self):
+        for recorder in self._recorders:
+            recorder.close()
+        if not self.replaying or self._tapes is None:
+            return
+        report = self.report()
+        directory = self.replay_path if os.path.isdir(self.replay_path) else os.path.dirname(self.replay_path)
+        path = os.path.join(directory or '.', 'replay-report.json')
+        try:
+            with open(path, 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+        except (IOError, OSError) as e:
+            LOG_DEBUG('ERROR [replay report]: {}'.format(e))
+        LOG_INFO('回放完成, 命令数: {}, 偏差数: {}, 报告: {}'.format(report['commands'], report['divergences'], path))
+
+
+RECORD_REPLAY = RecordReplay()
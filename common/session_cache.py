@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# encoding: utf-8
+import hashlib
+import json
+import os
+import time
+from uitester.common.logger import *
+
+SESSION_CACHE_DIR = os.environ.get('UITESTER_SESSION_CACHE') or \
+    os.path.join(os.path.dirname(LOG_DIR), '.session_cache')
+
+DUMP_STORAGE_JS = '''
+function dump(storage) {
+    var items = {};
+    for (var i = 0; i < storage.length; i++) {
+        var key = storage.key(i);
+        items[key] = storage.getItem(key);
+    }
+    return items;
+}
+return {origin: window.location.origin, local: dump(window.localStorage), session: dump(window.sessionStorage)};
+'''
+
+RESTORE_STORAGE_JS = '''
+var local = arguments[0], session = arguments[1], key;
+for (key in local) { window.localStorage.setItem(key, local[key]); }
+for (key in session) { window.sessionStorage.setItem(key, session[key]); }
+'''
+
+
+class SessionCache(object):
+    """
+    登录态缓存: 首次UI登录后把cookies和localStorage/sessionStorage保存到磁盘,
+    后续用例直接注入, 缓存超过 ttl 或有cookie过期时视为失效, 由调用方回退到UI登录
+    """
+
+    def __init__(self, cache_dir=SESSION_CACHE_DIR, ttl=3600):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+
+    def _path(self, username):
+        if not isinstance(username, bytes):
+            username = username.encode('utf-8')
+        name = hashlib.md5(username).hexdigest()
+        return os.path.join(self.cache_dir, name + '.json')
+
+    def save(self, driver, username):
+        try:
+            state = driver.execute_script(DUMP_STORAGE_JS)
+            data = {
+                'saved_at': time.time(),
+                'origin': state['origin'],
+                'cookies': driver.get_cookies(),
+                'local_storage': state['local'],
+                'session_storage': state['session'],
+            }
+            if not os.path.exists(self.cache_dir):
+                os.makedirs(self.cache_dir)
+            # 先写临时文件再替换, 并行的 worker 读取时不会读到写了一半的文件
+            path = self._path(username)
+            temp = '{}.{}.tmp'.format(path, os.getpid())
+            with open(temp, 'w') as f:
+                json.dump(data, f)
+            if hasattr(os, 'replace'):
+                os.replace(temp, path)
+            else:
+                if os.name == 'nt' and os.path.exists(path):
+                    os.remove(path)
+                os.rename(temp, path)
+            LOG_DEBUG('保存登录态缓存, 用户: {}, cookies数: {}'.format(username, len(data['cookies'])))
+        except Exception as e:
+            LOG_DEBUG('保存登录态缓存失败: {}'.format(e))
+
+    def load(self, username):
+        # 读取未过期的登录态, 过期或损坏时删除缓存文件并返回 None
+        path = self._path(username)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except ValueError:
+            self.invalidate(username)
+            return None
+        now = time.time()
+        expired = now - data.get('saved_at', 0) > self.ttl or \
+            any(cookie.get('expiry') and cookie['expiry'] < now for cookie in data.get('cookies', []))
+        if expired:
+            LOG_DEBUG('登录态缓存已过期, 用户: {}'.format(username))
+            self.invalidate(username)
+            return None
+        return data
+
+    def restore(self, driver, username):
+        """
+        向当前浏览器注入缓存的登录态并刷新页面
+        :return: type: bool 是否完成注入, 是否真正登录成功需调用方校验
+        """
+        data = self.load(username)
+        if not data:
+            return False
+        try:
+            if driver.execute_script('return window.location.origin;') != data['origin']:
+                driver.get(data['origin'])
+            for cookie in data['cookies']:
+                if 'expiry' in cookie:
+                    cookie['expiry'] = int(cookie['expiry'])
+                driver.add_cookie(cookie)
+            driver.execute_script(RESTORE_STORAGE_JS, data['local_storage'], data['session_storage'])
+            driver.refresh()
+            LOG_DEBUG('注入登录态缓存, 用户: {}'.format(username))
+            return True
+        except Exception as e:
+            LOG_DEBUG('注入登录态缓存失败: {}'.format(e))
+            return False
+
+    def invalidate(self, username):
+        try:
+            os.remove(self._path(username))
+        except OSError:
+            pass
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# encoding: utf-8
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from uitester.common.logger import *
+
+
+class LocatorWaitStats(object):
+    # 按定位统计显式等待实际耗费的时间
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.waits = {}
+
+    def record(self, loc, elapsed):
+        key = tuple(loc)
+        with self._lock:
+            count, total, longest = self.waits.get(key, (0, 0.0, 0.0))
+            self.waits[key] = (count + 1, total + elapsed, max(longest, elapsed))
+
+    def top(self, n=10):
+        """
+        :return: 总等待时间最长的 n 个定位 e.g. [{'loc': ('id', 'kw'), 'count': 3, 'total': 1.2, 'max': 0.8}]
+        """
+        items = sorted(self.waits.items(), key=lambda item: item[1][1], reverse=True)[:n]
+        return [{'loc': loc, 'count': count, 'total': round(total, 3), 'max': round(longest, 3)}
+                for loc, (count, total, longest) in items]
+
+
+WAIT_STATS = LocatorWaitStats()
+# WebDriver 规范的默认异步脚本超时(秒)
+DEFAULT_SCRIPT_TIMEOUT = 30
+
+
+class TimeoutManager(object):
+    """
+    统一管理一个 driver 的 implicit wait / 脚本超时和显式等待
+    selenium 会把 implicit wait 叠加到显式等待的每一次轮询里, 因此显式等待期间临时把 implicit wait 置0,
+    退出最外层显式等待时再恢复
+    """
+    _managers = weakref.WeakKeyDictionary()
+    _managers_lock = threading.Lock()
+
+    def __init__(self, driver):
+        self._driver = weakref.ref(driver)
+        self.implicit_wait = 0
+        self.script_timeout = None
+        self._applied_implicit = 0
+        self._depth = 0
+
+    @classmethod
+    def of(cls, driver):
+        # 每个 driver 对应唯一的 TimeoutManager
+        with cls._managers_lock:
+            manager = cls._managers.get(driver)
+            if manager is None:
+                manager = cls._managers[driver] = cls(driver)
+            return manager
+
+    @property
+    def driver(self):
+        return self._driver()
+
+    def set_implicit_wait(self, seconds):
+        self.implicit_wait = seconds
+        if self._depth == 0:
+            self._apply_implicit(seconds)
+
+    def _apply_implicit(self, seconds):
+        if self._applied_implicit != seconds:
+            self.driver.implicitly_wait(seconds)
+            self._applied_implicit = seconds
+
+    def _current_script_timeout(self):
+        # driver 当前的脚本超时, selenium 3 没有 driver.timeouts, 按默认值处理
+        try:
+            return self.driver.timeouts.script
+        except Exception as e:
+            LOG_DEBUG('ERROR [script timeout]: {}'.format(e))
+            return DEFAULT_SCRIPT_TIMEOUT
+
+    def ensure_script_timeout(self, seconds):
+        # 异步脚本超时只在需要变长时设置, 避免每次等待多一次请求; 首次调用时以 driver 当前值为起点, 不会调短
+        if self.script_timeout is None:
+            self.script_timeout = self._current_script_timeout()
+        if self.script_timeout < seconds:
+            self.driver.set_script_timeout(seconds)
+            self.script_timeout = seconds
+
+    @contextmanager
+    def explicit(self, loc=None):
+        """
+        显式等待上下文: 期间 implicit wait 为0, 并记录该定位实际等待的时间
+        :param loc: 元素定位, 为 None 时不计入统计
+        """
+        start = time.time()
+        if self._depth == 0:
+            self._apply_implicit(0)
+        self._depth += 1
+        try:
+            yield self
+        finally:
+            self._depth -= 1
+            if self._depth == 0:
+                try:
+                    self._apply_implicit(self.implicit_wait)
+                except Exception as e:
+                    LOG_DEBUG('恢复implicit wait失败: {}'.format(e))
+            if loc is not None:
+                WAIT_STATS.record(loc, time.time() - start)
@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+按 (页面类, loc) 持久化记录元素从开始等待到出现的耗时
+BasePage 据此为每个定位给出自适应的查找超时: 历史 p99 * margin, 限制在 [floor, ceiling] 之间;
+首轮等待超时的查找按所用超时记为删失样本(真实耗时至少为此值), 下次运行的超时随之放大, 本次运行内改用默认超时;
+每次运行结束时对比本次与历史的中位耗时, 明显变慢或出现超时的定位告警
+记录文件默认为 log/timings.json, 可通过 UITESTER_TIMINGS_FILE 指定
+"""
+import atexit
+import json
+import math
+import threading
+import time
+from contextlib import contextmanager
+from uitester.common.logger import *
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+TIMINGS_FILE = os.path.join(LOG_DIR, 'timings.json')
+
+
+@contextmanager
+def file_lock(path, timeout=10):
+    """
+    跨进程互斥锁, 锁文件为 path + '.lock'; 有 fcntl 时使用 flock, 否则以独占创建锁文件实现, 超时后视为残留锁删除
+    """
+    lock_path = path + '.lock'
+    if fcntl is not None:
+        with open(lock_path, 'a') as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        return
+    deadline = time.time() + timeout
+    while True:
+        try:
+            os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            break
+        except OSError:
+            if time.time() > deadline:
+                LOG_DEBUG('锁文件超时, 视为残留锁: {}'.format(lock_path))
+                try:
+                    os.remove(lock_path)
+                except OSError:
+                    pass
+                deadline = time.time() + timeout
+            time.sleep(0.05)
+    try:
+        yield
+    finally:
+        try:
+            os.remove(lock_path)
+        except OSError:
+            pass
+
+
+def percentile(values, q):
+    # 最近秩法, q 取值 0~100
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    index = max(int(math.ceil(q / 100.0 * len(ordered))) - 1, 0)
+    return ordered[min(index, len(ordered) - 1)]
+
+
+class TimingStore(object):
+    """
+    :param path: 历史记录文件
+    :param margin: 超时为历史 p99 的倍数
+    :param floor: 超时下限(秒)
+    :param ceiling: 超时上限(秒)
+    :param min_samples: 历史样本少于此数时使用页面的默认超时
+    :param max_samples: 每个定位保留的最近样本数
+    :param max_runs: 每个定位保留的最近运行汇总数
+    :param regression_ratio: 本次中位耗时超过历史中位耗时的倍数视为退化
+    :param regression_delta: 同时至少慢出的秒数, 避免毫秒级波动告警
+    """
+
+    def __init__(self, path=None, margin=3.0, floor=2.0, ceiling=30.0, min_samples=5, max_samples=50, max_runs=10,
+                 regression_ratio=1.5, regression_delta=0.5):
+        self.path = path or os.environ.get('UITESTER_TIMINGS_FILE') or TIMINGS_FILE
+        self.margin = margin
+        self.floor = floor
+        self.ceiling = ceiling
+        self.min_samples = min_samples
+        self.max_samples = max_samples
+        self.max_runs = max_runs
+        self.regression_ratio = regression_ratio
+        self.regression_delta = regression_delta
+        self._history = None
+        self._timeouts = {}
+        self._current = {}
+        # 本次运行中首轮等待超时的次数
+        self._missed = {}
+        self._lock = threading.Lock()
+        self._registered = False
+
+    @staticmethod
+    def key(page, loc):
+        # 页面类的完整名称 + 定位方式 + 定位值
+        if page is None:
+            name = ''
+        else:
+            cls = page if isinstance(page, type) else type(page)
+            name = '{}.{}'.format(cls.__module__, cls.__name__)
+        return '{}|{}|{}'.format(name, loc[0], loc[1])
+
+    def _load(self):
+        if self._history is None:
+            self._history = self._read()
+        return self._history
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path) as f:
+                return json.load(f).get('locators', {})
+        except (IOError, ValueError) as e:
+            LOG_DEBUG('ERROR [timing store]: {}'.format(e))
+            return {}
+
+    def timeout(self, page, loc, default):
+        """
+        :param default: 历史样本不足时使用的超时
+        :return: 该定位的查找超时(秒)
+        """
+        key = self.key(page, loc)
+        timeout = self._timeouts.get(key)
+        if timeout is None:
+            samples = self._load().get(key, {}).get('samples') or []
+            if len(samples) < self.min_samples:
+                timeout = default
+            else:
+                timeout = min(max(percentile(samples, 99) * self.margin, self.floor), self.ceiling)
+                LOG_DEBUG('自适应超时 {:.2f}s, 样本数: {}, loc: {}'.format(timeout, len(samples), key))
+            # 同一次运行内超时保持不变, 不受本次新增样本影响
+            self._timeouts[key] = timeout
+        if key in self._missed:
+            # 本次运行已按学到的超时等待失败过, 不再用更短的超时
+            return max(timeout, default)
+        return timeout
+
+    def record(self, page, loc, elapsed, missed=False):
+        """
+        记录一次查找的首轮等待耗时
+        :param missed: 首轮等待超时, elapsed 为所用的超时, 作为真实耗时的下限计入样本
+        """
+        key = self.key(page, loc)
+        with self._lock:
+            self._current.setdefault(key, []).append(round(elapsed, 3))
+            if missed:
+                self._missed[key] = self._missed.get(key, 0) + 1
+            if not self._registered:
+                self._registered = True
+                atexit.register(self.save)
+
+    def regressions(self, current=None, missed=None):
+        """
+        本次运行中变慢或首轮等待超时的定位
+        :param current: 本次运行的样本, 默认为尚未保存的样本
+        :param missed: 本次运行各定位的超时次数, 默认为尚未保存的记录
+        :return: type: list e.g. [{'key': 'pages.ListPage|id|grid', 'p50': 2.1, 'history_p50': 0.4, 'count': 3,
+                 'missed': 1}]
+        """
+        history = self._load()
+        missed = self._missed if missed is None else missed
+        result = []
+        for key, samples in (self._current if current is None else current).items():
+            previous = history.get(key, {}).get('samples') or []
+            if len(previous) < self.min_samples:
+                continue
+            current_p50, history_p50 = percentile(samples, 50), percentile(previous, 50)
+            slower = current_p50 > history_p50 * self.regression_ratio and \
+                current_p50 - history_p50 >= self.regression_delta
+            if slower or missed.get(key):
+                result.append({'key': key, 'p50': current_p50, 'history_p50': history_p50, 'count': len(samples),
+                               'missed': missed.get(key, 0)})
+        return sorted(result, key=lambda item: (item['missed'], item['p50'] - item['history_p50']), reverse=True)
+
+    def save(self):
+        # 本次样本追加到记录文件, 并行的 worker 各自追加
+        with self._lock:
+            current, self._current = self._current, {}
+            missed, self._missed = self._missed, {}
+        if not current:
+            return
+        for item in self.regressions(current, missed):
+            LOG_WARN('定位耗时退化: {}, 本次中位 {:.2f}s, 历史中位 {:.2f}s, 次数: {}, 首轮超时: {}'.format(
+                item['key'], item['p50'], item['history_p50'], item['count'], item['missed']))
+        try:
+            # 并行的 worker 同时退出时, 读取-合并-写回需互斥, 否则后写入的会覆盖先写入的样本
+            with file_lock(self.path):
+                history = self._merge(current, missed)
+        except (IOError, OSError) as e:
+            LOG_DEBUG('ERROR [timing store]: {}'.format(e))
+            return
+        self._history = history
+        LOG_DEBUG('保存定位耗时记录: {}, 定位数: {}'.format(self.path, len(current)))
+
+    def _merge(self, current, missed):
+        # 与文件中的最新内容合并后写回, 返回合并后的记录
+        history = self._read()
+        now = time.strftime('%Y-%m-%d %H:%M:%S')
+        for key, samples in current.items():
+            entry = history.setdefault(key, {'samples': [], 'runs': []})
+            entry['samples'] = (entry['samples'] + samples)[-self.max_samples:]
+            entry['runs'] = (entry['runs'] + [{'time': now, 'count': len(samples), 'missed': missed.get(key, 0),
+                                               'p50': percentile(samples, 50),
+                                               'p99': percentile(samples, 99)}])[-self.max_runs:]
+        temp = '{}.{}.tmp'.format(self.path, os.getpid())
+        with open(temp, 'w') as f:
+            json.dump({'version': 1, 'locators': history}, f, indent=1, sort_keys=True)
+        if hasattr(os, 'replace'):
+            os.replace(temp, self.path)
+        else:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            os.rename(temp, self.path)
+        return history
+
+
+TIMINGS = TimingStore()
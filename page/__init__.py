@@ -3,6 +3,7 @@
 import unittest
 
 import json
+from contextlib import contextmanager
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.select import Select
 from uitester.common.logger import *
@@ -13,63 +14,242 @@ from selenium.webdriver.chrome.options import Options
 from selenium.webdriver import ActionChains
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import *
+from uitester.page.finder import ElementFinder, ElementCache, PollingWait, MutationObserverWait, NoRetry, \
+    BackoffRetry, RefreshRetry, LOOKUP_STATS
+from uitester.page.scripts import READ_MANY_JS, SCROLL_INTO_VIEW_IF_NEEDED_JS, FILL_FORM_JS
+from uitester.common.profiler import PROFILER
+from uitester.common.artifacts import ARTIFACTS
+from uitester.common.timing_store import TIMINGS
+from uitester.page.locators import LOCATOR_COSTS
+from uitester.page.actions import ActionBatch
+from uitester.page.readiness import wait_for_ready
+from uitester.page.tabs import TabManager
+from uitester.page.source import extract_source, iter_page_source, save_page_source
+
+try:
+    text_type = unicode
+except NameError:
+    text_type = str
+
+
+def native_str(value):
+    # python2 中 WebDriver 返回 unicode, 转为 utf-8 编码的 str 与用例中的字符串比较; python3 的 str 原样返回
+    if text_type is not str and isinstance(value, text_type):
+        return value.encode('utf-8', errors='ignore')
+    return value
 
 
 class BasePage(object):
     # Page基类，所有其他Page全部继承此类,负责元素和driver方法的封装
+    # 查找超时后的重试策略, 子类可覆盖为 BackoffRetry / RefreshRetry
+    retry_policy = NoRetry()
+    # 等待策略, 可替换为 MutationObserverWait 在页面内事件驱动等待
+    wait_strategy = PollingWait(0.5)
+    # 页面默认的查找超时时间, 各方法 timeout 为 None 时使用
+    default_timeout = 10
+    # 定位耗时记录: 按历史耗时为每个定位计算查找超时(未指定 timeout 时), 设为 None 时固定使用 default_timeout
+    timing_store = TIMINGS
+    # 定位求值耗时预算(毫秒), 每个定位首次找到元素时在页面内测量一次, 超出时告警并给出 CSS/id 改写建议;
+    # None 时使用环境变量 UITESTER_LOCATOR_BUDGET, 0 表示关闭
+    locator_budget = None
+    # 操作前的滚动方式: 'viewport' 读操作不滚动, 原生点击/输入由 WebDriver 自行滚动,
+    # 鼠标类操作仅在元素中心不在视口内时滚动; 'always' 每次操作前都 scrollIntoView
+    scroll_mode = 'viewport'
+    # get 后等待页面就绪: readyState、fetch/XHR 空闲 ready_idle 秒、ready_hooks 全部满足, 超时只告警不抛错
+    # ready_hooks 为 FRAMEWORK_HOOKS 中的名称或js表达式 e.g. ['jquery', '!document.querySelector(".loading")']
+    # 默认关闭: driver.get 已按 pageLoadStrategy 等待加载, 查找元素也都是显式等待; 页面依赖异步请求渲染时开启
+    wait_ready = False
+    ready_timeout = 10
+    ready_idle = 0.5
+    ready_hooks = []
+    # 缓存 find_element 的结果, 跳转/刷新/切换frame时清空, 页面元素频繁重建时可关闭
+    cache_elements = True
+    cache_size = 256
+    # actions() 上下文中正在收集的动作批次
+    _batch = None
+
     def __init__(self, driver):
-        self.driver = driver
+        self.driver = PROFILER.instrument(driver)
+        self.finder = ElementFinder(driver, wait_strategy=self.wait_strategy, retry_policy=self.retry_policy,
+                                    timings=self.timing_store)
+        self.element_cache = ElementCache(self.cache_size) if self.cache_elements else None
+        # 当前所在的frame路径, 作为元素缓存键的一部分
+        self.frame_path = ()
+        # 已解析的frame元素, 键为 (父frame路径, loc)
+        self._frame_elements = {}
         self.read_config()
 
-        def read_config(self):
+    def read_config(self):
         pass
 
-    def find_element(self, loc, strict=False, timeout=10):
+    def scroll_into_view(self, ele, kind='pointer'):
+        """
+        按 scroll_mode 在操作元素前滚动
+        :param ele:
+        :param kind: type: str e.g. 'read': 只读取, 'native': WebDriver 原生 click/clear/send_keys,
+                     'pointer': ActionChains 鼠标操作, 不会自动滚动
+        :return:
+        """
+        if kind == 'pointer' and self._batch is not None:
+            # 批处理中鼠标动作在 perform 时才执行, 滚动也要排在它们之间, 否则会先滚动到最后一个元素
+            self._batch.scroll_to_element(ele)
+        elif self.scroll_mode == 'always':
+            self.driver.execute_script("arguments[0].scrollIntoView();", ele)
+        elif kind == 'pointer':
+            # 视口检查和滚动在同一次js调用内完成
+            self.driver.execute_script(SCROLL_INTO_VIEW_IF_NEEDED_JS, ele)
+
+    @contextmanager
+    def actions(self):
+        """
+        动作批处理: 上下文内 double_click/context_click/move_*/scroll 等方法只追加动作, 退出时一次 perform
+        e.g.
+            with page.actions() as batch:
+                page.move_to_element(loc=start)
+                batch.click_and_hold().move_by_offset(50, 0).move_by_offset(50, 20).release()
+        嵌套调用时复用外层批次, 上下文内抛出异常时丢弃已收集的动作
+        :return: ActionBatch
+        """
+        if self._batch is not None:
+            yield self._batch
+            return
+        self._batch = ActionBatch(self.driver)
+        try:
+            yield self._batch
+            self._batch.perform()
+        finally:
+            self._batch = None
+
+    def invalidate_cache(self, reason=None):
+        # 页面跳转/刷新后缓存的元素不再可用; 元素缓存按frame路径分开, 切换frame不需要清空
+        if self.element_cache is not None:
+            self.element_cache.invalidate(reason)
+        self._frame_elements.clear()
+
+    def _navigated(self, reason):
+        # 导航后 WebDriver 回到顶层文档
+        self.invalidate_cache(reason)
+        self.frame_path = ()
+
+    def _chain(self):
+        # 批处理中返回当前批次, 否则返回由调用方立即执行的新批次
+        return self._batch if self._batch is not None else ActionBatch(self.driver)
+
+    def _perform(self, actions):
+        if actions is not self._batch:
+            actions.perform()
+
+    def timeout_for(self, loc, timeout=None):
+        """
+        查找超时: 显式指定的 timeout 优先, 其次为 timing_store 按历史耗时给出的超时, 样本不足时为 default_timeout
+        """
+        if timeout is not None:
+            return timeout
+        if self.timing_store is None:
+            return self.default_timeout
+        return self.timing_store.timeout(self, loc, self.default_timeout)
+
+    def find_element(self, loc, strict=False, timeout=None, retry_policy=None):
         """
 
         :param loc:
         :param strict: type: bool e.g.True:若找不到元素直接抛错 , False:若找不到元素，日志打印报错，不抛错
+        :param timeout: 单次等待的超时时间, 默认按该定位的历史耗时计算, 见 timeout_for
+        :param retry_policy: 首轮等待超时后的重试策略, 默认使用页面的 retry_policy
         :return:
         """
+        timeout = self.timeout_for(loc, timeout)
+        if self.element_cache is not None:
+            ele = self.element_cache.get(self.frame_path, loc)
+            if ele is not None:
+                return ele
         try:
-            WebDriverWait(self.driver, timeout, 0.5).until(EC.presence_of_element_located(loc))
+            ele = self.finder.find(loc, timeout, retry_policy=retry_policy, page=self)
+            LOCATOR_COSTS.check(self.driver, self, loc, self.locator_budget)
+            if self.element_cache is not None:
+                self.element_cache.put(self.frame_path, loc, ele)
+            return ele
         except Exception as e:
-            LOG_DEBUG('[1] 页面未找到元素, loc: {}'.format(loc))
-        try:
-            WebDriverWait(self.driver, timeout, 0.5).until(EC.visibility_of_element_located(loc))
-            return self.driver.find_element(*loc)
-        except Exception as e:
-            LOG_DEBUG('[1] ERROR [find_element]: {}'.format(e))
-            LOG_DEBUG('[1] 页面未找到元素, loc: {}'.format(loc))
-        self.refresh()
-        time.sleep(8)
-        try:
-            WebDriverWait(self.driver, timeout, 0.5).until(EC.presence_of_element_located(loc))
-        except Exception as e:
-            LOG_DEBUG('[2] 页面未找到元素, loc: {}'.format(loc))
+            LOG_DEBUG('ERROR [find_element]: {}'.format(e))
+            LOG_DEBUG('页面未找到元素, loc: {}'.format(loc))
+            if strict:
+                raise e
+
+    def find_elements(self, loc, strict=False, timeout=None, retry_policy=None):
+        timeout = self.timeout_for(loc, timeout)
         try:
-            WebDriverWait(self.driver, timeout, 0.5).until(EC.visibility_of_element_located(loc))
-            return self.driver.find_element(*loc)
+            elements = self.finder.find(loc, timeout, multiple=True, retry_policy=retry_policy, page=self)
+            LOCATOR_COSTS.check(self.driver, self, loc, self.locator_budget)
+            return elements
         except Exception as e:
-            LOG_DEBUG('[2] ERROR [find_element]: {}'.format(e))
-            LOG_DEBUG('[2] 页面未找到元素, loc: {}'.format(loc))
+            LOG_DEBUG('ERROR [find_elements]: {}'.format(e))
+            LOG_DEBUG('页面未找到元素: {}'.format(loc))
             if strict:
                 raise e
 
-    def find_elements(self, loc, strict=False, timeout=10):
+    def wait_until_visible(self, loc, timeout=None):
+        """
+        等待元素出现且可见, 不重试
+        :return: WebElement, 超时返回 None
+        """
+        timeout = self.timeout_for(loc, timeout)
         try:
-            WebDriverWait(self.driver, timeout, 0.5).until(EC.presence_of_element_located(loc))
+            return self.finder.find(loc, timeout, retry_policy=NoRetry(), page=self)
         except Exception as e:
-            LOG_DEBUG('ERROR [find_element]: {}'.format(e))
-            LOG_DEBUG('页面未找到元素: {}'.format(loc))
+            LOG_DEBUG('等待元素可见超时, loc: {}, {}'.format(loc, e))
+            return None
+
+    def wait_until_invisible(self, loc, timeout=None):
+        """
+        等待元素消失或不可见
+        :return: type: bool
+        """
+        if timeout is None:
+            timeout = self.default_timeout
         try:
-            WebDriverWait(self.driver, timeout, 0.5).until(EC.visibility_of_element_located(loc))
-            return self.driver.find_elements(*loc)
+            self.finder.wait_gone(loc, timeout)
+            return True
         except Exception as e:
-            LOG_DEBUG('ERROR [find_elements]: {}'.format(e))
-            LOG_DEBUG('页面未找到元素: {}'.format(loc))
+            LOG_DEBUG('等待元素消失超时, loc: {}, {}'.format(loc, e))
+            return False
+
+    def read_many(self, loc=None, fields=None, ele=None, strict=False, timeout=None):
+        """
+        一次js调用批量读取所有匹配元素的文本/属性/状态
+        :param loc: 元素定位, 在页面内直接解析
+        :param fields: type: list e.g. ['text', 'displayed', 'enabled', 'selected', 'tag_name', 'value',
+                       'location', 'size', '@href'], '@'开头表示读取属性, 默认 ['text']
+        :param ele: type: list 已查找到的元素列表, 传入时忽略 loc
+        :param strict: 未匹配到任何元素时是否抛错
+        :param timeout: 首次读取无匹配时, 等待元素出现的超时时间, 0 表示不等待, 默认按该定位的历史耗时计算
+        :return: type: list of dict e.g. [{'text': 'abc', '@href': 'http://...'}]
+        """
+        fields = list(fields or ['text'])
+        if not (loc or ele):
+            LOG_ERROR('loc: {}, ele: {}, 请至少输入一个有效参数!'.format(loc, ele))
+            return []
+        by, value = (None, None) if ele else loc
+        try:
+            items = self.driver.execute_script(READ_MANY_JS, by, value, list(ele) if ele else None, fields)
+            if not items and not ele and timeout != 0:
+                elements = self.find_elements(loc, timeout=timeout)
+                if elements:
+                    items = self.driver.execute_script(READ_MANY_JS, None, None, elements, fields)
+        except Exception as e:
+            LOG_DEBUG('ERROR [read_many]: {}'.format(e))
             if strict:
                 raise e
+            return []
+        if not items:
+            LOG_DEBUG('页面未找到元素: {}'.format(loc))
+            if strict:
+                raise NoSuchElementException('no element matches: {}'.format(loc))
+            return []
+        for item in items:
+            for field, field_value in item.items():
+                item[field] = native_str(field_value)
+        LOG_DEBUG('批量读取元素 loc: {}, 字段: {}, 数量: {}'.format(loc, fields, len(items)))
+        return items
 
     def clear(self, loc=None, ele=None, strict=False):
         if not (loc or ele):
@@ -79,9 +259,9 @@ class BasePage(object):
                 ele = self.find_element(loc, strict=strict)
         if ele:
             try:
-                self.driver.execute_script("arguments[0].scrollIntoView();", ele)
+                self.scroll_into_view(ele, 'native')
                 ele.clear()
-                LOG_DEBUG('元素 loc: {} ,location: {} 清除输入框内容'.format(loc, ele.location))
+                LOG_DEBUG(lambda: '元素 loc: {} ,location: {} 清除输入框内容'.format(loc, ele.location))
             except Exception as e:
                 LOG_DEBUG('ERROR [clear]: {}'.format(e))
 
@@ -93,14 +273,81 @@ class BasePage(object):
                 ele = self.find_element(loc, strict=strict)
         if ele:
             try:
-                self.driver.execute_script("arguments[0].scrollIntoView();", ele)
+                self.scroll_into_view(ele, 'native')
                 ele.clear()
                 ele.send_keys(content)
-                LOG_DEBUG('在元素 loc: {} ,location: {} 输入内容: {}'.format(loc, ele.location, content))
+                LOG_DEBUG(lambda: '在元素 loc: {} ,location: {} 输入内容: {}'.format(loc, ele.location, content))
             except Exception as e:
                 LOG_DEBUG('ERROR [text_content]: {}'.format(e))
 
-    def click(self, loc=None, ele=None, strict=False, timeout=10):
+    def fill_form(self, fields, keystrokes=None, strict=False, timeout=None):
+        """
+        批量填写表单: 一次js调用定位并设置所有字段, 按元素类型触发 input/change 事件
+        :param fields: type: dict or list, 需要按顺序填写时传列表
+                       e.g. [((By.ID, 'name'), 'abc'), ((By.ID, 'agree'), True), ((By.ID, 'role'), 'admin')]
+                       输入框为文本, 下拉框为选项的 value 或可见文本(多选传列表), 复选框为 bool, 单选框为 bool 或同组的 value
+        :param keystrokes: type: list 需要真实键盘输入的字段定位, 批量设置之后逐个清空并 send_keys 输入
+        :param strict: 有字段填写失败时是否抛错
+        :param timeout: 字段首次未找到时的等待时间, 默认按各字段定位的历史耗时计算
+        :return: type: dict 填写失败的字段及原因, 全部成功时为空
+        """
+        fields = list(fields.items()) if isinstance(fields, dict) else list(fields)
+        keystrokes = [tuple(loc) for loc in keystrokes or []]
+        batch = [(loc, value) for loc, value in fields if tuple(loc) not in keystrokes]
+        errors = {}
+        if batch:
+            items = [{'by': loc[0], 'value': loc[1], 'element': None, 'val': value} for loc, value in batch]
+            results = None
+            retry = []
+            try:
+                results = self.driver.execute_script(FILL_FORM_JS, items)
+                missing = [index for index, result in enumerate(results) if result == 'not found']
+                if missing:
+                    # 首次未找到的字段等待出现后用元素重试
+                    for index in missing:
+                        ele = self.find_element(batch[index][0], timeout=timeout)
+                        if ele:
+                            items[index]['element'] = ele
+                            retry.append(index)
+                    if retry:
+                        retry_results = self.driver.execute_script(FILL_FORM_JS, [items[index] for index in retry])
+                        for index, result in zip(retry, retry_results):
+                            results[index] = result
+            except Exception as e:
+                LOG_DEBUG('ERROR [fill_form]: {}'.format(e))
+                if strict:
+                    raise e
+                # 只有未得到填写结果的字段记为失败
+                if results is None:
+                    results = [str(e)] * len(batch)
+                else:
+                    for index in retry:
+                        results[index] = str(e)
+            for (loc, value), result in zip(batch, results):
+                if result:
+                    errors[tuple(loc)] = result
+        for loc, value in fields:
+            if tuple(loc) not in keystrokes:
+                continue
+            try:
+                ele = self.find_element(loc, timeout=timeout)
+                if not ele:
+                    errors[tuple(loc)] = 'not found'
+                    continue
+                self.scroll_into_view(ele, 'native')
+                ele.clear()
+                ele.send_keys(value)
+            except Exception as e:
+                LOG_DEBUG('ERROR [fill_form]: {}, loc: {}'.format(e, loc))
+                if strict:
+                    raise e
+                errors[tuple(loc)] = str(e)
+        LOG_DEBUG('批量填写表单, 字段数: {}, 键盘输入: {}, 失败: {}'.format(len(fields), len(keystrokes), errors))
+        if errors and strict:
+            raise WebDriverException('fill_form failed: {}'.format(errors))
+        return errors
+
+    def click(self, loc=None, ele=None, strict=False, timeout=None):
         if not (loc or ele):
             LOG_ERROR('loc: {}, ele: {}, 请至少输入一个有效参数!'.format(loc, ele))
         else:
@@ -108,9 +355,9 @@ class BasePage(object):
                 ele = self.find_element(loc, strict=strict, timeout=timeout)
         if ele:
             try:
-                self.driver.execute_script("arguments[0].scrollIntoView();", ele)
+                self.scroll_into_view(ele, 'native')
                 ele.click()
-                LOG_DEBUG('单击元素 loc: {} ,location: {}'.format(loc, ele.location))
+                LOG_DEBUG(lambda: '单击元素 loc: {} ,location: {}'.format(loc, ele.location))
             except Exception as e:
                 LOG_DEBUG('ERROR [click]: {}'.format(e))
 
@@ -122,11 +369,11 @@ class BasePage(object):
                 ele = self.find_element(loc, strict=strict)
         if ele:
             try:
-                self.driver.execute_script("arguments[0].scrollIntoView();", ele)
-                actions = ActionChains(self.driver)
+                self.scroll_into_view(ele, 'pointer')
+                actions = self._chain()
                 actions.double_click(ele)
-                actions.perform()
-                LOG_DEBUG('双击元素 loc: {} ,location: {}'.format(loc, ele.location))
+                self._perform(actions)
+                LOG_DEBUG(lambda: '双击元素 loc: {} ,location: {}'.format(loc, ele.location))
             except Exception as e:
                 LOG_DEBUG('ERROR [double_click]: {}'.format(e))
 
@@ -138,26 +385,78 @@ class BasePage(object):
                 ele = self.find_element(loc, strict=strict)
         if ele:
             try:
-                self.driver.execute_script("arguments[0].scrollIntoView();", ele)
-                actions = ActionChains(self.driver)
+                self.scroll_into_view(ele, 'pointer')
+                actions = self._chain()
                 actions.context_click(ele)
-                actions.perform()
-                LOG_DEBUG('右键单击元素 loc: {} ,location: {}'.format(loc, ele.location))
+                self._perform(actions)
+                LOG_DEBUG(lambda: '右键单击元素 loc: {} ,location: {}'.format(loc, ele.location))
             except Exception as e:
                 LOG_DEBUG('ERROR [context_click]: {}'.format(e))
 
-        def get_page_source(self):
+    def get_page_source(self, loc=None, ele=None, mode='html', strict=False):
+        """
+        获取页面源码
+        :param loc: 传入 loc 或 ele 时只在页面内提取该元素子树, 不传输整页
+        :param ele:
+        :param mode: type: str e.g. 'html': outerHTML, 'text': 可见文本
+        :return: utf-8 编码的内容, 失败返回 ''
+        """
         try:
-            page_content = self.driver.page_source
+            if not (loc or ele) and mode == 'html':
+                page_content = self.driver.page_source
+            else:
+                page_content = extract_source(self.driver, loc=loc, ele=ele, mode=mode)
+                if page_content is None and loc and not ele:
+                    # 元素尚未出现, 等待后再提取
+                    ele = self.find_element(loc, strict=strict)
+                    page_content = extract_source(self.driver, ele=ele, mode=mode) if ele else None
+                if page_content is None:
+                    LOG_DEBUG('页面未找到元素: {}'.format(loc))
+                    return ''
             LOG_DEBUG('获取当前页面源码成功')
-            if isinstance(page_content, unicode):
-                page_content = page_content.encode('utf-8', errors='ignore')
+            page_content = native_str(page_content)
             return page_content
         except Exception as e:
-            LOG_DEBUG('获取当前页面源码失败')
+            LOG_DEBUG('获取当前页面源码失败: {}'.format(e))
+            if strict:
+                raise e
             return ''
 
+    def get_dom_snapshot(self, loc=None, ele=None, max_depth=None, max_text=200, max_nodes=5000):
+        """
+        在页面内生成精简的结构快照, 只包含标签/id/class/自身文本, 比整页源码小得多
+        :return: type: list of dict e.g. [{'tag': 'div', 'depth': 0, 'id': 'app', 'class': 'main', 'text': '...'}]
+        """
+        try:
+            nodes = extract_source(self.driver, loc=loc, ele=ele, mode='snapshot', max_depth=max_depth,
+                                   max_text=max_text, max_nodes=max_nodes)
+            LOG_DEBUG(lambda: '获取页面结构快照 loc: {}, 节点数: {}'.format(loc, len(nodes or [])))
+            return nodes or []
+        except Exception as e:
+            LOG_DEBUG('ERROR [get_dom_snapshot]: {}'.format(e))
+            return []
+
+    def iter_page_source(self, chunk_size=256 * 1024):
+        # 分段读取整页源码, 逐段返回 utf-8 编码的内容
+        return iter_page_source(self.driver, chunk_size)
+
+    def save_page_source(self, filepath, chunk_size=256 * 1024):
+        """
+        分段读取整页源码并写入文件, 不在内存中拼接整页内容
+        :return: 写入的字节数, 失败返回 0
+        """
+        try:
+            written = save_page_source(self.driver, filepath, chunk_size)
+            LOG_DEBUG('保存页面源码成功: {}, 大小: {}'.format(filepath, written))
+            return written
+        except Exception as e:
+            LOG_DEBUG('ERROR [save_page_source]: {}'.format(e))
+            return 0
+
     def get_attribute(self, name, loc=None, ele=None, strict=False):
+        if isinstance(ele, (list, tuple)):
+            field = '@' + name
+            return [item[field] for item in self.read_many(ele=ele, fields=[field])]
         if not (loc or ele):
             LOG_ERROR('loc: {}, ele: {}, 请至少输入一个有效参数!'.format(loc, ele))
         else:
@@ -165,17 +464,18 @@ class BasePage(object):
                 ele = self.find_element(loc, strict=strict)
         if ele:
             try:
-                self.driver.execute_script("arguments[0].scrollIntoView();", ele)
+                self.scroll_into_view(ele, 'read')
                 value = ele.get_attribute(name)
-                if isinstance(value, unicode):
-                    value = value.encode('utf-8', errors='ignore')
-                LOG_DEBUG('获取元素 loc: {} ,location: {} ,属性名: {},属性值: {}'.format(loc, ele.location, name, value))
+                value = native_str(value)
+                LOG_DEBUG(lambda: '获取元素 loc: {} ,location: {} ,属性名: {},属性值: {}'.format(loc, ele.location, name, value))
                 return value
             except Exception as e:
                 LOG_DEBUG('ERROR [get_attribute]: {}'.format(e))
                 return ''
 
     def is_selected(self, loc=None, ele=None, strict=False):
+        if isinstance(ele, (list, tuple)):
+            return [item['selected'] for item in self.read_many(ele=ele, fields=['selected'])]
         if not (loc or ele):
             LOG_ERROR('loc: {}, ele: {}, 请至少输入一个有效参数!'.format(loc, ele))
         else:
@@ -183,15 +483,17 @@ class BasePage(object):
                 ele = self.find_element(loc, strict=strict)
         if ele:
             try:
-                self.driver.execute_script("arguments[0].scrollIntoView();", ele)
+                self.scroll_into_view(ele, 'read')
                 selected_flag = ele.is_selected()
-                LOG_DEBUG('元素 loc: {} ,location: {} 是否被选中: {}'.format(loc, ele.location, selected_flag))
+                LOG_DEBUG(lambda: '元素 loc: {} ,location: {} 是否被选中: {}'.format(loc, ele.location, selected_flag))
                 return selected_flag
             except Exception as e:
                 LOG_DEBUG('ERROR [is_selected]: {}'.format(e))
                 return False
 
     def is_enabled(self, loc=None, ele=None, strict=False):
+        if isinstance(ele, (list, tuple)):
+            return [item['enabled'] for item in self.read_many(ele=ele, fields=['enabled'])]
         if not (loc or ele):
             LOG_ERROR('loc: {}, ele: {}, 请至少输入一个有效参数!'.format(loc, ele))
         else:
@@ -199,15 +501,17 @@ class BasePage(object):
                 ele = self.find_element(loc, strict=strict)
         if ele:
             try:
-                self.driver.execute_script("arguments[0].scrollIntoView();", ele)
+                self.scroll_into_view(ele, 'read')
                 enabled_flag = ele.is_enabled()
-                LOG_DEBUG('元素 loc: {} ,location: {} 是否可点击: {}'.format(loc, ele.location, enabled_flag))
+                LOG_DEBUG(lambda: '元素 loc: {} ,location: {} 是否可点击: {}'.format(loc, ele.location, enabled_flag))
                 return enabled_flag
             except Exception as e:
                 LOG_DEBUG('ERROR [is_enabled]: {}'.format(e))
                 return False
 
     def is_displayed(self, loc=None, ele=None, strict=False):
+        if isinstance(ele, (list, tuple)):
+            return [item['displayed'] for item in self.read_many(ele=ele, fields=['displayed'])]
         if not (loc or ele):
             LOG_ERROR('loc: {}, ele: {}, 请至少输入一个有效参数!'.format(loc, ele))
         else:
@@ -215,20 +519,36 @@ class BasePage(object):
                 ele = self.find_element(loc, strict=strict)
         if ele:
             try:
-                self.driver.execute_script("arguments[0].scrollIntoView();", ele)
+                self.scroll_into_view(ele, 'read')
                 displayed_flag = ele.is_displayed()
-                LOG_DEBUG('元素 loc: {} ,location: {} 是否可见: {}'.format(loc, ele.location, displayed_flag))
+                LOG_DEBUG(lambda: '元素 loc: {} ,location: {} 是否可见: {}'.format(loc, ele.location, displayed_flag))
                 return displayed_flag
             except Exception as e:
                 LOG_DEBUG('ERROR [is_displayed]: {}'.format(e))
                 return False
 
-    def screenshot(self, filepath):
-        success_flag = self.driver.save_screenshot(filepath)
-        if success_flag:
+    def screenshot(self, filepath, wait=True):
+        """
+        截图, 图片由后台线程写入 filepath
+        :param wait: 是否等待图片写入完成后返回, False 时返回后文件可能尚未写完
+        :return: 图片路径, 截图失败返回 None
+        """
+        try:
+            filepath = ARTIFACTS.save_screenshot(self.driver, filepath)
+            if wait:
+                ARTIFACTS.flush()
             LOG_DEBUG('截图成功, 图片路径: {}'.format(filepath))
-        else:
-            LOG_DEBUG('截图失败!')
+            return filepath
+        except Exception as e:
+            LOG_DEBUG('截图失败: {}'.format(e))
+            return None
+
+    def capture_artifacts(self, name, screenshot=True, page_source=True, console=True):
+        """
+        保存当前页面现场(截图/源码/控制台日志)到 ARTIFACTS.output_dir, 用于记录步骤
+        :return: type: list 文件路径
+        """
+        return ARTIFACTS.capture(self.driver, name, screenshot=screenshot, page_source=page_source, console=console)
 
     def submit(self, loc=None, ele=None, strict=False):
         if not (loc or ele):
@@ -238,9 +558,9 @@ class BasePage(object):
                 ele = self.find_element(loc, strict=strict)
         if ele:
             try:
-                self.driver.execute_script("arguments[0].scrollIntoView();", ele)
+                self.scroll_into_view(ele, 'native')
                 ele.submit()
-                LOG_DEBUG('元素 loc: {} ,location: {}, 提交表单'.format(loc, ele.location))
+                LOG_DEBUG(lambda: '元素 loc: {} ,location: {}, 提交表单'.format(loc, ele.location))
             except Exception as e:
                 LOG_DEBUG('表单提交失败')
                 raise e
@@ -249,9 +569,11 @@ class BasePage(object):
         """
         获取两个标签之间的文本信息
         :param loc:
-        :param ele:
+        :param ele: 传入元素列表时通过 read_many 批量读取, 返回文本列表
         :return: text
         """
+        if isinstance(ele, (list, tuple)):
+            return [item['text'].strip() for item in self.read_many(ele=ele, fields=['text'])]
         if not (loc or ele):
             LOG_ERROR('loc: {}, ele: {}, 请至少输入一个有效参数!'.format(loc, ele))
         else:
@@ -259,17 +581,16 @@ class BasePage(object):
                 ele = self.find_element(loc, strict=strict)
         if ele:
             try:
-                self.driver.execute_script("arguments[0].scrollIntoView();", ele)
+                self.scroll_into_view(ele, 'read')
                 text = ele.text
-                if isinstance(text, unicode):
-                    text = text.encode('utf-8', errors='ignore')
-                LOG_DEBUG('元素 loc: {} ,location: {}, 获取文本信息为: {}'.format(loc, ele.location, text))
+                text = native_str(text)
+                LOG_DEBUG(lambda: '元素 loc: {} ,location: {}, 获取文本信息为: {}'.format(loc, ele.location, text))
                 return text.strip()
             except Exception as e:
                 LOG_DEBUG('获取文本信息失败: {}'.format(e))
                 return ''
 
-        def move_by_offset(self, xoffset=0, yoffset=0):
+    def move_by_offset(self, xoffset=0, yoffset=0):
         """
         移动到指定坐标
         :param xoffset:
@@ -278,9 +599,9 @@ class BasePage(object):
         """
         try:
             LOG_DEBUG('移动到坐标 x:{}, y:{}'.format(xoffset, yoffset))
-            actions = ActionChains(self.driver)
+            actions = self._chain()
             actions.move_by_offset(xoffset, yoffset)
-            actions.perform()
+            self._perform(actions)
         except Exception as e:
             LOG_DEBUG('移动坐标失败: {}'.format(e))
 
@@ -296,7 +617,7 @@ class BasePage(object):
             LOG_DEBUG('action: {}参数错误, 可选参数为: {}'.format(action, action_select))
         try:
             LOG_DEBUG('移动到坐标 x:{}, y:{}, 点击坐标'.format(xoffset, yoffset))
-            actions = ActionChains(self.driver)
+            actions = self._chain()
             actions.move_by_offset(xoffset, yoffset)
             if action == 'click':
                 actions.click()
@@ -306,7 +627,7 @@ class BasePage(object):
                 actions.context_click()
             else:
                 pass
-            actions.perform()
+            self._perform(actions)
         except Exception as e:
             LOG_DEBUG('移动坐标失败: {}'.format(e))
 
@@ -318,12 +639,12 @@ class BasePage(object):
                 ele = self.find_element(loc, strict=strict)
         if ele:
             try:
-                self.driver.execute_script("arguments[0].scrollIntoView();", ele)
-                LOG_DEBUG('移动到坐标 {}'.format(ele.location))
-                actions = ActionChains(self.driver)
+                self.scroll_into_view(ele, 'pointer')
+                LOG_DEBUG(lambda: '移动到坐标 {}'.format(ele.location))
+                actions = self._chain()
                 LOG_DEBUG('移动当前坐标的相对坐标 x: {}, y: {}'.format(xoffset, yoffset))
                 actions.move_to_element_with_offset(ele, xoffset, yoffset)
-                actions.perform()
+                self._perform(actions)
             except Exception as e:
                 LOG_DEBUG('移动坐标失败: {}'.format(e))
 
@@ -339,9 +660,9 @@ class BasePage(object):
             if action not in action_select:
                 LOG_DEBUG('action: {}参数错误, 可选参数为: {}'.format(action, action_select))
             try:
-                self.driver.execute_script("arguments[0].scrollIntoView();", ele)
-                LOG_DEBUG('移动到坐标 {}'.format(ele.location))
-                actions = ActionChains(self.driver)
+                self.scroll_into_view(ele, 'pointer')
+                LOG_DEBUG(lambda: '移动到坐标 {}'.format(ele.location))
+                actions = self._chain()
                 LOG_DEBUG('移动当前坐标的相对坐标 x: {}, y: {}, 点击坐标'.format(xoffset, yoffset))
                 actions.move_to_element_with_offset(ele, xoffset, yoffset)
                 if action == 'click':
@@ -352,7 +673,7 @@ class BasePage(object):
                     actions.context_click()
                 else:
                     pass
-                actions.perform()
+                self._perform(actions)
             except Exception as e:
                 LOG_DEBUG('移动坐标失败: {}'.format(e))
 
@@ -364,11 +685,11 @@ class BasePage(object):
                 ele = self.find_element(loc, strict=strict)
         if ele:
             try:
-                self.driver.execute_script("arguments[0].scrollIntoView();", ele)
-                LOG_DEBUG('移动到 loc: {} ,location: {}'.format(loc, ele.location))
-                actions = ActionChains(self.driver)
+                self.scroll_into_view(ele, 'pointer')
+                LOG_DEBUG(lambda: '移动到 loc: {} ,location: {}'.format(loc, ele.location))
+                actions = self._chain()
                 actions.move_to_element(ele)
-                actions.perform()
+                self._perform(actions)
             except Exception as e:
                 LOG_DEBUG('移动坐标失败: {}'.format(e))
 
@@ -383,9 +704,9 @@ class BasePage(object):
             if action not in action_select:
                 LOG_DEBUG('action: {}参数错误, 可选参数为: {}'.format(action, action_select))
             try:
-                self.driver.execute_script("arguments[0].scrollIntoView();", ele)
-                LOG_DEBUG('移动到 loc: {} ,location: {}, 点击坐标'.format(loc, ele.location))
-                actions = ActionChains(self.driver)
+                self.scroll_into_view(ele, 'pointer')
+                LOG_DEBUG(lambda: '移动到 loc: {} ,location: {}, 点击坐标'.format(loc, ele.location))
+                actions = self._chain()
                 actions.move_to_element(ele)
                 if action == 'click':
                     actions.click()
@@ -395,11 +716,11 @@ class BasePage(object):
                     actions.context_click()
                 else:
                     pass
-                actions.perform()
+                self._perform(actions)
             except Exception as e:
                 LOG_DEBUG('移动坐标失败: {}'.format(e))
 
-        def swithc_to_alert(self, action='accept', text=''):
+    def swithc_to_alert(self, action='accept', text=''):
         # 警告框处理
         try:
             alert_label = {
@@ -424,20 +745,29 @@ class BasePage(object):
             LOG_DEBUG('执行js语句失败: {}'.format(e))
             return None
 
-    def get(self, url):
+    def get(self, url, wait_ready=None):
+        """
+        :param wait_ready: 是否等待页面就绪, 默认使用页面的 wait_ready
+        :return: type: bool 页面是否就绪, 不等待时为 True
+        """
         LOG_DEBUG('跳转到url: {}'.format(url))
-        self.driver.get(url)
+        self._navigated('get')
+        if not (self.wait_ready if wait_ready is None else wait_ready):
+            self.driver.get(url)
+            return True
+        return wait_for_ready(self.driver, url, lambda: self.driver.get(url), timeout=self.ready_timeout,
+                              idle=self.ready_idle, hooks=self.ready_hooks)
 
     def get_title(self):
         title_content = self.driver.title
-        if isinstance(title_content, unicode):
-            title_content = title_content.encode('utf-8', errors='ignore')
+        title_content = native_str(title_content)
         LOG_DEBUG('获取当前页标题: {}'.format(title_content))
         return title_content
 
     def close(self):
         LOG_DEBUG('关闭窗口')
         self.driver.close()
+        TabManager.of(self.driver).invalidate()
 
     def quit(self):
         LOG_DEBUG('关闭窗口')
@@ -448,29 +778,30 @@ class BasePage(object):
         self.driver.maximize_window()
 
     def back(self):
+        self._navigated('back')
         LOG_DEBUG('页面回退')
         self.driver.back()
 
     def forward(self):
+        self._navigated('forward')
         LOG_DEBUG('页面前进')
         self.driver.forward()
 
     def refresh(self):
+        self._navigated('refresh')
         LOG_DEBUG('页面刷新')
         self.driver.refresh()
 
     def get_cookies(self):
         cookies_content = self.driver.get_cookies()
-        if isinstance(cookies_content, unicode):
-            cookies_content = cookies_content.encode('utf-8', errors='ignore')
+        cookies_content = native_str(cookies_content)
         LOG_DEBUG('获取所有cookies: {}'.format(cookies_content))
         return cookies_content
 
     def get_cookie(self, name):
         try:
             value = self.get_cookie(name)
-            if isinstance(value, unicode):
-                value = value.encode('utf-8', errors='ignore')
+            value = native_str(value)
             LOG_DEBUG('获取指定cookie: 名称: {}, 值: {}'.format(name, value))
             return value
         except Exception as e:
@@ -484,8 +815,7 @@ class BasePage(object):
     def get_alert_text(self):
         # 获取弹窗内容
         text = self.driver.switch_to.alert.text
-        if isinstance(text, unicode):
-            text = text.encode('utf-8', errors='ignore')
+        text = native_str(text)
         LOG_DEBUG('弹窗内容为: {}'.format(text))
 
     def accept_alert(self):
@@ -512,7 +842,7 @@ class BasePage(object):
         except Exception as e:
             LOG_DEBUG('向弹窗输入内容失败: {}'.format(e))
 
-        def choice_select(self, by_type, text, loc=None, ele=None, strict=False):
+    def choice_select(self, by_type, text, loc=None, ele=None, strict=False):
         """
         选择select标签下拉框
         :param by_type: type: str e.g. 'index', 'value', 'visible_text'
@@ -533,7 +863,7 @@ class BasePage(object):
                 if not ele:
                     ele = self.find_element(loc, strict=strict)
             try:
-                self.driver.execute_script("arguments[0].scrollIntoView();", ele)
+                self.scroll_into_view(ele, 'native')
                 select = Select(ele)
                 function_map = {
                     'index': select.select_by_index,
@@ -563,42 +893,128 @@ class BasePage(object):
                 if not (loc or ele):
                     LOG_ERROR('loc: {}, ele: {}, 请至少输入一个有效参数!'.format(loc, ele))
                 else:
-                    if not ele:
-                        ele = self.find_element(loc, strict=strict)
                     try:
-                        self.driver.switch_to.frame(ele)
+                        self._switch_into(ele if ele else tuple(loc))
                         LOG_DEBUG('切换frame成功')
                     except Exception as e:
                         LOG_DEBUG('切换frame失败: {}'.format(e))
+                        if strict:
+                            raise e
             else:
                 try:
-                    self.driver.switch_to.frame(text)
+                    self._switch_into(text)
                     LOG_DEBUG('切换frame成功')
                 except Exception as e:
                     LOG_DEBUG('切换frame失败: {}'.format(e))
 
+    def _frame_element(self, loc, refresh=False):
+        # 按 (父frame路径, loc) 缓存frame元素, 重新进入同一frame时不再查找
+        key = (self.frame_path, loc)
+        ele = None if refresh else self._frame_elements.get(key)
+        if ele is None:
+            ele = self.find_element(loc, strict=True)
+            self._frame_elements[key] = ele
+        return ele
+
+    def _switch_into(self, reference):
+        """
+        从当前frame进入子frame, 成功后记录到 frame_path
+        :param reference: loc 元组、已查找到的元素、frame下标或 name/id
+        """
+        if not isinstance(reference, tuple):
+            self.driver.switch_to.frame(reference)
+        else:
+            try:
+                self.driver.switch_to.frame(self._frame_element(reference))
+            except (StaleElementReferenceException, NoSuchFrameException) as e:
+                # frame 被重建, 重新查找后再试一次
+                LOG_DEBUG('缓存的frame元素已失效, 重新查找, loc: {}, {}'.format(reference, e.__class__.__name__))
+                self.driver.switch_to.frame(self._frame_element(reference, refresh=True))
+        self.frame_path = self.frame_path + (reference,)
+
+    def switch_to_frame_path(self, path):
+        """
+        切换到从主文档开始的frame路径, 与当前路径相同的前缀部分不重复切换
+        回到公共前缀时在逐级 parent_frame 和 default_content 后重新进入之间取切换次数少的方式
+        :param path: type: list e.g. [('id', 'outer'), ('css', 'iframe.editor')], 元素也可以是frame下标或 name/id,
+                     空列表表示主文档
+        :return:
+        """
+        path = tuple(tuple(item) if isinstance(item, list) else item for item in path)
+        if path == self.frame_path:
+            return
+        common = 0
+        for current, target in zip(self.frame_path, path):
+            if current != target:
+                break
+            common += 1
+        up = len(self.frame_path) - common
+        if up > common + 1:
+            self.switch_to_default_content()
+            common = 0
+        else:
+            for _ in range(up):
+                self.switch_to_parent_frame()
+        for reference in path[common:]:
+            self._switch_into(reference)
+        LOG_DEBUG('切换到frame路径: {}'.format(list(path)))
+
+    @contextmanager
+    def in_frame(self, *path):
+        """
+        在指定frame路径内执行, 退出时回到进入前的frame
+        e.g.
+            with page.in_frame(('id', 'outer'), ('css', 'iframe.editor')):
+                page.input_text(loc, 'text')
+        路径从主文档开始, 嵌套使用时同样写完整路径, 已处于目标frame时不切换, frame元素在页面跳转前只查找一次
+        :param path: frame 的 loc, 也可以是frame下标或 name/id
+        :return:
+        """
+        previous = self.frame_path
+        try:
+            self.switch_to_frame_path(path)
+            yield self
+        finally:
+            self.switch_to_frame_path(previous)
+
     def switch_to_parent_frame(self):
         LOG_DEBUG('切换到父frame')
         self.driver.switch_to.parent_frame()
+        self.frame_path = self.frame_path[:-1]
 
     def switch_to_default_content(self):
         LOG_DEBUG('切换到主文档')
         self.driver.switch_to.default_content()
+        self.frame_path = ()
 
     def scroll(self, key='end', loc=None, ele=None, strict=False, position=None, action='click'):
+        """
+        点击元素/坐标/当前位置获取焦点后按翻页键, 点击和按键合并为一次 perform
+        :param key: type: str e.g. 'end', 'home', 'page_up', 'page_down'
+        """
         key_select = ['end', 'home', 'page_up', 'page_down']
         if key not in key_select:
             LOG_ERROR('参数key: {}输入错误, 可选有效参数为: {}'.format(key, key_select))
+            return
         key_map = {
             'end': Keys.END,
             'home': Keys.HOME,
             'page_up': Keys.PAGE_UP,
             'page_down': Keys.PAGE_DOWN
         }
-        if loc or ele:
-            self.move_to_element_and_click(loc=loc, ele=ele, strict=strict, action=action)
-        elif position:
-            self.move_by_offset_and_click(xoffset=position[0], yoffset=position[1], action=action)
-        else:
-            pass
-            # actions = ActionChains(self.driver)
+        try:
+            with self.actions() as actions:
+                if loc or ele:
+                    self.move_to_element_and_click(loc=loc, ele=ele, strict=strict, action=action)
+                elif position:
+                    self.move_by_offset_and_click(xoffset=position[0], yoffset=position[1], action=action)
+                elif action == 'click':
+                    actions.click()
+                elif action == 'double_click':
+                    actions.double_click()
+                elif action == 'context_click':
+                    actions.context_click()
+                actions.key_down(key_map[key])
+                actions.key_up(key_map[key])
+        except Exception as e:
+            LOG_DEBUG('ERROR [scroll]: {}'.format(e))
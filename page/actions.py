@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# encoding: utf-8
+from selenium.webdriver import ActionChains
+from uitester.common.logger import *
+from uitester.page.scripts import SCROLL_INTO_VIEW_IF_NEEDED_JS
+
+
+class ActionBatch(object):
+    """
+    收集鼠标/键盘动作, perform 时以一次 W3C Actions 请求执行
+    动作方法与 ActionChains 同名, 可链式调用 e.g. batch.click_and_hold(a).move_to_element(b).release()
+    """
+    ACTIONS = ('click', 'click_and_hold', 'context_click', 'double_click', 'drag_and_drop',
+               'drag_and_drop_by_offset', 'key_down', 'key_up', 'move_by_offset', 'move_to_element',
+               'move_to_element_with_offset', 'pause', 'release', 'send_keys', 'send_keys_to_element')
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.chain = ActionChains(driver)
+        self.steps = []
+
+    def __getattr__(self, name):
+        if name not in ActionBatch.ACTIONS:
+            raise AttributeError(name)
+
+        def add(*args, **kwargs):
+            getattr(self.chain, name)(*args, **kwargs)
+            self.steps.append(name)
+            return self
+
+        return add
+
+    def scroll_to_element(self, ele):
+        """
+        按顺序滚动到元素: 支持滚轮动作时(selenium 4.2+)排入批次,
+        否则先执行已收集的动作再用js滚动, 保证前面的动作在滚动前完成
+        """
+        if hasattr(self.chain, 'scroll_to_element'):
+            self._sync_ticks()
+            self.chain.scroll_to_element(ele)
+            self._sync_ticks()
+            self.steps.append('scroll_to_element')
+        else:
+            self.perform()
+            self.driver.execute_script(SCROLL_INTO_VIEW_IF_NEEDED_JS, ele)
+        return self
+
+    def _sync_ticks(self):
+        # W3C Actions 按 tick 对齐各输入设备, selenium 不会为滚轮补 pause, 补齐后滚动才排在已有动作之后
+        devices = self.chain.w3c_actions.devices
+        ticks = max(len(device.actions) for device in devices)
+        for device in devices:
+            while len(device.actions) < ticks:
+                device.create_pause(0)
+
+    def __len__(self):
+        return len(self.steps)
+
+    def summary(self):
+        # 连续相同的动作合并 e.g. 'move_to_element, click_and_hold, move_by_offset x20, release'
+        groups = []
+        for step in self.steps:
+            if groups and groups[-1][0] == step:
+                groups[-1][1] += 1
+            else:
+                groups.append([step, 1])
+        return ', '.join(step if count == 1 else '{} x{}'.format(step, count) for step, count in groups)
+
+    def perform(self):
+        if not self.steps:
+            return
+        start = time.time()
+        try:
+            self.chain.perform()
+            LOG_DEBUG(lambda: '批量执行动作 {} 个, 耗时 {:.3f}s: {}'.format(len(self.steps), time.time() - start,
+                                                                     self.summary()))
+        finally:
+            self.chain = ActionChains(self.driver)
+            self.steps = []
@@ -0,0 +1,587 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+BasePage 的 asyncio 版本, 通过 Chrome DevTools 协议(CDP) websocket 直接驱动浏览器,
+同一浏览器的多个标签页共用一条连接, 可以用 asyncio.gather 并发操作
+e.g.
+    async def check_detail(page, url):
+        return await page.get_text(loc=('css selector', 'h1.title'))
+
+    # 在 UIFrame 用例中复用当前 driver 启动的浏览器, 5 个标签页并发打开50个详情页
+    titles = map_pages(self.driver, detail_urls, check_detail, concurrency=5)
+仅支持 python3, 需要安装 websockets
+"""
+import asyncio
+import itertools
+import json
+from urllib.request import urlopen
+from selenium.common.exceptions import JavascriptException, NoSuchElementException, TimeoutException, \
+    WebDriverException
+from uitester.common.logger import *
+from uitester.page.readiness import ready_script, READY_STATS
+from uitester.page.scripts import NETWORK_TRACKER_JS, READ_MANY_JS, WAIT_FOR_ELEMENT_JS, CLICK_POINT_JS, \
+    CLEAR_AND_FOCUS_JS
+try:
+    import websockets
+except ImportError:
+    websockets = None
+
+# 用 READ_MANY_JS 读取单个元素的字段
+# arguments: element, fields
+_READ_ONE_JS = 'return (function () {\n' + READ_MANY_JS + \
+    '\n}).call(this, null, null, [arguments[0]], arguments[1])[0];'
+
+
+def _debugger_url(address):
+    # 通过 DevTools http 接口获取浏览器级 websocket 地址
+    response = urlopen('http://{}/json/version'.format(address), timeout=10)
+    try:
+        return json.loads(response.read().decode('utf-8'))['webSocketDebuggerUrl']
+    finally:
+        response.close()
+
+
+class CDPConnection(object):
+    """
+    浏览器级 DevTools websocket 连接
+    各标签页以 flatten 模式的会话复用这一条连接, 命令响应按 id 分发, 事件按 (会话, 事件名) 分发
+    """
+
+    def __init__(self, ws_url, command_timeout=30):
+        self.ws_url = ws_url
+        self.command_timeout = command_timeout
+        self._ws = None
+        self._reader = None
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._waiters = {}
+
+    async def connect(self):
+        if websockets is None:
+            raise ImportError('AsyncBasePage 需要安装 websockets: pip install websockets')
+        self._ws = await websockets.connect(self.ws_url, max_size=None)
+        self._reader = asyncio.ensure_future(self._read())
+        LOG_DEBUG('已连接 DevTools: {}'.format(self.ws_url))
+        return self
+
+    async def _read(self):
+        try:
+            async for message in self._ws:
+                data = json.loads(message)
+                if 'id' in data:
+                    future = self._pending.pop(data['id'], None)
+                    if future is None or future.done():
+                        continue
+                    if 'error' in data:
+                        error = data['error']
+                        future.set_exception(WebDriverException('{} {}'.format(error.get('message'),
+                                                                               error.get('data', '')).strip()))
+                    else:
+                        future.set_result(data.get('result', {}))
+                else:
+                    for future in self._waiters.pop((data.get('sessionId'), data.get('method')), []):
+                        if not future.done():
+                            future.set_result(data.get('params', {}))
+        except Exception as e:
+            LOG_DEBUG('ERROR [CDPConnection]: {}'.format(e))
+        finally:
+            for future in list(self._pending.values()):
+                if not future.done():
+                    future.set_exception(WebDriverException('DevTools 连接已断开'))
+            self._pending.clear()
+
+    async def send(self, method, params=None, session_id=None, timeout=None):
+        """
+        :param session_id: 标签页会话, 为 None 时发给浏览器
+        :return: type: dict 命令结果
+        """
+        message_id = next(self._ids)
+        message = {'id': message_id, 'method': method, 'params': params or {}}
+        if session_id:
+            message['sessionId'] = session_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[message_id] = future
+        try:
+            await self._ws.send(json.dumps(message))
+            return await asyncio.wait_for(future, timeout or self.command_timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutException('DevTools 命令超时: {}'.format(method))
+        finally:
+            self._pending.pop(message_id, None)
+
+    def expect(self, method, session_id=None):
+        # 在触发事件的命令之前调用, 返回收到该事件时完成的 future
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault((session_id, method), []).append(future)
+        return future
+
+    async def close(self):
+        if self._ws is not None:
+            await self._ws.close()
+            self._ws = None
+        if self._reader is not None:
+            await self._reader
+            self._reader = None
+
+
+class AsyncElement(object):
+    # 页面内元素的远程对象引用, 页面跳转后失效
+    def __init__(self, page, object_id):
+        self.page = page
+        self.object_id = object_id
+
+    def __repr__(self):
+        return '<AsyncElement {}>'.format(self.object_id)
+
+
+class AsyncBasePage(object):
+    """
+    一个实例对应浏览器的一个标签页, 由 AsyncBrowser.new_page 创建
+    find_element / click / get_text / text_content 等方法与 BasePage 同名同参数, 需要 await;
+    等待在页面内完成(MutationObserver), 点击和输入通过 CDP Input 事件发送
+    """
+    default_timeout = 10
+    # get 后等待页面就绪, 含义同 BasePage 的同名属性
+    wait_ready = True
+    ready_timeout = 10
+    ready_idle = 0.5
+    ready_hooks = []
+
+    def __init__(self, browser, target_id, session_id):
+        self.browser = browser
+        self.connection = browser.connection
+        self.target_id = target_id
+        self.session_id = session_id
+        self.read_config()
+
+    def read_config(self):
+        pass
+
+    async def setup(self):
+        # 请求统计脚本在页面脚本之前注入; 后台标签页模拟获得焦点, 避免页面内定时器被节流
+        await self.send('Page.enable')
+        await self.send('Page.addScriptToEvaluateOnNewDocument', {'source': NETWORK_TRACKER_JS})
+        try:
+            await self.send('Emulation.setFocusEmulationEnabled', {'enabled': True})
+        except WebDriverException as e:
+            LOG_DEBUG('ERROR [setup]: {}'.format(e))
+
+    async def send(self, method, params=None, timeout=None):
+        return await self.connection.send(method, params, self.session_id, timeout)
+
+    async def _call(self, script, args=(), by_value=True, await_promise=False, timeout=None):
+        """
+        在页面内执行与 execute_script 写法相同的脚本(arguments / return)
+        :param args: AsyncElement 按远程对象传入, 其余参数需可json序列化
+        :param by_value: False 时返回远程对象描述, 用于取回元素
+        :param await_promise: 按 execute_async_script 的写法, 以 arguments 最后一个回调返回结果
+        """
+        if await_promise:
+            declaration = ('function () {{ var args = Array.prototype.slice.call(arguments), self = this; '
+                           'return new Promise(function (resolve) {{ args.push(resolve); '
+                           '(function () {{\n{}\n}}).apply(self, args); }}); }}').format(script)
+        else:
+            declaration = 'function () {{\n{}\n}}'.format(script)
+        target = next((arg for arg in args if isinstance(arg, AsyncElement)), None)
+        if target is None:
+            # 不含元素参数时一次 Runtime.evaluate 完成, 不需要先取全局对象
+            params = {'expression': '({}).apply(window, {})'.format(declaration, json.dumps(list(args)))}
+            method = 'Runtime.evaluate'
+        else:
+            arguments = [{'objectId': arg.object_id} if isinstance(arg, AsyncElement) else {'value': arg}
+                         for arg in args]
+            params = {'functionDeclaration': declaration, 'objectId': target.object_id, 'arguments': arguments}
+            method = 'Runtime.callFunctionOn'
+        params.update({'returnByValue': by_value, 'awaitPromise': await_promise})
+        result = await self.send(method, params, timeout)
+        if 'exceptionDetails' in result:
+            details = result['exceptionDetails']
+            raise JavascriptException((details.get('exception') or {}).get('description') or details.get('text'))
+        remote = result.get('result', {})
+        return remote.get('value') if by_value else remote
+
+    async def _elements(self, remote):
+        # 远程对象转为 AsyncElement 或其列表, null 返回 None
+        if remote.get('subtype') == 'node':
+            return AsyncElement(self, remote['objectId'])
+        if remote.get('subtype') == 'array':
+            properties = await self.send('Runtime.getProperties', {'objectId': remote['objectId'],
+                                                                   'ownProperties': True})
+            items = [(int(item['name']), item['value']['objectId']) for item in properties.get('result', [])
+                     if item['name'].isdigit() and 'objectId' in item.get('value', {})]
+            return [AsyncElement(self, object_id) for _, object_id in sorted(items)]
+        return None
+
+    async def _wait(self, loc, timeout, multiple=False, gone=False):
+        # 页面内等待元素出现(或消失), 等待期间页面跳转导致脚本中断时在新页面上等待剩余时间
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            remaining = max(deadline - loop.time(), 0)
+            try:
+                result = await self._call(WAIT_FOR_ELEMENT_JS, [loc[0], loc[1], int(remaining * 1000), multiple, gone],
+                                          by_value=gone, await_promise=True, timeout=remaining + 5)
+                break
+            except (TimeoutException, JavascriptException):
+                raise
+            except WebDriverException as e:
+                if loop.time() >= deadline:
+                    raise
+                LOG_DEBUG('页面内等待中断, 重新等待: {}'.format(e))
+                await asyncio.sleep(0.05)
+        if gone:
+            return bool(result)
+        found = await self._elements(result)
+        if not found:
+            raise TimeoutException('wait for {} timed out after {}s'.format(loc, timeout))
+        return found
+
+    async def _read(self, ele, fields):
+        return await self._call(_READ_ONE_JS, [ele, fields])
+
+    async def _resolve(self, loc, ele, strict, timeout=None):
+        if not (loc or ele):
+            LOG_ERROR('loc: {}, ele: {}, 请至少输入一个有效参数!'.format(loc, ele))
+            return None
+        return ele or await self.find_element(loc, strict=strict, timeout=timeout)
+
+    async def find_element(self, loc, strict=False, timeout=None):
+        """
+        :param strict: type: bool e.g.True:若找不到元素直接抛错 , False:若找不到元素，日志打印报错，不抛错
+        :param timeout: 等待超时时间, 默认使用页面的 default_timeout
+        :return: AsyncElement
+        """
+        if timeout is None:
+            timeout = self.default_timeout
+        try:
+            return await self._wait(loc, timeout)
+        except Exception as e:
+            LOG_DEBUG('ERROR [find_element]: {}'.format(e))
+            LOG_DEBUG('页面未找到元素, loc: {}'.format(loc))
+            if strict:
+                raise e
+
+    async def find_elements(self, loc, strict=False, timeout=None):
+        if timeout is None:
+            timeout = self.default_timeout
+        try:
+            return await self._wait(loc, timeout, multiple=True)
+        except Exception as e:
+            LOG_DEBUG('ERROR [find_elements]: {}'.format(e))
+            LOG_DEBUG('页面未找到元素: {}'.format(loc))
+            if strict:
+                raise e
+
+    async def wait_until_visible(self, loc, timeout=None):
+        return await self.find_element(loc, timeout=timeout)
+
+    async def wait_until_invisible(self, loc, timeout=None):
+        if timeout is None:
+            timeout = self.default_timeout
+        try:
+            return await self._wait(loc, timeout, gone=True)
+        except Exception as e:
+            LOG_DEBUG('等待元素消失超时, loc: {}, {}'.format(loc, e))
+            return False
+
+    async def read_many(self, loc=None, fields=None, ele=None, strict=False, timeout=None):
+        """
+        参数和返回值同 BasePage.read_many
+        """
+        fields = list(fields or ['text'])
+        if timeout is None:
+            timeout = self.default_timeout
+        if not (loc or ele):
+            LOG_ERROR('loc: {}, ele: {}, 请至少输入一个有效参数!'.format(loc, ele))
+            return []
+        try:
+            if ele:
+                items = list(await asyncio.gather(*[self._read(item, fields) for item in ele]))
+            else:
+                items = await self._call(READ_MANY_JS, [loc[0], loc[1], None, fields])
+                if not items and timeout and await self.find_elements(loc, timeout=timeout):
+                    items = await self._call(READ_MANY_JS, [loc[0], loc[1], None, fields])
+        except Exception as e:
+            LOG_DEBUG('ERROR [read_many]: {}'.format(e))
+            if strict:
+                raise e
+            return []
+        if not items:
+            LOG_DEBUG('页面未找到元素: {}'.format(loc))
+            if strict:
+                raise NoSuchElementException('no element matches: {}'.format(loc))
+            return []
+        LOG_DEBUG('批量读取元素 loc: {}, 字段: {}, 数量: {}'.format(loc, fields, len(items)))
+        return items
+
+    async def clear(self, loc=None, ele=None, strict=False):
+        ele = await self._resolve(loc, ele, strict)
+        if ele:
+            try:
+                await self._call(CLEAR_AND_FOCUS_JS, [ele])
+                LOG_DEBUG('元素 loc: {} 清除输入框内容'.format(loc))
+            except Exception as e:
+                LOG_DEBUG('ERROR [clear]: {}'.format(e))
+
+    async def text_content(self, content, loc=None, ele=None, strict=False):
+        # 清空后通过 Input.insertText 输入, 触发 input 事件, 不产生逐个按键的 keydown/keyup
+        ele = await self._resolve(loc, ele, strict)
+        if ele:
+            try:
+                await self._call(CLEAR_AND_FOCUS_JS, [ele])
+                await self.send('Input.insertText', {'text': content})
+                LOG_DEBUG('在元素 loc: {} 输入内容: {}'.format(loc, content))
+            except Exception as e:
+                LOG_DEBUG('ERROR [text_content]: {}'.format(e))
+
+    async def click(self, loc=None, ele=None, strict=False, timeout=None):
+        ele = await self._resolve(loc, ele, strict, timeout)
+        if ele:
+            try:
+                point = await self._call(CLICK_POINT_JS, [ele])
+                if not point:
+                    raise WebDriverException('element not interactable: {}'.format(loc))
+                for event in ('mouseMoved', 'mousePressed', 'mouseReleased'):
+                    await self.send('Input.dispatchMouseEvent', {'type': event, 'x': point['x'], 'y': point['y'],
+                                                                 'button': 'left', 'clickCount': 1})
+                LOG_DEBUG('单击元素 loc: {} ,location: {}'.format(loc, point))
+            except Exception as e:
+                LOG_DEBUG('ERROR [click]: {}'.format(e))
+
+    async def get_text(self, loc=None, ele=None, strict=False):
+        if isinstance(ele, (list, tuple)):
+            return [item['text'].strip() for item in await self.read_many(ele=ele, fields=['text'])]
+        ele = await self._resolve(loc, ele, strict)
+        if ele:
+            try:
+                text = (await self._read(ele, ['text']))['text'] or ''
+                LOG_DEBUG('元素 loc: {}, 获取文本信息为: {}'.format(loc, text))
+                return text.strip()
+            except Exception as e:
+                LOG_DEBUG('获取文本信息失败: {}'.format(e))
+                return ''
+
+    async def get_attribute(self, name, loc=None, ele=None, strict=False):
+        field = '@' + name
+        if isinstance(ele, (list, tuple)):
+            return [item[field] for item in await self.read_many(ele=ele, fields=[field])]
+        ele = await self._resolve(loc, ele, strict)
+        if ele:
+            try:
+                value = (await self._read(ele, [field]))[field]
+                LOG_DEBUG('获取元素 loc: {} ,属性名: {},属性值: {}'.format(loc, name, value))
+                return value
+            except Exception as e:
+                LOG_DEBUG('ERROR [get_attribute]: {}'.format(e))
+                return ''
+
+    async def _state(self, field, loc, ele, strict):
+        if isinstance(ele, (list, tuple)):
+            return [item[field] for item in await self.read_many(ele=ele, fields=[field])]
+        ele = await self._resolve(loc, ele, strict)
+        if ele:
+            try:
+                return (await self._read(ele, [field]))[field]
+            except Exception as e:
+                LOG_DEBUG('ERROR [is_{}]: {}'.format(field, e))
+        return False
+
+    async def is_selected(self, loc=None, ele=None, strict=False):
+        return await self._state('selected', loc, ele, strict)
+
+    async def is_enabled(self, loc=None, ele=None, strict=False):
+        return await self._state('enabled', loc, ele, strict)
+
+    async def is_displayed(self, loc=None, ele=None, strict=False):
+        return await self._state('displayed', loc, ele, strict)
+
+    async def execute_script(self, script, *args):
+        # 返回值按值传回, 不能返回元素
+        try:
+            return await self._call(script, args)
+        except Exception as e:
+            LOG_DEBUG('ERROR [execute_script]: {}'.format(e))
+
+    async def _navigate(self, method, params, url, wait_ready):
+        # 执行导航命令, 跨文档导航等待 load 事件, 之后按 wait_ready 等待页面就绪
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        loaded = self.connection.expect('Page.loadEventFired', self.session_id)
+        ready = True
+        try:
+            result = await self.send(method, params)
+            if result.get('errorText'):
+                raise WebDriverException('页面跳转失败: {}, {}'.format(url, result['errorText']))
+            # Page.navigate 同文档跳转(锚点)时没有 loaderId, 也不会触发 load
+            if result.get('loaderId') or method != 'Page.navigate':
+                await asyncio.wait_for(loaded, self.ready_timeout)
+            if self.wait_ready if wait_ready is None else wait_ready:
+                ready = (await self._wait_ready(max(self.ready_timeout - (loop.time() - start), 0)))['ready']
+        except asyncio.TimeoutError:
+            ready = False
+        finally:
+            loaded.cancel()
+        elapsed = loop.time() - start
+        READY_STATS.record(url, elapsed, ready)
+        if ready:
+            LOG_DEBUG('页面就绪, 耗时 {:.3f}s: {}'.format(elapsed, url))
+        else:
+            LOG_WARN('页面在 {}s 内未就绪: {}'.format(self.ready_timeout, url))
+        return ready
+
+    async def _wait_ready(self, timeout):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        script = ready_script(self.ready_hooks)
+        result = {'ready': False}
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return result
+            try:
+                return await self._call(script, ['complete', int(self.ready_idle * 1000), int(remaining * 1000)],
+                                        await_promise=True, timeout=remaining + 5) or result
+            except (TimeoutException, JavascriptException):
+                return result
+            except WebDriverException as e:
+                LOG_DEBUG('页面就绪等待中断, 重新等待: {}'.format(e))
+                await asyncio.sleep(0.05)
+
+    async def get(self, url, wait_ready=None):
+        """
+        :param wait_ready: 是否等待页面就绪, 默认使用页面的 wait_ready
+        :return: type: bool 页面是否就绪
+        """
+        LOG_DEBUG('跳转到url: {}'.format(url))
+        return await self._navigate('Page.navigate', {'url': url}, url, wait_ready)
+
+    async def _history(self, offset):
+        history = await self.send('Page.getNavigationHistory')
+        index = history['currentIndex'] + offset
+        if 0 <= index < len(history['entries']):
+            entry = history['entries'][index]
+            await self._navigate('Page.navigateToHistoryEntry', {'entryId': entry['id']}, entry['url'], False)
+
+    async def back(self):
+        LOG_DEBUG('页面回退')
+        await self._history(-1)
+
+    async def forward(self):
+        LOG_DEBUG('页面前进')
+        await self._history(1)
+
+    async def refresh(self):
+        LOG_DEBUG('页面刷新')
+        await self._navigate('Page.reload', {}, await self.get_current_url(), False)
+
+    async def get_title(self):
+        title = await self._call('return document.title;')
+        LOG_DEBUG('获取页面标题: {}'.format(title))
+        return title
+
+    async def get_current_url(self):
+        return await self._call('return window.location.href;')
+
+    async def close(self):
+        try:
+            await self.connection.send('Target.closeTarget', {'targetId': self.target_id})
+        except Exception as e:
+            LOG_DEBUG('ERROR [close]: {}'.format(e))
+        if self in self.browser.pages:
+            self.browser.pages.remove(self)
+
+
+class AsyncBrowser(object):
+    """
+    一个浏览器的 DevTools 连接, 用于创建可并发操作的标签页
+    e.g.
+        async with await AsyncBrowser.from_driver(driver) as browser:
+            first, second = await asyncio.gather(browser.new_page(url1), browser.new_page(url2))
+    """
+
+    def __init__(self, ws_url, page_class=None):
+        self.connection = CDPConnection(ws_url)
+        self.page_class = page_class or AsyncBasePage
+        self.pages = []
+
+    @classmethod
+    async def connect(cls, ws_url, page_class=None):
+        browser = cls(ws_url, page_class)
+        await browser.connection.connect()
+        return browser
+
+    @classmethod
+    async def from_driver(cls, driver, page_class=None):
+        """
+        连接 selenium driver 启动的本地 Chrome, DevTools 地址取自 chromedriver 返回的 goog:chromeOptions.debuggerAddress
+        """
+        address = (driver.capabilities.get('goog:chromeOptions') or {}).get('debuggerAddress')
+        if not address:
+            raise WebDriverException('driver 未提供 DevTools 地址(goog:chromeOptions.debuggerAddress)')
+        ws_url = await asyncio.get_running_loop().run_in_executor(None, _debugger_url, address)
+        return await cls.connect(ws_url, page_class)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def new_page(self, url=None):
+        """
+        新建标签页
+        :param url: 新建后打开的页面
+        :return: page_class 实例
+        """
+        target = await self.connection.send('Target.createTarget', {'url': 'about:blank'})
+        session = await self.connection.send('Target.attachToTarget', {'targetId': target['targetId'],
+                                                                       'flatten': True})
+        page = self.page_class(self, target['targetId'], session['sessionId'])
+        self.pages.append(page)
+        await page.setup()
+        if url:
+            await page.get(url)
+        return page
+
+    async def map(self, urls, func, concurrency=5):
+        """
+        用 concurrency 个标签页并发处理 urls, 每个标签页依次打开分到的url后调用 func(page, url)
+        :param func: async 函数
+        :return: type: list 与 urls 顺序一致的 func 返回值, 单个url出错时为对应的异常对象
+        """
+        results = [None] * len(urls)
+        pending = iter(enumerate(urls))
+
+        async def worker():
+            page = await self.new_page()
+            try:
+                for index, url in pending:
+                    try:
+                        await page.get(url)
+                        results[index] = await func(page, url)
+                    except Exception as e:
+                        LOG_DEBUG('ERROR [map]: {}, {}'.format(url, e))
+                        results[index] = e
+            finally:
+                await page.close()
+
+        await asyncio.gather(*[worker() for _ in range(min(concurrency, len(urls)))])
+        return results
+
+    async def close(self):
+        # 关闭本连接创建的标签页, 不关闭浏览器
+        for page in list(self.pages):
+            await page.close()
+        await self.connection.close()
+
+
+def map_pages(driver, urls, func, concurrency=5, page_class=None):
+    """
+    同步用例中的入口: 连接 driver 所在的浏览器, 并发处理 urls 后关闭新建的标签页
+    :return: 同 AsyncBrowser.map
+    """
+    async def run():
+        browser = await AsyncBrowser.from_driver(driver, page_class)
+        async with browser:
+            return await browser.map(urls, func, concurrency)
+    return asyncio.run(run())
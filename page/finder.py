@@ -0,0 +1,279 @@
+#!/usr/bin/env python
+# encoding: utf-8
+import time
+from collections import OrderedDict
+from selenium.webdriver.support.wait import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException, StaleElementReferenceException, WebDriverException
+from uitester.common.logger import *
+from uitester.common.timeouts import TimeoutManager
+from uitester.page.scripts import WAIT_FOR_ELEMENT_JS
+
+
+class element_located_and_visible(object):
+    """
+    presence + visibility 合并后的等待条件, 每轮轮询只发一次 find_elements
+    multiple=False 时返回第一个元素, multiple=True 时返回全部匹配元素
+    """
+
+    def __init__(self, loc, multiple=False):
+        self.loc = loc
+        self.multiple = multiple
+
+    def __call__(self, driver):
+        try:
+            elements = driver.find_elements(*self.loc)
+            if elements and elements[0].is_displayed():
+                return elements if self.multiple else elements[0]
+        except StaleElementReferenceException:
+            pass
+        return False
+
+
+class PollingWait(object):
+    # 通过 WebDriverWait 按 poll_frequency 轮询
+    name = 'polling'
+
+    def __init__(self, poll_frequency=0.5):
+        self.poll_frequency = poll_frequency
+
+    def until(self, driver, loc, timeout, multiple=False):
+        condition = element_located_and_visible(loc, multiple=multiple)
+        return self._wait(driver, condition, timeout)
+
+    def until_gone(self, driver, loc, timeout):
+        condition = EC.invisibility_of_element_located(loc)
+        return self._wait(driver, condition, timeout)
+
+    def _wait(self, driver, condition, timeout):
+        # 回放的 driver 按磁带中录制的轮询次数等待, 不实际 sleep
+        replay_wait = getattr(driver, 'replay_wait', None)
+        if replay_wait is not None:
+            return replay_wait(condition, timeout)
+        return WebDriverWait(driver, timeout, self.poll_frequency).until(condition)
+
+
+class MutationObserverWait(PollingWait):
+    """
+    在页面内安装 MutationObserver, 一次 execute_async_script 阻塞到元素出现且可见或超时
+    等待期间页面跳转导致脚本中断时, 剩余时间回退到轮询
+    """
+    name = 'mutation'
+
+    def _observe(self, driver, loc, timeout, multiple, gone):
+        start = time.time()
+        try:
+            TimeoutManager.of(driver).ensure_script_timeout(timeout + 5)
+            result = driver.execute_async_script(WAIT_FOR_ELEMENT_JS, loc[0], loc[1], int(timeout * 1000),
+                                                 multiple, gone)
+        except TimeoutException:
+            raise
+        except WebDriverException as e:
+            LOG_DEBUG('页面内等待中断, 回退到轮询: {}'.format(e))
+            remaining = max(timeout - (time.time() - start), 0)
+            if gone:
+                return super(MutationObserverWait, self).until_gone(driver, loc, remaining)
+            return super(MutationObserverWait, self).until(driver, loc, remaining, multiple)
+        if not result:
+            raise TimeoutException('wait for {} timed out after {}s'.format(loc, timeout))
+        return result
+
+    def until(self, driver, loc, timeout, multiple=False):
+        return self._observe(driver, loc, timeout, multiple, False)
+
+    def until_gone(self, driver, loc, timeout):
+        return self._observe(driver, loc, timeout, False, True)
+
+
+class RetryPolicy(object):
+    # 重试策略基类: 首轮等待超时后, 在 budget 秒的总预算内决定是否以及如何继续查找
+    name = 'none'
+
+    def __init__(self, budget=0):
+        self.budget = budget
+
+    def attempts(self, page, timeout):
+        """
+        依次生成每次重试的等待时长, 重试前的准备动作(退避/刷新)在 yield 之前完成
+        :param page: 发起查找的页面对象, 可能为 None
+        :param timeout: 单次查找的超时时间
+        :return: generator of float
+        """
+        return iter(())
+
+
+class NoRetry(RetryPolicy):
+    # 不重试, 首轮超时即失败
+    name = 'none'
+
+
+class BackoffRetry(RetryPolicy):
+    # 指数退避: 每次休眠 delay 后只探测一次, delay 按 factor 递增直到 max_delay
+    name = 'backoff'
+
+    def __init__(self, budget=10, delay=0.5, factor=2, max_delay=4):
+        super(BackoffRetry, self).__init__(budget)
+        self.delay = delay
+        self.factor = factor
+        self.max_delay = max_delay
+
+    def attempts(self, page, timeout):
+        deadline = time.time() + self.budget
+        delay = self.delay
+        while time.time() + delay < deadline:
+            time.sleep(delay)
+            yield 0
+            delay = min(delay * self.factor, self.max_delay)
+
+
+class RefreshRetry(RetryPolicy):
+    # 刷新页面后重新等待, 替代原来 refresh + sleep(8) 的兜底逻辑
+    name = 'refresh'
+
+    def __init__(self, budget=20, retries=1):
+        super(RefreshRetry, self).__init__(budget)
+        self.retries = retries
+
+    def attempts(self, page, timeout):
+        deadline = time.time() + self.budget
+        for _ in range(self.retries):
+            if time.time() >= deadline:
+                return
+            if page is not None:
+                page.refresh()
+            yield max(min(timeout, deadline - time.time()), 0)
+
+
+class LookupStats(object):
+    # 元素查找统计, slow_path 为首轮等待超时(进入重试或直接失败)的查找次数
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.lookups = 0
+        self.slow_path = 0
+        self.failures = 0
+        self.slow_path_time = 0.0
+        self.cache_hits = 0
+        self.cache_stale = 0
+
+    def summary(self):
+        return {
+            'lookups': self.lookups,
+            'cache_hits': self.cache_hits,
+            'cache_stale': self.cache_stale,
+            'slow_path': self.slow_path,
+            'failures': self.failures,
+            'slow_path_time': round(self.slow_path_time, 3),
+        }
+
+
+LOOKUP_STATS = LookupStats()
+
+
+class ElementFinder(object):
+    # 元素查找引擎: 由等待策略等待元素出现且可见, 超时后交给重试策略处理
+    def __init__(self, driver, wait_strategy=None, retry_policy=None, stats=None, timings=None):
+        self.driver = driver
+        self.wait_strategy = wait_strategy or PollingWait()
+        self.retry_policy = retry_policy or NoRetry()
+        self.stats = stats or LOOKUP_STATS
+        # 记录首轮等待的耗时, 超时也按所用超时记录, 为 None 时不记录
+        self.timings = timings
+        self.timeouts = TimeoutManager.of(driver)
+
+    def wait(self, loc, timeout, multiple=False):
+        return self.wait_strategy.until(self.driver, loc, timeout, multiple=multiple)
+
+    def wait_gone(self, loc, timeout):
+        with self.timeouts.explicit(loc):
+            return self.wait_strategy.until_gone(self.driver, loc, timeout)
+
+    def find(self, loc, timeout, multiple=False, retry_policy=None, page=None):
+        """
+        查找元素, 超时抛出 TimeoutException
+        :param loc: 元素定位 e.g. (By.ID, 'kw')
+        :param timeout: 单次等待的超时时间
+        :param multiple: True 时返回全部匹配元素
+        :param retry_policy: 覆盖默认的重试策略
+        :param page: 发起查找的页面对象, 供刷新类重试策略使用
+        :return: WebElement 或 WebElement 列表
+        """
+        with self.timeouts.explicit(loc):
+            return self._find(loc, timeout, multiple, retry_policy, page)
+
+    def _find(self, loc, timeout, multiple, retry_policy, page):
+        start = time.time()
+        self.stats.lookups += 1
+        # 回放时没有真实耗时, 不记录
+        record = self.timings is not None and not hasattr(self.driver, 'replay_wait')
+        try:
+            result = self.wait(loc, timeout, multiple)
+            if record:
+                self.timings.record(page, loc, time.time() - start)
+            return result
+        except TimeoutException as e:
+            error = e
+            if record:
+                # 首轮超时记为删失样本, 无论之后重试是否成功, 避免超时学得过短后再也没有新样本
+                self.timings.record(page, loc, max(time.time() - start, timeout), missed=True)
+        policy = retry_policy or self.retry_policy
+        self.stats.slow_path += 1
+        LOG_DEBUG('首轮等待超时, loc: {}, 重试策略: {}'.format(loc, policy.name))
+        try:
+            for retry_timeout in policy.attempts(page, timeout):
+                try:
+                    return self.wait(loc, retry_timeout, multiple)
+                except TimeoutException as e:
+                    error = e
+            self.stats.failures += 1
+            raise error
+        finally:
+            self.stats.slow_path_time += time.time() - start
+
+
+class ElementCache(object):
+    """
+    页面级元素缓存, 按 (frame上下文, loc) 缓存 find_element 的结果
+    命中时用一次 is_displayed 校验元素仍挂在文档上且可见, 元素失效(StaleElementReferenceException)或不可见时丢弃,
+    由调用方重新查找; 列表结果可能随页面增减元素, 不缓存
+    """
+
+    def __init__(self, max_size=256, stats=None):
+        self.max_size = max_size
+        self.stats = stats or LOOKUP_STATS
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _key(frame, loc):
+        return frame, tuple(loc)
+
+    def get(self, frame, loc):
+        key = self._key(frame, loc)
+        ele = self._entries.get(key)
+        if ele is None:
+            return None
+        try:
+            if ele.is_displayed():
+                self.stats.cache_hits += 1
+                return ele
+        except WebDriverException as e:
+            LOG_DEBUG('缓存元素已失效, loc: {}, {}'.format(loc, e.__class__.__name__))
+        self._entries.pop(key, None)
+        self.stats.cache_stale += 1
+        return None
+
+    def put(self, frame, loc, ele):
+        key = self._key(frame, loc)
+        self._entries.pop(key, None)
+        self._entries[key] = ele
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, reason=None):
+        if self._entries:
+            LOG_DEBUG('清空元素缓存: {}, 数量: {}'.format(reason, len(self._entries)))
+            self._entries.clear()
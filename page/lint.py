@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+定位检查: 扫描模块中 BasePage 子类的定位元组, 列出代价高的写法和等价的 CSS/id 改写;
+指定样例页面时在无头 Chrome 中测量每个定位及其改写的求值耗时, 并确认两者匹配到相同的元素
+    python -m uitester.page.lint pages
+    python -m uitester.page.lint pages.order --url http://127.0.0.1:8000/order.html --budget 2 --json lint.json
+    python -m uitester.page.lint pages.order --url fixtures/order.html --write
+--write 只改写在样例页面上匹配到相同元素的定位, 改写按页面级查找保证等价, 用于 WebElement 内查找的 XPath 不要一起改写
+存在超出 --budget 的定位时返回码为 1, 可用于 CI
+"""
+import argparse
+import importlib
+import inspect
+import json
+import pkgutil
+import re
+import sys
+from selenium.webdriver.common.by import By
+from uitester.common.logger import *
+from uitester.common.logger import logger
+from uitester.common.launch_profiles import get_profile, PROFILES
+from uitester.page import BasePage
+from uitester.page.locators import LINT_RULES, lint, rewrite, measure, describe
+from uitester.page.readiness import wait_for_ready
+
+try:
+    string_types = basestring
+except NameError:
+    string_types = str
+
+STRATEGIES = (By.ID, By.XPATH, By.LINK_TEXT, By.PARTIAL_LINK_TEXT, By.NAME, By.TAG_NAME, By.CLASS_NAME,
+              By.CSS_SELECTOR)
+# 源码中 By 的写法
+BY_NAMES = {By.XPATH: 'XPATH', By.CSS_SELECTOR: 'CSS_SELECTOR', By.ID: 'ID'}
+
+
+def is_locator(value):
+    return isinstance(value, (tuple, list)) and len(value) == 2 and value[0] in STRATEGIES and \
+        isinstance(value[1], string_types)
+
+
+def iter_modules(names):
+    # 导入模块, 包会递归导入其下所有模块
+    for name in names:
+        module = importlib.import_module(name)
+        yield module
+        if hasattr(module, '__path__'):
+            for _, child, _ in pkgutil.walk_packages(module.__path__, module.__name__ + '.'):
+                try:
+                    yield importlib.import_module(child)
+                except Exception as e:
+                    LOG_DEBUG('ERROR [import {}]: {}'.format(child, e))
+
+
+def collect_locators(modules):
+    """
+    收集页面类中作为类属性定义的定位, 包括字典/列表属性中的定位
+    :param modules: 模块名列表
+    :return: type: list e.g. [{'owner': 'pages.login.LoginPage', 'name': 'username', 'loc': ('xpath', '//input'),
+             'file': '/path/pages/login.py'}]
+    """
+    entries = []
+    for module in iter_modules(modules):
+        for _, cls in sorted(vars(module).items()):
+            if not (inspect.isclass(cls) and issubclass(cls, BasePage) and cls.__module__ == module.__name__):
+                continue
+            owner = '{}.{}'.format(cls.__module__, cls.__name__)
+            try:
+                path = inspect.getsourcefile(cls)
+            except TypeError:
+                path = None
+            for name, value in sorted(vars(cls).items()):
+                if is_locator(value):
+                    items = [(name, value)]
+                elif isinstance(value, dict):
+                    items = [('{}[{!r}]'.format(name, key), item) for key, item in value.items()]
+                elif isinstance(value, (tuple, list)):
+                    items = [('{}[{}]'.format(name, index), item) for index, item in enumerate(value)]
+                else:
+                    continue
+                for item_name, item in items:
+                    if is_locator(item):
+                        entries.append({'owner': owner, 'name': item_name, 'loc': tuple(item), 'file': path})
+    return entries
+
+
+def create_driver(launch_profile):
+    from selenium import webdriver
+    profile = get_profile(launch_profile)
+    return profile.apply(webdriver.Chrome(options=profile.options(headless=True)))
+
+
+def analyse(entries, driver=None, repeat=20):
+    """
+    静态检查每个定位, 传入 driver 时在其当前页面上测量, 相同的定位只测量一次
+    :return: type: list entries 中每项增加 'issues' 和 'rewrite', 测量时增加 measure 的结果字段
+    """
+    costs = {}
+    if driver is not None:
+        locs = sorted(set(entry['loc'] for entry in entries))
+        costs = dict((result['loc'], result) for result in measure(driver, locs, repeat=repeat))
+    results = []
+    for entry in entries:
+        result = dict(entry, issues=lint(entry['loc']), rewrite=rewrite(entry['loc']))
+        result.update(costs.get(entry['loc'], {}))
+        results.append(result)
+    return results
+
+
+def _literal(value, quote):
+    # 不含转义的单行字符串字面量, 无法这样表示时返回 None
+    if quote in value or '\\' in value or '\n' in value:
+        return None
+    return quote + value + quote
+
+
+def rewrite_sources(results):
+    """
+    把源码中已验证等价的 (By.XPATH, '...') 替换为改写后的定位
+    :return: type: dict 文件 -> 替换次数
+    """
+    changes = {}
+    for result in results:
+        if not (result['rewrite'] and result.get('same') and result.get('count') and result['file']):
+            continue
+        changes.setdefault(result['file'], {})[result['loc'][1]] = result['rewrite']
+    counts = {}
+    for path, replacements in changes.items():
+        with open(path) as f:
+            source = f.read()
+        count = 0
+        for xpath, (by, value) in replacements.items():
+            for quote in ('\'', '"'):
+                old = _literal(xpath, quote)
+                new = _literal(value, quote) or _literal(value, '"' if quote == '\'' else '\'')
+                if old is None or new is None:
+                    continue
+                pattern = re.compile(r'''(By\.)XPATH(\s*,\s*)''' + re.escape(old) + '|' +
+                                     r'''(['"])xpath\3(\s*,\s*)''' + re.escape(old))
+
+                def replace(match):
+                    if match.group(1):
+                        return 'By.{}{}{}'.format(BY_NAMES[by], match.group(2), new)
+                    return '{0}{1}{0}{2}{3}'.format(match.group(3), by, match.group(4), new)
+
+                source, n = pattern.subn(replace, source)
+                count += n
+        if count:
+            with open(path, 'w') as f:
+                f.write(source)
+            counts[path] = count
+            LOG_INFO('改写定位: {}, 替换 {} 处'.format(path, count))
+    return counts
+
+
+def format_text(results, budget=None):
+    lines = []
+    for result in sorted(results, key=lambda item: -(item.get('ms') or 0)):
+        over = budget and (result.get('ms') or 0) > budget
+        lines.append('{}{}.{} {!r}'.format('[超出预算] ' if over else '', result['owner'], result['name'],
+                                           result['loc']))
+        if 'ms' in result:
+            lines.append('    ' + describe(result))
+        elif result['rewrite']:
+            lines.append('    建议改为 {!r}'.format(result['rewrite']))
+        for issue in result['issues']:
+            if issue != 'rewrite':
+                lines.append('    {}: {}'.format(issue, LINT_RULES[issue]))
+    measured = [result for result in results if result.get('ms') is not None]
+    lines.append('定位数: {}, 有问题: {}, 可改写: {}{}'.format(
+        len(results), len([result for result in results if result['issues']]),
+        len([result for result in results if result['rewrite']]),
+        ', 测量总耗时: {:.3f}ms'.format(sum(result['ms'] for result in measured)) if measured else ''))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='页面对象定位的性能检查')
+    parser.add_argument('modules', nargs='+', help='页面类所在的模块或包')
+    parser.add_argument('--url', help='样例页面的url或本地html文件, 指定时在无头 Chrome 中测量耗时')
+    parser.add_argument('--launch-profile', choices=sorted(PROFILES), default='fast')
+    parser.add_argument('--repeat', type=int, default=20, help='每个定位重复求值的次数')
+    parser.add_argument('--budget', type=float, help='定位求值耗时预算(毫秒)')
+    parser.add_argument('--write', action='store_true', help='把验证等价的 XPath 改写到源码中, 需要 --url')
+    parser.add_argument('--json', help='把结果写入json文件')
+    args = parser.parse_args(argv)
+    if args.write and not args.url:
+        parser.error('--write 需要 --url 验证改写前后匹配到相同的元素')
+    logger.set_performance_mode(True)
+    entries = collect_locators(args.modules)
+    driver = None
+    if args.url:
+        url = args.url if '://' in args.url else 'file://' + os.path.abspath(args.url)
+        driver = create_driver(args.launch_profile)
+    try:
+        if driver is not None:
+            wait_for_ready(driver, url, lambda: driver.get(url))
+        results = analyse(entries, driver, repeat=args.repeat)
+    finally:
+        if driver is not None:
+            driver.quit()
+    print(format_text(results, args.budget))
+    if args.write:
+        rewrite_sources(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    return 1 if args.budget and any((result.get('ms') or 0) > args.budget for result in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
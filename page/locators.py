@@ -0,0 +1,306 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+定位性能: 静态检查定位中代价高的写法, 把等价的 XPath 改写为 CSS 选择器或 id 定位, 并在页面内测量定位的求值耗时
+运行时检查由 BasePage.locator_budget 或环境变量 UITESTER_LOCATOR_BUDGET(毫秒) 开启,
+每个定位在本进程内首次找到元素时测量一次, 超出预算时告警并给出改写建议; 批量检查见 uitester.page.lint
+"""
+import re
+import threading
+from selenium.webdriver.common.by import By
+from uitester.common.logger import *
+from uitester.common.timing_store import TimingStore
+from uitester.page.scripts import LOCATOR_COST_JS
+
+LINT_RULES = {
+    'wildcard': '//*[...] 需要对文档中每个元素求值条件',
+    'text': '按文本匹配需要读取每个候选元素的文本',
+    'link-text': '按链接文本查找需要读取页面上所有链接的文本',
+    'absolute': '从 /html 开始的绝对路径, 页面结构稍有变化即失效',
+    'deep': '层级过深, 每一层都要遍历子元素',
+    'rewrite': '可等价改写为 CSS 选择器或 id 定位',
+}
+# 超过此层数视为过深
+MAX_DEPTH = 6
+
+_STRING = r'''(?:"([^"]*)"|'([^']*)')'''
+_ATTR = r'@([A-Za-z_][\w-]*)'
+_ID_RE = re.compile(r'^\.?//\*\[\s*@id\s*=\s*' + _STRING + r'\s*\]$')
+_TAG_RE = re.compile(r'^([A-Za-z][\w-]*|\*)(.*)$', re.S)
+_CLASS_NAME_RE = re.compile(r'^-?[_A-Za-z][\w-]*$')
+_SIMPLE_RE = re.compile(r'^(\.[\w-]+|\[[^\[\]]*\])$')
+_TERMS = [
+    (re.compile(r'^' + _ATTR + r'$'), lambda name, v: '[{}]'.format(name)),
+    (re.compile(r'^' + _ATTR + r'\s*=\s*' + _STRING + r'$'),
+     lambda name, v: '[{}={}]'.format(name, _css_string(v))),
+    (re.compile(r'^' + _ATTR + r'\s*!=\s*' + _STRING + r'$'),
+     lambda name, v: '[{0}]:not([{0}={1}])'.format(name, _css_string(v))),
+    # contains/starts-with 匹配空串时恒为真, 只要求属性存在
+    (re.compile(r'^contains\(\s*' + _ATTR + r'\s*,\s*' + _STRING + r'\s*\)$'),
+     lambda name, v: '[{}*={}]'.format(name, _css_string(v)) if v else '[{}]'.format(name)),
+    (re.compile(r'^starts-with\(\s*' + _ATTR + r'\s*,\s*' + _STRING + r'\s*\)$'),
+     lambda name, v: '[{}^={}]'.format(name, _css_string(v)) if v else '[{}]'.format(name)),
+]
+# contains(concat(' ', normalize-space(@class), ' '), ' x ') 即按 class 单词匹配
+_CLASS_TOKEN_RE = re.compile(r'''^contains\(\s*concat\(\s*(?:" "|' ')\s*,\s*normalize-space\(\s*@class\s*\)\s*,\s*'''
+                             r'''(?:" "|' ')\s*\)\s*,\s*(?:" ([^"\s]+) "|' ([^'\s]+) ')\s*\)$''')
+
+
+def _css_string(value):
+    return '"{}"'.format(value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\a '))
+
+
+def _scan(text, stop):
+    """
+    按顶层(不在引号和括号内)的分隔符切分
+    :param stop: 函数, 参数为 (text, index), 返回该位置分隔符的长度, 不是分隔符时返回 0
+    :return: type: list e.g. [('', 'a'), ('//', 'b')] 每段及其前面的分隔符, 引号或括号不成对时返回 None
+    """
+    parts, sep, start, depth, quote, i = [], '', 0, 0, None, 0
+    while i < len(text):
+        char = text[i]
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in '"\'':
+            quote = char
+        elif char in '[(':
+            depth += 1
+        elif char in '])':
+            depth -= 1
+        elif depth == 0:
+            size = stop(text, i)
+            if size:
+                parts.append((sep, text[start:i]))
+                sep = text[i:i + size]
+                i = start = i + size
+                continue
+        i += 1
+    if quote or depth:
+        return None
+    parts.append((sep, text[start:]))
+    return parts
+
+
+def _steps(xpath):
+    # 拆分为 [(分隔符, 步骤)], 相对路径与 ./ 开头的路径都从文档开始
+    if xpath.startswith('./'):
+        xpath = xpath[1:]
+    parts = _scan(xpath, lambda text, i: 2 if text.startswith('//', i) else 1 if text[i] == '/' else 0)
+    if not parts:
+        return None
+    if parts[0][1] == '':
+        parts = parts[1:]
+    else:
+        parts[0] = ('/', parts[0][1])
+    if not parts or not all(step for sep, step in parts):
+        return None
+    return parts
+
+
+def _predicates(text):
+    # '[a][b]' -> ['a', 'b']
+    result, depth, quote, start = [], 0, None, 0
+    for i, char in enumerate(text):
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in '"\'':
+            quote = char
+        elif char == '[':
+            if depth == 0:
+                start = i + 1
+            depth += 1
+        elif char == ']':
+            depth -= 1
+            if depth < 0:
+                return None
+            if depth == 0:
+                result.append(text[start:i])
+        elif depth == 0:
+            return None
+    return None if depth or quote else result
+
+
+def _term_css(term):
+    term = term.strip()
+    match = _CLASS_TOKEN_RE.match(term)
+    if match:
+        token = match.group(1) or match.group(2)
+        return '.' + token if _CLASS_NAME_RE.match(token) else '[class~={}]'.format(_css_string(token))
+    if term.startswith('not(') and term.endswith(')'):
+        inner = _term_css(term[4:-1])
+        # :not 内只能是单个简单选择器
+        if inner is None or not _SIMPLE_RE.match(inner):
+            return None
+        return ':not({})'.format(inner)
+    for pattern, build in _TERMS:
+        match = pattern.match(term)
+        if match:
+            groups = match.groups()
+            value = None if len(groups) == 1 else (groups[1] if groups[1] is not None else groups[2])
+            return build(groups[0], value)
+    return None
+
+
+def _step_css(tag, predicates):
+    css = '' if tag == '*' else tag
+    for index, predicate in enumerate(predicates):
+        predicate = predicate.strip()
+        if predicate.isdigit() or predicate == 'last()':
+            # 位置条件只有在其他条件之前才与 nth-of-type 等价
+            if index:
+                return None
+            kind = 'child' if tag == '*' else 'of-type'
+            css += ':nth-{}({})'.format(kind, predicate) if predicate.isdigit() else ':last-{}'.format(kind)
+            continue
+        terms = _scan(predicate, lambda text, i: 5 if re.match(r'\sand\s', text[i:i + 5]) else 0)
+        if not terms:
+            return None
+        for sep, term in terms:
+            term_css = _term_css(term)
+            if term_css is None:
+                return None
+            css += term_css
+    return css or '*'
+
+
+def xpath_to_css(xpath):
+    """
+    把 XPath 改写为等价的定位, 只处理标签/属性/class/位置条件组成的路径, 其他写法(文本、轴、函数、并集等)返回 None
+    改写按页面级查找(从文档开始)保证等价
+    :return: type: tuple e.g. ('id', 'kw') ('css selector', 'form > input[name="user"]') 或 None
+    """
+    xpath = xpath.strip()
+    match = _ID_RE.match(xpath)
+    if match:
+        return By.ID, match.group(1) if match.group(1) is not None else match.group(2)
+    steps = _steps(xpath)
+    if not steps:
+        return None
+    selector = []
+    for index, (sep, step) in enumerate(steps):
+        match = _TAG_RE.match(step)
+        predicates = _predicates(match.group(2)) if match else None
+        if predicates is None:
+            return None
+        tag = match.group(1)
+        css = _step_css(tag, predicates)
+        if css is None:
+            return None
+        if index == 0 and sep == '/':
+            # 文档的子元素只有根元素
+            if tag not in ('html', '*'):
+                return None
+            css = ('html' if tag == 'html' else '') + ':root' + (css[len(tag):] if tag == 'html' else css.lstrip('*'))
+        elif index:
+            selector.append('>' if sep == '/' else '')
+        selector.append(css)
+    return By.CSS_SELECTOR, ' '.join(part for part in selector if part)
+
+
+def rewrite(loc):
+    # 返回等价的更快定位, 没有时返回 None
+    if loc[0] == By.XPATH:
+        return xpath_to_css(loc[1])
+    return None
+
+
+def lint(loc):
+    """
+    静态检查定位
+    :return: type: list LINT_RULES 中的规则名 e.g. ['wildcard', 'rewrite']
+    """
+    by, value = loc
+    issues = []
+    if by == By.XPATH:
+        if re.search(r'//\*\[(?!\s*@id\s*=)', value):
+            issues.append('wildcard')
+        if re.search(r'text\(\)|normalize-space\(\s*\)|\(\s*\.\s*[,)]', value):
+            issues.append('text')
+        if value.startswith('/html'):
+            issues.append('absolute')
+        if len(re.findall(r'/+', re.sub(r'\[[^\]]*\]', '', value))) > MAX_DEPTH:
+            issues.append('deep')
+        if xpath_to_css(value):
+            issues.append('rewrite')
+    elif by in (By.LINK_TEXT, By.PARTIAL_LINK_TEXT):
+        issues.append('link-text')
+    return issues
+
+
+def measure(driver, locs, repeat=20, chunk=50):
+    """
+    在当前页面(frame)内测量定位的平均求值耗时, 有改写时同时测量改写后的耗时并比较匹配结果
+    :param locs: type: list 定位元组
+    :param repeat: 每个定位重复求值的次数
+    :return: type: list e.g. [{'loc': ('xpath', '//*[@id="kw"]'), 'ms': 0.42, 'count': 1,
+             'rewrite': ('id', 'kw'), 'rewrite_ms': 0.01, 'same': True, 'error': None}]
+    """
+    results = []
+    for start in range(0, len(locs), chunk):
+        batch = [(tuple(loc), rewrite(loc)) for loc in locs[start:start + chunk]]
+        items = [{'by': loc[0], 'value': loc[1], 'candidate': list(candidate) if candidate else None}
+                 for loc, candidate in batch]
+        for (loc, candidate), item in zip(batch, driver.execute_script(LOCATOR_COST_JS, items, repeat)):
+            results.append({'loc': loc, 'ms': item['ms'], 'count': item['count'], 'rewrite': candidate,
+                            'rewrite_ms': item['candidate_ms'], 'same': item['same'], 'error': item['error']})
+    return results
+
+
+def describe(result):
+    # 测量结果的一行说明
+    text = '{:.3f}ms, 匹配 {} 个'.format(result['ms'] or 0, result['count'])
+    if result['error']:
+        text = '求值出错: {}'.format(result['error'])
+    if result['rewrite']:
+        text += ', 建议改为 {!r}'.format(result['rewrite'])
+        if result['rewrite_ms'] is not None:
+            text += ' ({:.3f}ms{})'.format(result['rewrite_ms'], '' if result['same'] else ', 匹配结果不一致')
+    return text
+
+
+class LocatorCostChecker(object):
+    """
+    运行时定位耗时检查: 每个 (页面类, loc) 在本进程内首次找到元素时测量一次, 只多一次 execute_script
+    :param budget: 耗时预算(毫秒), 默认读取 UITESTER_LOCATOR_BUDGET, 0 表示关闭
+    """
+
+    def __init__(self, budget=None, repeat=5):
+        if budget is None:
+            budget = float(os.environ.get('UITESTER_LOCATOR_BUDGET') or 0)
+        self.budget = budget
+        self.repeat = repeat
+        self.checked = set()
+        # 超出预算的定位, 键为 TimingStore.key
+        self.over_budget = {}
+        self._lock = threading.Lock()
+
+    def check(self, driver, page, loc, budget=None):
+        """
+        :param budget: 覆盖默认预算 e.g. BasePage.locator_budget
+        :return: type: dict measure 的结果, 未测量时返回 None
+        """
+        budget = self.budget if budget is None else budget
+        if not budget:
+            return None
+        key = TimingStore.key(page, loc)
+        with self._lock:
+            if key in self.checked:
+                return None
+            self.checked.add(key)
+        # 回放时不能发出录制中没有的命令
+        if hasattr(driver, 'replay_wait'):
+            return None
+        try:
+            result = measure(driver, [loc], repeat=self.repeat)[0]
+        except Exception as e:
+            LOG_DEBUG('ERROR [locator cost]: {}'.format(e))
+            return None
+        if result['ms'] is not None and result['ms'] > budget:
+            self.over_budget[key] = result
+            LOG_WARN('定位求值耗时超出预算 {}ms: {}, {}'.format(budget, key, describe(result)))
+        return result
+
+
+LOCATOR_COSTS = LocatorCostChecker()
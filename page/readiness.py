@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# encoding: utf-8
+import math
+import threading
+import time
+import weakref
+from selenium.common.exceptions import WebDriverException
+from uitester.common.logger import *
+from uitester.common.timeouts import TimeoutManager
+from uitester.page.scripts import NETWORK_TRACKER_JS, WAIT_FOR_READY_JS
+
+# 常见前端框架的就绪判断, 页面未使用该框架时视为就绪
+FRAMEWORK_HOOKS = {
+    'angular': '!window.getAllAngularTestabilities || '
+               'window.getAllAngularTestabilities().every(function (t) { return t.isStable(); })',
+    'angularjs': '!window.angular || !window.angular.element(document.body).injector() || '
+                 'window.angular.element(document.body).injector().get("$http").pendingRequests.length === 0',
+    'jquery': '!window.jQuery || window.jQuery.active === 0',
+}
+# 等待期间发生跳转时中断脚本的错误, 只有这些会在新页面上重试, 弹窗、脚本错误等直接结束等待
+INTERRUPTED_ERRORS = ('document unloaded', 'execution context was destroyed', 'cannot find context',
+                      'inspected target navigated', 'target frame detached', 'no such execution context')
+
+
+def ready_script(hooks):
+    # 把框架钩子拼接到 WAIT_FOR_READY_JS 前, 钩子为 FRAMEWORK_HOOKS 中的名称或js表达式
+    functions = []
+    for hook in hooks:
+        functions.append('function () {{ return ({}); }}'.format(FRAMEWORK_HOOKS.get(hook, hook)))
+    return 'var uitesterHooks = [{}];\n'.format(', '.join(functions)) + WAIT_FOR_READY_JS
+
+
+class ReadyStats(object):
+    # 按url统计导航到页面就绪的耗时
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.pages = {}
+
+    def record(self, url, elapsed, ready):
+        with self._lock:
+            count, total, longest, timeouts = self.pages.get(url, (0, 0.0, 0.0, 0))
+            self.pages[url] = (count + 1, total + elapsed, max(longest, elapsed), timeouts + (0 if ready else 1))
+
+    def top(self, n=10):
+        """
+        :return: 总就绪耗时最长的 n 个url e.g. [{'url': '/index', 'count': 2, 'total': 3.1, 'max': 2.0, 'timeouts': 0}]
+        """
+        items = sorted(self.pages.items(), key=lambda item: item[1][1], reverse=True)[:n]
+        return [{'url': url, 'count': count, 'total': round(total, 3), 'max': round(longest, 3), 'timeouts': timeouts}
+                for url, (count, total, longest, timeouts) in items]
+
+
+READY_STATS = ReadyStats()
+
+
+class ReadinessWaiter(object):
+    """
+    导航后等待页面真正就绪, 一次 execute_async_script 在页面内轮询:
+    document.readyState、进行中的 fetch/XHR 数及空闲时长、框架钩子
+    fetch/XHR 统计脚本优先通过 CDP 在页面脚本执行前安装, 不支持 CDP 时在等待时补装, 此时只能统计补装之后发出的请求
+    """
+    _waiters = weakref.WeakKeyDictionary()
+    _waiters_lock = threading.Lock()
+
+    def __init__(self, driver):
+        self._driver = weakref.ref(driver)
+        self.installed = None
+
+    @classmethod
+    def of(cls, driver):
+        with cls._waiters_lock:
+            waiter = cls._waiters.get(driver)
+            if waiter is None:
+                waiter = cls._waiters[driver] = cls(driver)
+            return waiter
+
+    @property
+    def driver(self):
+        return self._driver()
+
+    def install(self):
+        # 只尝试一次, 之后每个新文档都会自动注入
+        if self.installed is None:
+            try:
+                self.driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {'source': NETWORK_TRACKER_JS})
+                self.installed = True
+            except Exception as e:
+                LOG_DEBUG('请求统计脚本无法通过CDP预装, 改为等待时注入: {}'.format(e))
+                self.installed = False
+        return self.installed
+
+    def wait(self, timeout=10, idle=0.5, ready_state='complete', hooks=None):
+        """
+        等待当前页面就绪, 超时不抛错
+        :param timeout: 最长等待时间(秒)
+        :param idle: 没有进行中的 fetch/XHR 持续多久(秒)视为网络空闲
+        :param ready_state: type: str e.g. 'complete', 'interactive'
+        :param hooks: type: list FRAMEWORK_HOOKS 中的名称或返回布尔值的js表达式 e.g. ['jquery', '!window.loading']
+        :return: type: dict e.g. {'ready': True, 'readyState': 'complete', 'inflight': 0, 'pendingHooks': []}
+        """
+        hooks = list(hooks or [])
+        script = ready_script(hooks)
+        deadline = time.time() + timeout
+        result = {'ready': False, 'readyState': None, 'inflight': None, 'pendingHooks': []}
+        TimeoutManager.of(self.driver).ensure_script_timeout(int(math.ceil(timeout)) + 5)
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                result = self.driver.execute_async_script(script, ready_state, int(idle * 1000),
+                                                          int(remaining * 1000)) or result
+                break
+            except WebDriverException as e:
+                message = (e.msg or '').lower()
+                if not any(error in message for error in INTERRUPTED_ERRORS):
+                    LOG_DEBUG('ERROR [wait ready]: {}'.format(e))
+                    break
+                # 等待期间发生跳转会中断脚本, 在新页面上继续等待剩余时间
+                LOG_DEBUG('页面就绪等待中断, 重新等待: {}'.format(e))
+                time.sleep(0.05)
+        result['pendingHooks'] = [hooks[index] for index in result.get('pendingHooks') or []]
+        return result
+
+
+def wait_for_ready(driver, url, load, timeout=10, idle=0.5, ready_state='complete', hooks=None):
+    """
+    执行导航并等待页面就绪, 记录该url的就绪耗时
+    :param load: 无参函数, 执行实际的导航 e.g. lambda: driver.get(url)
+    :return: type: bool 是否在超时前就绪
+    """
+    waiter = ReadinessWaiter.of(driver)
+    waiter.install()
+    start = time.time()
+    load()
+    result = waiter.wait(timeout=max(timeout - (time.time() - start), 0), idle=idle, ready_state=ready_state,
+                         hooks=hooks)
+    elapsed = time.time() - start
+    READY_STATS.record(url, elapsed, result['ready'])
+    if result['ready']:
+        LOG_DEBUG('页面就绪, 耗时 {:.3f}s: {}'.format(elapsed, url))
+    else:
+        LOG_WARN('页面在 {}s 内未就绪: {}, readyState: {}, 进行中的请求: {}, 未满足的钩子: {}'.format(
+            timeout, url, result['readyState'], result['inflight'], result['pendingHooks']))
+    return result['ready']
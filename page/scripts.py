@@ -0,0 +1,531 @@
+#!/usr/bin/env python
+# encoding: utf-8
+# 注入页面执行的js脚本, 统一在此维护, 由 BasePage 等通过 execute_script 调用
+
+# 在页面内按 selenium 定位方式查找元素, 返回元素数组
+LOCATE_JS = '''
+function uitesterLocate(by, value, root) {
+    root = root || document;
+    var result = [], i, nodes;
+    if (by === 'xpath') {
+        var snapshot = document.evaluate(value, root, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+        for (i = 0; i < snapshot.snapshotLength; i++) {
+            result.push(snapshot.snapshotItem(i));
+        }
+        return result;
+    }
+    if (by === 'id') {
+        nodes = root.querySelectorAll('[id="' + value.replace(/"/g, '\\\\"') + '"]');
+    } else if (by === 'name') {
+        nodes = root.querySelectorAll('[name="' + value.replace(/"/g, '\\\\"') + '"]');
+    } else if (by === 'class name') {
+        nodes = root.getElementsByClassName(value);
+    } else if (by === 'tag name') {
+        nodes = root.getElementsByTagName(value);
+    } else if (by === 'link text' || by === 'partial link text') {
+        nodes = [];
+        var links = root.getElementsByTagName('a');
+        for (i = 0; i < links.length; i++) {
+            var text = (links[i].innerText || '').trim();
+            if (by === 'link text' ? text === value : text.indexOf(value) !== -1) {
+                nodes.push(links[i]);
+            }
+        }
+    } else {
+        nodes = root.querySelectorAll(value);
+    }
+    for (i = 0; i < nodes.length; i++) {
+        result.push(nodes[i]);
+    }
+    return result;
+}
+'''
+
+# 与 WebElement.is_displayed 近似的可见性判断
+DISPLAYED_JS = '''
+function uitesterDisplayed(el) {
+    if (!el || !el.isConnected) {
+        return false;
+    }
+    var style = window.getComputedStyle(el);
+    if (style.display === 'none' || style.visibility === 'hidden' || style.visibility === 'collapse') {
+        return false;
+    }
+    if (parseFloat(style.opacity) === 0) {
+        return false;
+    }
+    return el.getClientRects().length > 0;
+}
+'''
+
+# 一次调用读取所有匹配元素的文本/属性/状态
+# arguments: by, value, elements(已有元素列表, 可为 null), fields
+READ_MANY_JS = LOCATE_JS + DISPLAYED_JS + '''
+var by = arguments[0], value = arguments[1], elements = arguments[2], fields = arguments[3];
+if (!elements) {
+    elements = uitesterLocate(by, value, document);
+}
+function readAttribute(el, name) {
+    var prop = el[name];
+    if (typeof prop === 'boolean') {
+        return prop ? 'true' : null;
+    }
+    if (prop !== undefined && prop !== null && typeof prop !== 'object' && typeof prop !== 'function') {
+        return String(prop);
+    }
+    return el.getAttribute(name);
+}
+return elements.map(function (el) {
+    var item = {}, displayed = null;
+    fields.forEach(function (field) {
+        if (field.charAt(0) === '@') {
+            item[field] = readAttribute(el, field.substring(1));
+        } else if (field === 'text') {
+            if (displayed === null) {
+                displayed = uitesterDisplayed(el);
+            }
+            item[field] = displayed ? el.innerText : '';
+        } else if (field === 'displayed') {
+            if (displayed === null) {
+                displayed = uitesterDisplayed(el);
+            }
+            item[field] = displayed;
+        } else if (field === 'enabled') {
+            item[field] = !el.disabled;
+        } else if (field === 'selected') {
+            item[field] = !!(el.checked || el.selected);
+        } else if (field === 'tag_name') {
+            item[field] = el.tagName.toLowerCase();
+        } else if (field === 'value') {
+            item[field] = el.value === undefined ? null : el.value;
+        } else if (field === 'location') {
+            var rect = el.getBoundingClientRect();
+            item[field] = {x: Math.round(rect.left + window.pageXOffset), y: Math.round(rect.top + window.pageYOffset)};
+        } else if (field === 'size') {
+            var box = el.getBoundingClientRect();
+            item[field] = {width: Math.round(box.width), height: Math.round(box.height)};
+        } else {
+            item[field] = null;
+        }
+    });
+    return item;
+});
+'''
+
+# 在页面内用 MutationObserver 等待元素出现且可见(或消失), 通过 execute_async_script 调用
+# arguments: by, value, timeout(ms), multiple, gone, callback
+WAIT_FOR_ELEMENT_JS = LOCATE_JS + DISPLAYED_JS + '''
+var by = arguments[0], value = arguments[1], timeout = arguments[2], multiple = arguments[3], gone = arguments[4];
+var done = arguments[arguments.length - 1];
+function check() {
+    var elements = uitesterLocate(by, value, document);
+    var visible = elements.length > 0 && uitesterDisplayed(elements[0]);
+    if (gone) {
+        return visible ? null : true;
+    }
+    if (visible) {
+        return multiple ? elements : elements[0];
+    }
+    return null;
+}
+var result = check();
+if (result) {
+    done(result);
+    return;
+}
+var finished = false, observer, timer, ticker;
+function finish(value) {
+    if (finished) {
+        return;
+    }
+    finished = true;
+    observer.disconnect();
+    clearTimeout(timer);
+    clearInterval(ticker);
+    done(value);
+}
+function onChange() {
+    if (!finished) {
+        var value = check();
+        if (value) {
+            finish(value);
+        }
+    }
+}
+observer = new MutationObserver(onChange);
+observer.observe(document.documentElement, {childList: true, subtree: true, attributes: true, characterData: true});
+timer = setTimeout(function () { finish(null); }, timeout);
+// 样式表/动画引起的可见性变化不会产生DOM变更, 低频兜底检查
+ticker = setInterval(onChange, 200);
+'''
+
+# 元素中心点不在视口内时才滚动到视口中央, 返回是否发生了滚动
+# arguments: element
+SCROLL_INTO_VIEW_IF_NEEDED_JS = '''
+var el = arguments[0], rect = el.getBoundingClientRect();
+var width = window.innerWidth || document.documentElement.clientWidth;
+var height = window.innerHeight || document.documentElement.clientHeight;
+var x = rect.left + rect.width / 2, y = rect.top + rect.height / 2;
+if (x >= 0 && y >= 0 && x < width && y < height) {
+    return false;
+}
+el.scrollIntoView({block: 'center', inline: 'center'});
+return true;
+'''
+
+# 统计页面内进行中的 fetch/XHR 请求数和最近一次请求开始/结束的时间, 重复注入时不生效
+# 通过 CDP Page.addScriptToEvaluateOnNewDocument 在页面脚本之前安装, 不支持时由 WAIT_FOR_READY_JS 补装
+NETWORK_TRACKER_JS = '''
+(function () {
+    if (window.__uitesterNet) {
+        return;
+    }
+    var net = window.__uitesterNet = {inflight: 0, last: Date.now()};
+    function begin() {
+        net.inflight++;
+        net.last = Date.now();
+    }
+    function end() {
+        net.inflight = Math.max(net.inflight - 1, 0);
+        net.last = Date.now();
+    }
+    if (window.fetch) {
+        var originalFetch = window.fetch;
+        window.fetch = function () {
+            begin();
+            try {
+                return originalFetch.apply(this, arguments).then(function (response) {
+                    end();
+                    return response;
+                }, function (error) {
+                    end();
+                    throw error;
+                });
+            } catch (e) {
+                end();
+                throw e;
+            }
+        };
+    }
+    if (window.XMLHttpRequest) {
+        var originalSend = XMLHttpRequest.prototype.send;
+        XMLHttpRequest.prototype.send = function () {
+            var finished = false;
+            function finish() {
+                if (!finished) {
+                    finished = true;
+                    end();
+                }
+            }
+            begin();
+            this.addEventListener('loadend', finish);
+            try {
+                return originalSend.apply(this, arguments);
+            } catch (e) {
+                finish();
+                throw e;
+            }
+        };
+    }
+})();
+'''
+
+# 等待页面就绪: readyState 达到要求、没有进行中的 fetch/XHR 且空闲 idle 毫秒、框架钩子全部返回 true
+# 调用方在脚本前定义 uitesterHooks 函数数组, 通过 execute_async_script 调用
+# arguments: readyState('complete'/'interactive'), idle(ms), timeout(ms), callback
+WAIT_FOR_READY_JS = NETWORK_TRACKER_JS + '''
+var readyState = arguments[0], idle = arguments[1], timeout = arguments[2];
+var done = arguments[arguments.length - 1];
+var start = Date.now(), net = window.__uitesterNet, timer = null;
+function pendingHooks() {
+    var pending = [];
+    for (var i = 0; i < uitesterHooks.length; i++) {
+        var ok;
+        try {
+            ok = !!uitesterHooks[i]();
+        } catch (e) {
+            ok = false;
+        }
+        if (!ok) {
+            pending.push(i);
+        }
+    }
+    return pending;
+}
+function check() {
+    var now = Date.now();
+    var stateReady = readyState === 'interactive' ? document.readyState !== 'loading' : document.readyState === 'complete';
+    var pending = stateReady ? pendingHooks() : [];
+    var ready = stateReady && net.inflight === 0 && now - net.last >= idle && pending.length === 0;
+    if (ready || now - start >= timeout) {
+        clearInterval(timer);
+        done({ready: ready, elapsed: now - start, readyState: document.readyState, inflight: net.inflight,
+              pendingHooks: pending});
+        return true;
+    }
+    return false;
+}
+if (!check()) {
+    timer = setInterval(check, 25);
+}
+'''
+
+# 按定位(或已有元素)提取子树, 不传定位时为整个文档
+# mode: 'html' 返回 outerHTML, 'text' 返回 innerText, 'snapshot' 在页面内生成精简结构:
+#       按文档顺序的节点列表 [{tag, depth, id, class, text}], text 只含元素自身的文本
+# arguments: by, value, element, mode, maxDepth(可为 null), maxText, maxNodes
+EXTRACT_SOURCE_JS = LOCATE_JS + '''
+var by = arguments[0], value = arguments[1], root = arguments[2], mode = arguments[3];
+var maxDepth = arguments[4], maxText = arguments[5], maxNodes = arguments[6];
+if (!root) {
+    root = by ? uitesterLocate(by, value, document)[0] : document.documentElement;
+}
+if (!root) {
+    return null;
+}
+if (mode === 'html') {
+    return root.outerHTML;
+}
+if (mode === 'text') {
+    return root.innerText;
+}
+var nodes = [], skip = {script: true, style: true, noscript: true, template: true};
+function ownText(el) {
+    var text = '';
+    for (var child = el.firstChild; child; child = child.nextSibling) {
+        if (child.nodeType === 3) {
+            text += child.nodeValue;
+        }
+    }
+    text = text.replace(/\\s+/g, ' ').trim();
+    return text.length > maxText ? text.substring(0, maxText) + '...' : text;
+}
+function walk(el, depth) {
+    var tag = el.tagName.toLowerCase();
+    if (nodes.length >= maxNodes || skip[tag]) {
+        return;
+    }
+    var item = {tag: tag, depth: depth}, className = el.getAttribute('class'), text = ownText(el);
+    if (el.id) {
+        item.id = el.id;
+    }
+    if (className) {
+        item['class'] = className;
+    }
+    if (text) {
+        item.text = text;
+    }
+    nodes.push(item);
+    if (maxDepth !== null && depth >= maxDepth) {
+        return;
+    }
+    for (var child = el.firstElementChild; child; child = child.nextElementSibling) {
+        walk(child, depth + 1);
+    }
+}
+walk(root, 0);
+return nodes;
+'''
+
+# 分段读取整页源码: 首次调用时在页面内序列化并暂存, 之后按 offset 取片段, 取完最后一段后释放
+# arguments: token, offset, size; offset 为 -1 时只释放暂存
+SOURCE_CHUNK_JS = '''
+var token = arguments[0], offset = arguments[1], size = arguments[2];
+var store = window.__uitesterSource = window.__uitesterSource || {};
+if (offset < 0) {
+    delete store[token];
+    return null;
+}
+if (offset === 0) {
+    var doctype = document.doctype ? new XMLSerializer().serializeToString(document.doctype) : '';
+    store[token] = doctype + document.documentElement.outerHTML;
+}
+var source = store[token];
+if (source === undefined) {
+    return null;
+}
+var end = Math.min(offset + size, source.length), last = source.charCodeAt(end - 1);
+// 按 UTF-16 码元切分, 不能把代理对(emoji、扩展区汉字)切在两段里
+if (end < source.length && end - offset > 1 && last >= 0xD800 && last <= 0xDBFF) {
+    end -= 1;
+}
+if (end >= source.length) {
+    delete store[token];
+}
+return {total: source.length, next: end, chunk: source.substring(offset, end)};
+'''
+
+# 批量填写表单: 定位并设置每个字段, 按元素类型触发对应事件
+# 文本框用原生 value setter 赋值(兼容 React 等框架的值追踪)后触发 input/change, 复选框/单选框通过 click 切换,
+# 下拉框按 value 或可见文本选择
+# arguments: items [{by, value, element, val}], 返回与 items 对应的失败原因数组, 成功为 null
+FILL_FORM_JS = LOCATE_JS + '''
+var items = arguments[0];
+function fire(el, type) {
+    el.dispatchEvent(new Event(type, {bubbles: true}));
+}
+function setValue(el, val) {
+    var proto = el.tagName === 'TEXTAREA' ? HTMLTextAreaElement.prototype : HTMLInputElement.prototype;
+    var descriptor = Object.getOwnPropertyDescriptor(proto, 'value');
+    if (descriptor && descriptor.set) {
+        descriptor.set.call(el, val);
+    } else {
+        el.value = val;
+    }
+}
+function fillSelect(el, val) {
+    var values = (val instanceof Array ? val : [val]).map(String), matched = 0;
+    for (var i = 0; i < el.options.length; i++) {
+        var option = el.options[i];
+        var hit = values.indexOf(option.value) !== -1 || values.indexOf(option.text.trim()) !== -1;
+        if (hit && !el.multiple && matched) {
+            hit = false;
+        }
+        option.selected = hit;
+        if (hit) {
+            matched++;
+        }
+    }
+    if (!matched) {
+        return 'no option matches: ' + values.join(',');
+    }
+    fire(el, 'input');
+    fire(el, 'change');
+    return null;
+}
+function fillCheckable(el, type, val) {
+    var target = el;
+    if (type === 'radio' && typeof val !== 'boolean') {
+        var group = (el.form || document).querySelectorAll('input[type="radio"]');
+        target = null;
+        for (var i = 0; i < group.length; i++) {
+            if (group[i].name === el.name && group[i].value === String(val)) {
+                target = group[i];
+            }
+        }
+        if (!target) {
+            return 'no radio with value: ' + val;
+        }
+        val = true;
+    }
+    val = !!val;
+    if (target.checked !== val) {
+        if (type === 'radio' && !val) {
+            target.checked = false;
+            fire(target, 'change');
+        } else {
+            target.click();
+        }
+    }
+    return target.checked === val ? null : 'checked state not changed';
+}
+function fill(el, val) {
+    var tag = el.tagName.toLowerCase(), type = (el.getAttribute('type') || '').toLowerCase();
+    if (el.disabled || el.readOnly) {
+        return 'element is disabled or readonly';
+    }
+    if (tag === 'select') {
+        return fillSelect(el, val);
+    }
+    if (tag === 'input' && (type === 'checkbox' || type === 'radio')) {
+        return fillCheckable(el, type, val);
+    }
+    val = val === null || val === undefined ? '' : String(val);
+    if (el.isContentEditable) {
+        el.textContent = val;
+        fire(el, 'input');
+        return null;
+    }
+    if (tag !== 'input' && tag !== 'textarea') {
+        return 'unsupported element: ' + tag;
+    }
+    el.focus({preventScroll: true});
+    setValue(el, val);
+    fire(el, 'input');
+    fire(el, 'change');
+    el.blur();
+    return null;
+}
+return items.map(function (item) {
+    var el = item.element || uitesterLocate(item.by, item.value, document)[0];
+    if (!el) {
+        return 'not found';
+    }
+    try {
+        return fill(el, item.val);
+    } catch (e) {
+        return String(e);
+    }
+});
+'''
+
+# 元素中心点不在视口内时滚动到视口中央, 返回元素中心的视口坐标, 元素不可见时返回 null
+# 供 CDP Input.dispatchMouseEvent 点击使用
+# arguments: element
+CLICK_POINT_JS = DISPLAYED_JS + '''
+var el = arguments[0];
+if (!uitesterDisplayed(el)) {
+    return null;
+}
+var rect = el.getBoundingClientRect();
+var width = window.innerWidth || document.documentElement.clientWidth;
+var height = window.innerHeight || document.documentElement.clientHeight;
+var x = rect.left + rect.width / 2, y = rect.top + rect.height / 2;
+if (x < 0 || y < 0 || x >= width || y >= height) {
+    el.scrollIntoView({block: 'center', inline: 'center'});
+    rect = el.getBoundingClientRect();
+}
+return {x: rect.left + rect.width / 2, y: rect.top + rect.height / 2};
+'''
+
+# 聚焦并清空输入框/可编辑元素, 触发 input/change 事件, 之后由 CDP Input.insertText 输入
+# arguments: element
+CLEAR_AND_FOCUS_JS = '''
+var el = arguments[0];
+el.focus();
+if (el.isContentEditable) {
+    el.textContent = '';
+} else {
+    var proto = el instanceof HTMLTextAreaElement ? HTMLTextAreaElement.prototype : HTMLInputElement.prototype;
+    var descriptor = Object.getOwnPropertyDescriptor(proto, 'value');
+    if (descriptor && descriptor.set) {
+        descriptor.set.call(el, '');
+    } else {
+        el.value = '';
+    }
+}
+el.dispatchEvent(new Event('input', {bubbles: true}));
+el.dispatchEvent(new Event('change', {bubbles: true}));
+'''
+
+# 测量定位在页面内的平均求值耗时(毫秒), 有改写候选时比较两者匹配到的元素是否完全一致
+# arguments: items [{'by', 'value', 'candidate': [by, value] 或 null}], repeat
+LOCATOR_COST_JS = LOCATE_JS + '''
+var items = arguments[0], repeat = Math.max(arguments[1], 1);
+function uitesterCost(by, value) {
+    // 首次调用作为预热不计时, 其结果用于比较
+    var nodes = uitesterLocate(by, value, document), start = performance.now();
+    for (var i = 0; i < repeat; i++) {
+        uitesterLocate(by, value, document);
+    }
+    return {ms: (performance.now() - start) / repeat, nodes: nodes};
+}
+return items.map(function (item) {
+    var result = {ms: null, count: 0, candidate_ms: null, same: null, error: null};
+    try {
+        var cost = uitesterCost(item.by, item.value);
+        result.ms = cost.ms;
+        result.count = cost.nodes.length;
+        if (item.candidate) {
+            var candidate = uitesterCost(item.candidate[0], item.candidate[1]);
+            result.candidate_ms = candidate.ms;
+            result.same = candidate.nodes.length === cost.nodes.length && cost.nodes.every(function (node, i) {
+                return node === candidate.nodes[i];
+            });
+        }
+    } catch (e) {
+        result.error = String(e);
+    }
+    return result;
+});
+'''
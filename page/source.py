@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# encoding: utf-8
+import itertools
+import os
+import time
+from selenium.common.exceptions import WebDriverException
+from uitester.common.logger import *
+from uitester.page.scripts import EXTRACT_SOURCE_JS, SOURCE_CHUNK_JS
+
+_tokens = itertools.count(1)
+
+
+def extract_source(driver, loc=None, ele=None, mode='html', max_depth=None, max_text=200, max_nodes=5000):
+    """
+    在页面内提取局部源码/文本/结构, 只传回需要的部分
+    :param loc: 元素定位, 与 ele 都为空时提取整个文档
+    :param ele: 已查找到的元素
+    :param mode: type: str e.g. 'html': outerHTML, 'text': innerText, 'snapshot': 节点列表
+    :param max_depth: snapshot 相对根节点的最大深度, None 不限制
+    :param max_text: snapshot 中每个节点文本的最大长度
+    :param max_nodes: snapshot 最多返回的节点数
+    :return: html/text 为 str, snapshot 为 list of dict e.g. [{'tag': 'div', 'depth': 0, 'id': 'app', 'class': 'main'}],
+             定位不到元素时返回 None
+    """
+    by, value = loc if loc and not ele else (None, None)
+    return driver.execute_script(EXTRACT_SOURCE_JS, by, value, ele, mode, max_depth, max_text, max_nodes)
+
+
+def iter_page_source(driver, chunk_size=256 * 1024):
+    """
+    分段读取整页源码, 每段单独传输和编码, 避免一次在python侧构造整页的大字符串
+    中途页面跳转导致暂存丢失时抛出 WebDriverException
+    :param chunk_size: 每段的字符数
+    :return: generator of utf-8 bytes
+    """
+    token = '{}-{}-{}'.format(os.getpid(), int(time.time() * 1000), next(_tokens))
+    offset, total = 0, None
+    try:
+        while total is None or offset < total:
+            result = driver.execute_script(SOURCE_CHUNK_JS, token, offset, chunk_size)
+            if result is None:
+                raise WebDriverException('page source chunk lost at offset {}, page reloaded?'.format(offset))
+            total = result['total']
+            chunk = result['chunk']
+            # 偏移按js的码元计数, 与python侧的字符数不一定相同
+            offset = result['next']
+            if not chunk:
+                break
+            yield chunk.encode('utf-8', 'ignore')
+    finally:
+        if total is None or offset < total:
+            try:
+                driver.execute_script(SOURCE_CHUNK_JS, token, -1, 0)
+            except Exception:
+                pass
+
+
+def save_page_source(driver, filepath, chunk_size=256 * 1024):
+    """
+    分段读取整页源码并逐段写入文件
+    :return: 写入的字节数
+    """
+    written = 0
+    with open(filepath, 'wb') as f:
+        for chunk in iter_page_source(driver, chunk_size):
+            f.write(chunk)
+            written += len(chunk)
+    return written
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# encoding: utf-8
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from selenium.common.exceptions import NoSuchWindowException
+from uitester.common.logger import *
+from uitester.page.readiness import ReadinessWaiter, READY_STATS
+
+# 只发起导航不等待加载, 新标签页在后台并行加载
+_OPEN_TAB_JS = 'window.open(arguments[0], "_blank");'
+
+
+class TabManager(object):
+    """
+    按逻辑名称管理一个 driver 的标签页
+    open 一次性新建多个标签页并同时开始加载, 不切换当前窗口; 之后只在命令需要某个标签页时才切换过去,
+    已处于该标签页时不重复切换, 因此窗口切换都应通过 TabManager 进行, 在其之外切换或关闭窗口后需调用 invalidate.
+    新建和关闭优先通过 CDP(Target.createTarget/closeTarget) 完成, chromedriver 的窗口句柄即 DevTools 的 targetId;
+    不支持 CDP 时退回 window.open
+    """
+    _managers = weakref.WeakKeyDictionary()
+    _managers_lock = threading.Lock()
+
+    def __init__(self, driver):
+        self._driver = weakref.ref(driver)
+        self.handles = OrderedDict()
+        self.urls = {}
+        self.current = None
+        self._cdp = None
+
+    @classmethod
+    def of(cls, driver):
+        # 每个 driver 对应唯一的 TabManager
+        with cls._managers_lock:
+            manager = cls._managers.get(driver)
+            if manager is None:
+                manager = cls._managers[driver] = cls(driver)
+            return manager
+
+    def reset(self):
+        # driver 被其他测试类复用前调用, 浏览器池归还时已关闭多余窗口
+        self.handles.clear()
+        self.urls.clear()
+        self.current = None
+
+    def invalidate(self):
+        # 窗口在 TabManager 之外被切换或关闭, 下次 switch 一定发送切换命令
+        self.current = None
+
+    @property
+    def driver(self):
+        return self._driver()
+
+    def _current(self):
+        if self.current is None:
+            self.current = self.driver.current_window_handle
+            if self.current not in self.handles.values():
+                self.handles.setdefault('main', self.current)
+        return self.current
+
+    def _create(self, url):
+        # 返回新标签页的 targetId, 不支持 CDP 时返回 None
+        if self._cdp is not False:
+            try:
+                target = self.driver.execute_cdp_cmd('Target.createTarget', {'url': url, 'background': True})
+                self._cdp = True
+                return target['targetId']
+            except Exception as e:
+                LOG_DEBUG('CDP新建标签页不可用, 改用 window.open: {}'.format(e))
+                self._cdp = False
+        return None
+
+    def open(self, urls):
+        """
+        新建标签页并同时开始加载, 不等待加载完成也不切换
+        :param urls: type: dict or list e.g. {'detail-1': url1, 'detail-2': url2}, 列表时以url作为名称
+        :return: type: list 标签页名称
+        """
+        items = list(urls.items()) if isinstance(urls, dict) else [(url, url) for url in urls]
+        self._current()
+        targets = []
+        known = None
+        for name, url in items:
+            target = self._create(url)
+            if target is None:
+                # window.open 后对比句柄列表找出新标签页
+                if known is None:
+                    known = set(self.driver.window_handles)
+                self.driver.execute_script(_OPEN_TAB_JS, url)
+                handles = self.driver.window_handles
+                self.handles[name] = [handle for handle in handles if handle not in known][-1]
+                known = set(handles)
+            else:
+                targets.append((name, target))
+            self.urls[name] = url
+        if targets:
+            # 兼容旧版 chromedriver 带 'CDwindow-' 前缀的句柄, 一次取回所有句柄完成对应
+            handles = self.driver.window_handles
+            for name, target in targets:
+                self.handles[name] = next((handle for handle in handles if handle.endswith(target)), target)
+        LOG_DEBUG('新建标签页: {}'.format([name for name, url in items]))
+        return [name for name, url in items]
+
+    def switch(self, name):
+        """
+        切换到指定标签页, 已在该标签页时不发送命令
+        :param name: open 时的名称, 'main' 为创建 TabManager 时的窗口
+        """
+        handle = self.handles[name]
+        if self.current != handle:
+            self.driver.switch_to.window(handle)
+            self.current = handle
+        return handle
+
+    def adopt(self, name, handle):
+        # 登记由页面操作打开的窗口 e.g. 点击 target=_blank 的链接
+        self.handles[name] = handle
+        return name
+
+    def switch_to_new(self):
+        """
+        切换到最后打开的非当前窗口, 只有一个窗口时停留在当前窗口
+        :return: 切换后的窗口句柄
+        """
+        handles = self.driver.window_handles
+        current = self._current()
+        others = [handle for handle in handles if handle != current]
+        if others:
+            self.driver.switch_to.window(others[-1])
+            self.current = others[-1]
+            if others[-1] not in self.handles.values():
+                self.adopt('window-{}'.format(len(self.handles)), others[-1])
+        return self.current
+
+    def wait(self, name, timeout=10, idle=0.5, hooks=None):
+        """
+        切换到标签页并等待其就绪, 标签页在后台已并行加载, 通常无需等待
+        :return: type: bool
+        """
+        self.switch(name)
+        start = time.time()
+        result = ReadinessWaiter.of(self.driver).wait(timeout=timeout, idle=idle, hooks=hooks)
+        READY_STATS.record(self.urls.get(name, name), time.time() - start, result['ready'])
+        if not result['ready']:
+            LOG_WARN('标签页 {} 在 {}s 内未就绪'.format(name, timeout))
+        return result['ready']
+
+    def for_each_tab(self, fn, names=None, wait=True, timeout=10):
+        """
+        依次在每个标签页上执行 fn, 标签页已在后台并行加载, 只付出切换和 fn 本身的耗时
+        :param fn: 参数为标签页名称的函数, 执行时已切换到该标签页
+        :param names: 默认为 open 打开的全部标签页
+        :param wait: 执行 fn 前是否等待标签页就绪
+        :return: type: OrderedDict 名称 -> fn 的返回值, fn 抛错时为异常对象
+        """
+        names = list(names or [name for name in self.handles if name != 'main'])
+        results = OrderedDict()
+        for name in names:
+            for attempt in range(2):
+                try:
+                    if wait:
+                        self.wait(name, timeout=timeout)
+                    else:
+                        self.switch(name)
+                    results[name] = fn(name)
+                    break
+                except NoSuchWindowException as e:
+                    # 当前窗口已被关闭或在外部切换过, 记录的 current 失效, 重新切换后再试一次
+                    LOG_DEBUG('ERROR [for_each_tab]: {}, {}'.format(name, e))
+                    self.invalidate()
+                    results[name] = e
+                except Exception as e:
+                    LOG_DEBUG('ERROR [for_each_tab]: {}, {}'.format(name, e))
+                    results[name] = e
+                    break
+        return results
+
+    def close(self, names=None, switch_to='main'):
+        """
+        关闭标签页, 默认关闭除 main 之外的全部, 之后切换到 switch_to
+        """
+        names = list(names or [name for name in self.handles if name != 'main'])
+        for name in names:
+            handle = self.handles.pop(name, None)
+            self.urls.pop(name, None)
+            if handle is None:
+                continue
+            try:
+                if self._cdp and handle != self.current:
+                    self.driver.execute_cdp_cmd('Target.closeTarget', {'targetId': handle.split('CDwindow-')[-1]})
+                else:
+                    if self.current != handle:
+                        self.driver.switch_to.window(handle)
+                    self.driver.close()
+                    self.current = None
+            except Exception as e:
+                LOG_DEBUG('ERROR [close tab]: {}, {}'.format(name, e))
+        if switch_to in self.handles:
+            self.switch(switch_to)
+        LOG_DEBUG('关闭标签页: {}'.format(names))
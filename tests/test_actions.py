@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# encoding: utf-8
+import unittest
+from selenium.webdriver import ActionChains
+from selenium.webdriver.common.by import By
+from uitester.benchmark.fake_driver import FakeWebDriver
+from uitester.page.actions import ActionBatch
+from uitester.page.scripts import SCROLL_INTO_VIEW_IF_NEEDED_JS
+
+HAS_WHEEL = hasattr(ActionChains, 'scroll_to_element')
+
+
+class RecordingDriver(FakeWebDriver):
+    # 记录发给 FakeWebDriver 的 actions 和 executeScript 命令
+    def __init__(self, *args, **kwargs):
+        super(RecordingDriver, self).__init__(*args, **kwargs)
+        self.sent = []
+
+    def execute(self, driver_command, params=None):
+        if driver_command in ('actions', 'executeScript'):
+            self.sent.append((driver_command, params))
+        return super(RecordingDriver, self).execute(driver_command, params)
+
+
+def device_actions(params):
+    # e.g. {'mouse': ['pointerMove', 'pointerDown', ...], 'wheel': ['pause', 'scroll']}
+    return dict((source['type'], [action['type'] for action in source['actions']]) for source in params['actions'])
+
+
+class ActionBatchTest(unittest.TestCase):
+    def setUp(self):
+        self.driver = RecordingDriver()
+        self.driver.get('http://fixtures.local/form.html')
+        self.username = self.driver.find_element(By.ID, 'username')
+        self.save = self.driver.find_element(By.ID, 'save')
+
+    def test_actions_sent_in_one_request(self):
+        batch = ActionBatch(self.driver)
+        batch.move_to_element(self.username).click().key_down('a').key_up('a')
+        self.assertEqual(len(batch), 4)
+        batch.perform()
+        self.assertEqual([command for command, _ in self.driver.sent], ['actions'])
+        self.assertEqual(len(batch), 0)
+
+    def test_empty_batch_sends_nothing(self):
+        ActionBatch(self.driver).perform()
+        self.assertEqual(self.driver.sent, [])
+
+    def test_unknown_action_rejected(self):
+        with self.assertRaises(AttributeError):
+            ActionBatch(self.driver).submit()
+
+    def test_summary_groups_repeated_steps(self):
+        batch = ActionBatch(self.driver).click_and_hold(self.username)
+        for _ in range(3):
+            batch.move_by_offset(1, 0)
+        batch.release()
+        self.assertEqual(batch.summary(), 'click_and_hold, move_by_offset x3, release')
+
+    @unittest.skipUnless(HAS_WHEEL, 'selenium 4.2+ 才有滚轮动作')
+    def test_scroll_waits_for_previous_ticks(self):
+        batch = ActionBatch(self.driver)
+        batch.move_to_element(self.username).click().scroll_to_element(self.save).move_to_element(self.save).click()
+        batch.perform()
+        command, params = self.driver.sent[-1]
+        self.assertEqual(command, 'actions')
+        actions = device_actions(params)
+        pointer = [source for source in actions if source not in ('key', 'wheel')][0]
+        scroll_tick = actions['wheel'].index('scroll')
+        # 滚动排在点击之后, 之后的移动排在滚动之后
+        self.assertEqual(scroll_tick, 3)
+        self.assertEqual(actions[pointer][:3], ['pointerMove', 'pointerDown', 'pointerUp'])
+        self.assertEqual(actions[pointer][scroll_tick], 'pause')
+        self.assertEqual(actions[pointer][scroll_tick + 1:], ['pointerMove', 'pointerDown', 'pointerUp'])
+
+    @unittest.skipIf(HAS_WHEEL, '没有滚轮动作时的回退路径')
+    def test_scroll_performs_pending_actions_first(self):
+        batch = ActionBatch(self.driver)
+        batch.move_to_element(self.username).click().scroll_to_element(self.save)
+        self.assertEqual(len(batch), 0)
+        self.assertEqual([command for command, _ in self.driver.sent], ['actions', 'executeScript'])
+        self.assertEqual(self.driver.sent[1][1]['script'], SCROLL_INTO_VIEW_IF_NEEDED_JS)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# encoding: utf-8
+import sys
+import unittest
+
+
+class PackageImportTest(unittest.TestCase):
+    # 包根目录使用绝对导入, python2/3 下都能导入 UIFrame
+    def test_import_uiframe(self):
+        import uitester
+        self.assertTrue(issubclass(uitester.UIFrame, unittest.TestCase))
+
+    @unittest.skipIf(sys.version_info < (3, 7), 'async_page 仅支持 python3.7+')
+    def test_import_async_page(self):
+        from uitester.page import async_page
+        for name in ('CDPConnection', 'AsyncElement', 'AsyncBasePage', 'AsyncBrowser', 'map_pages'):
+            self.assertTrue(hasattr(async_page, name), name)
+
+
+class StubConnection(object):
+    """
+    代替 CDPConnection: 记录发出的命令, 由 handler(method, params) 给出结果, 抛出的异常作为命令错误
+    测试文件需在 python2 下可编译, 不使用 async 语法, send 返回已完成的 future
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.sent = []
+
+    def _done(self, method, params):
+        import asyncio
+        future = asyncio.get_event_loop().create_future()
+        try:
+            future.set_result(self.handler(method, params or {}))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def send(self, method, params=None, session_id=None, timeout=None):
+        self.sent.append((method, params or {}, session_id))
+        return self._done(method, params)
+
+    def expect(self, method, session_id=None):
+        import asyncio
+        return asyncio.get_event_loop().create_future()
+
+    def close(self):
+        return self._done('close', None)
+
+
+@unittest.skipIf(sys.version_info < (3, 7), 'async_page 仅支持 python3.7+')
+class AsyncPageTest(unittest.TestCase):
+    def setUp(self):
+        import asyncio
+        from uitester.page import async_page
+        self.asyncio = asyncio
+        self.async_page = async_page
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+        self.asyncio.set_event_loop(None)
+
+    def run_coroutine(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def create_page(self, handler):
+        browser = self.async_page.AsyncBrowser('ws://stub')
+        browser.connection = StubConnection(handler)
+        return self.async_page.AsyncBasePage(browser, 'target-1', 'session-1')
+
+    def test_call_without_element_uses_evaluate(self):
+        page = self.create_page(lambda method, params: {'result': {'value': 3}})
+        self.assertEqual(self.run_coroutine(page._call('return arguments[0] + arguments[1];', [1, 2])), 3)
+        method, params, session_id = page.connection.sent[-1]
+        self.assertEqual((method, session_id), ('Runtime.evaluate', 'session-1'))
+        self.assertIn('.apply(window, [1, 2])', params['expression'])
+        self.assertTrue(params['returnByValue'])
+
+    def test_call_with_element_uses_call_function_on(self):
+        page = self.create_page(lambda method, params: {'result': {'value': 'ok'}})
+        ele = self.async_page.AsyncElement(page, 'node-7')
+        self.assertEqual(self.run_coroutine(page._call('return arguments[1];', [ele, 'x'])), 'ok')
+        method, params, _ = page.connection.sent[-1]
+        self.assertEqual(method, 'Runtime.callFunctionOn')
+        self.assertEqual(params['objectId'], 'node-7')
+        self.assertEqual(params['arguments'], [{'objectId': 'node-7'}, {'value': 'x'}])
+
+    def test_call_raises_javascript_exception(self):
+        from selenium.common.exceptions import JavascriptException
+        page = self.create_page(lambda method, params: {'exceptionDetails': {
+            'text': 'Uncaught', 'exception': {'description': 'ReferenceError: foo is not defined'}}})
+        with self.assertRaises(JavascriptException) as context:
+            self.run_coroutine(page._call('return foo;'))
+        self.assertIn('ReferenceError', str(context.exception))
+
+    def test_wait_retries_after_navigation_interrupt(self):
+        from selenium.common.exceptions import WebDriverException
+        calls = []
+
+        def handler(method, params):
+            calls.append(method)
+            if len(calls) == 1:
+                raise WebDriverException('Execution context was destroyed.')
+            return {'result': {'subtype': 'node', 'objectId': 'node-1'}}
+
+        page = self.create_page(handler)
+        ele = self.run_coroutine(page._wait(('css selector', '#name'), 2))
+        self.assertIsInstance(ele, self.async_page.AsyncElement)
+        self.assertEqual(ele.object_id, 'node-1')
+        self.assertEqual(calls, ['Runtime.evaluate', 'Runtime.evaluate'])
+
+    def test_wait_times_out_when_nothing_found(self):
+        from selenium.common.exceptions import TimeoutException
+        page = self.create_page(lambda method, params: {'result': {'type': 'object', 'subtype': 'null'}})
+        with self.assertRaises(TimeoutException):
+            self.run_coroutine(page._wait(('css selector', '#missing'), 0))
+
+    def test_map_keeps_url_order_and_errors(self):
+        targets = iter(range(100))
+        current = [None]
+
+        def handler(method, params):
+            if method == 'Target.createTarget':
+                return {'targetId': 'target-{}'.format(next(targets))}
+            if method == 'Target.attachToTarget':
+                return {'sessionId': 'session-' + params['targetId']}
+            if method == 'Page.navigate':
+                current[0] = params['url']
+                return {'errorText': 'net::ERR_NAME_NOT_RESOLVED'} if 'bad' in params['url'] else {}
+            if method == 'Runtime.evaluate':
+                return {'result': {'value': 'title of ' + current[0]}}
+            return {}
+
+        class Page(self.async_page.AsyncBasePage):
+            wait_ready = False
+
+        browser = self.async_page.AsyncBrowser('ws://stub', Page)
+        browser.connection = StubConnection(handler)
+        urls = ['http://a/1', 'http://bad/2', 'http://a/3']
+        results = self.run_coroutine(browser.map(urls, lambda page, url: self.asyncio.ensure_future(
+            page.get_title()), concurrency=1))
+        self.assertEqual(results[0], 'title of http://a/1')
+        self.assertIn('ERR_NAME_NOT_RESOLVED', str(results[1]))
+        self.assertEqual(results[2], 'title of http://a/3')
+        methods = [method for method, _, _ in browser.connection.sent]
+        self.assertEqual(methods.count('Target.createTarget'), 1)
+        self.assertEqual(methods.count('Target.closeTarget'), 1)
+        self.assertEqual(browser.pages, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# encoding: utf-8
+import unittest
+from uitester.common.browser_pool import BrowserPool
+
+
+class StubSwitchTo(object):
+    def __init__(self, driver):
+        self.driver = driver
+
+    def window(self, handle):
+        self.driver.calls.append(('switch', handle))
+        self.driver.current = handle
+
+
+class StubDriver(object):
+    # 记录 BrowserPool 调用的 driver 方法
+    def __init__(self, handles=('main',), cdp=True):
+        self.handles = list(handles)
+        self.current = self.handles[0]
+        self.cdp = cdp
+        self.healthy = True
+        self.calls = []
+        self.switch_to = StubSwitchTo(self)
+
+    @property
+    def current_window_handle(self):
+        if not self.healthy:
+            raise Exception('chrome not reachable')
+        return self.current
+
+    @property
+    def window_handles(self):
+        return list(self.handles)
+
+    def get(self, url):
+        self.calls.append(('get', url))
+
+    def close(self):
+        self.calls.append(('close', self.current))
+        self.handles.remove(self.current)
+
+    def execute_script(self, script, *args):
+        self.calls.append(('script', script))
+
+    def execute_cdp_cmd(self, cmd, params):
+        if not self.cdp:
+            raise Exception('not a chromium driver')
+        self.calls.append(('cdp', cmd))
+
+    def delete_all_cookies(self):
+        self.calls.append(('delete_cookies',))
+
+    def quit(self):
+        self.calls.append(('quit',))
+
+
+class BrowserPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.created = []
+        self.pool = BrowserPool(self.factory, max_uses=2)
+
+    def factory(self):
+        driver = StubDriver()
+        self.created.append(driver)
+        return driver
+
+    def test_released_driver_is_reused(self):
+        driver = self.pool.lease('http://index')
+        self.assertEqual(driver.calls, [('get', 'http://index')])
+        self.pool.release(driver)
+        self.assertIs(self.pool.lease(), driver)
+        self.assertEqual(len(self.created), 1)
+
+    def test_concurrent_leases_get_separate_drivers(self):
+        first, second = self.pool.lease(), self.pool.lease()
+        self.assertIsNot(first, second)
+        self.assertEqual(len(self.created), 2)
+
+    def test_driver_disposed_after_max_uses(self):
+        driver = self.pool.lease()
+        self.pool.release(driver)
+        self.assertIs(self.pool.lease(), driver)
+        self.pool.release(driver)
+        self.assertIn(('quit',), driver.calls)
+        self.assertIsNot(self.pool.lease(), driver)
+        self.assertEqual(len(self.created), 2)
+
+    def test_unhealthy_idle_driver_replaced(self):
+        driver = self.pool.lease()
+        self.pool.release(driver)
+        driver.healthy = False
+        replacement = self.pool.lease()
+        self.assertIsNot(replacement, driver)
+        self.assertIn(('quit',), driver.calls)
+
+    def test_reset_closes_extra_windows_and_clears_state(self):
+        driver = StubDriver(handles=('main', 'popup-1', 'popup-2'))
+        BrowserPool.reset(driver)
+        self.assertEqual(driver.handles, ['main'])
+        self.assertEqual(driver.current, 'main')
+        self.assertEqual([call[0] for call in driver.calls],
+                         ['switch', 'close', 'switch', 'close', 'switch', 'script', 'cdp'])
+
+    def test_reset_falls_back_to_delete_all_cookies(self):
+        driver = StubDriver(cdp=False)
+        BrowserPool.reset(driver)
+        self.assertEqual(driver.calls[-1], ('delete_cookies',))
+
+    def test_reset_failure_disposes_driver(self):
+        driver = self.pool.lease()
+        driver.handles = []
+        self.pool.release(driver)
+        self.assertIn(('quit',), driver.calls)
+        self.assertIsNot(self.pool.lease(), driver)
+
+    def test_shutdown_quits_all_drivers(self):
+        leased = self.pool.lease()
+        idle = self.pool.lease()
+        self.pool.release(idle)
+        self.pool.shutdown()
+        for driver in (leased, idle):
+            self.assertEqual(driver.calls[-1], ('quit',))
+        self.assertEqual(len(self.pool.lease().calls), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# encoding: utf-8
+import unittest
+from selenium.common.exceptions import StaleElementReferenceException
+from selenium.webdriver.common.by import By
+from uitester.benchmark.fake_driver import FakeWebDriver
+from uitester.page import BasePage
+from uitester.page.finder import ElementCache, LookupStats
+
+FORM_URL = 'http://fixtures.local/form.html'
+
+
+class StubElement(object):
+    def __init__(self, displayed=True, stale=False):
+        self.displayed = displayed
+        self.stale = stale
+
+    def is_displayed(self):
+        if self.stale:
+            raise StaleElementReferenceException('element is not attached to the page document')
+        return self.displayed
+
+
+class ElementCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.stats = LookupStats()
+        self.cache = ElementCache(max_size=2, stats=self.stats)
+
+    def test_hit_returns_cached_element(self):
+        ele = StubElement()
+        self.cache.put((), ('id', 'kw'), ele)
+        self.assertIs(self.cache.get((), ['id', 'kw']), ele)
+        self.assertEqual(self.stats.cache_hits, 1)
+
+    def test_entries_are_per_frame(self):
+        self.cache.put((), ('id', 'kw'), StubElement())
+        self.assertIsNone(self.cache.get((('id', 'frame'),), ('id', 'kw')))
+
+    def test_stale_or_hidden_element_dropped(self):
+        self.cache.put((), ('id', 'stale'), StubElement(stale=True))
+        self.cache.put((), ('id', 'hidden'), StubElement(displayed=False))
+        self.assertIsNone(self.cache.get((), ('id', 'stale')))
+        self.assertIsNone(self.cache.get((), ('id', 'hidden')))
+        self.assertEqual((self.stats.cache_stale, len(self.cache)), (2, 0))
+
+    def test_least_recently_put_evicted(self):
+        for name in ('a', 'b', 'c'):
+            self.cache.put((), ('id', name), StubElement())
+        self.assertEqual(len(self.cache), 2)
+        self.assertIsNone(self.cache.get((), ('id', 'a')))
+
+    def test_invalidate_clears_entries(self):
+        self.cache.put((), ('id', 'kw'), StubElement())
+        self.cache.invalidate('test')
+        self.assertEqual(len(self.cache), 0)
+
+
+class CachedPage(BasePage):
+    timing_store = None
+    default_timeout = 0
+
+
+class CountingDriver(FakeWebDriver):
+    def __init__(self, *args, **kwargs):
+        super(CountingDriver, self).__init__(*args, **kwargs)
+        self.finds = 0
+
+    def execute(self, driver_command, params=None):
+        if driver_command == 'findElements':
+            self.finds += 1
+        return super(CountingDriver, self).execute(driver_command, params)
+
+
+class PageCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.driver = CountingDriver()
+        self.driver.get(FORM_URL)
+        self.page = CachedPage(self.driver)
+
+    def test_second_lookup_served_from_cache(self):
+        first = self.page.find_element((By.ID, 'username'))
+        self.assertEqual(self.page.find_element((By.ID, 'username')), first)
+        self.assertEqual(self.driver.finds, 1)
+
+    def test_navigation_invalidates_cache(self):
+        for navigate in (lambda: self.page.get(FORM_URL), self.page.refresh, self.page.back):
+            self.page.find_element((By.ID, 'username'))
+            self.driver.finds = 0
+            navigate()
+            self.assertEqual(len(self.page.element_cache), 0)
+            self.assertTrue(self.page.find_element((By.ID, 'username')))
+            self.assertEqual(self.driver.finds, 1)
+
+    def test_element_hidden_after_caching_is_looked_up_again(self):
+        self.page.find_element((By.ID, 'username'))
+        node = [node for node in self.driver._root.descendants() if node.attrs.get('id') == 'username'][0]
+        node.attrs['style'] = 'display: none'
+        self.assertIsNone(self.page.find_element((By.ID, 'username')))
+        self.assertEqual(self.driver.finds, 2)
+
+    def test_cache_can_be_disabled(self):
+        class UncachedPage(CachedPage):
+            cache_elements = False
+
+        page = UncachedPage(self.driver)
+        page.find_element((By.ID, 'username'))
+        page.find_element((By.ID, 'username'))
+        self.assertIsNone(page.element_cache)
+        self.assertEqual(self.driver.finds, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# encoding: utf-8
+import time
+import unittest
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
+from uitester.benchmark.fake_driver import FakeWebDriver, Node
+from uitester.page.finder import ElementFinder, LookupStats, PollingWait, NoRetry, BackoffRetry, RefreshRetry
+
+FORM_URL = 'http://fixtures.local/form.html'
+
+
+class CountingDriver(FakeWebDriver):
+    # 按命令名统计 FakeWebDriver 收到的命令
+    def __init__(self, *args, **kwargs):
+        super(CountingDriver, self).__init__(*args, **kwargs)
+        self.sent = []
+
+    def execute(self, driver_command, params=None):
+        self.sent.append(driver_command)
+        return super(CountingDriver, self).execute(driver_command, params)
+
+
+class RefreshingPage(object):
+    # RefreshRetry 只用到页面对象的 refresh
+    def __init__(self, driver, on_refresh=None):
+        self.driver = driver
+        self.on_refresh = on_refresh
+        self.refreshes = 0
+
+    def refresh(self):
+        self.refreshes += 1
+        self.driver.refresh()
+        if self.on_refresh:
+            self.on_refresh()
+
+
+class ElementFinderTest(unittest.TestCase):
+    def setUp(self):
+        self.driver = CountingDriver()
+        self.driver.get(FORM_URL)
+        self.stats = LookupStats()
+        del self.driver.sent[:]
+
+    def create_finder(self, retry_policy=None):
+        # 缩短轮询间隔, 超时为0的等待也会在轮询后 sleep 一次
+        return ElementFinder(self.driver, wait_strategy=PollingWait(0.01), retry_policy=retry_policy or NoRetry(),
+                             stats=self.stats)
+
+    def test_visible_element_found_in_one_poll(self):
+        ele = self.create_finder().find((By.ID, 'username'), 1)
+        self.assertEqual(ele.get_attribute('id'), 'username')
+        # presence 和 visibility 合并为一轮 find_elements + is_displayed
+        self.assertEqual(self.driver.sent[:2], ['findElements', 'isElementDisplayed'])
+        self.assertEqual(self.stats.summary()['slow_path'], 0)
+
+    def test_multiple_returns_all_matches(self):
+        elements = self.create_finder().find((By.CSS_SELECTOR, 'input'), 1, multiple=True)
+        self.assertTrue(len(elements) > 1)
+        self.assertEqual(self.driver.sent.count('findElements'), 1)
+
+    def test_no_retry_fails_after_first_wait(self):
+        with self.assertRaises(TimeoutException):
+            self.create_finder().find((By.ID, 'missing'), 0)
+        summary = self.stats.summary()
+        self.assertEqual((summary['lookups'], summary['slow_path'], summary['failures']), (1, 1, 1))
+        self.assertNotIn('refresh', self.driver.sent)
+
+    def test_backoff_retry_probes_until_budget(self):
+        policy = BackoffRetry(budget=0.5, delay=0.05, factor=2, max_delay=0.1)
+        start = time.time()
+        with self.assertRaises(TimeoutException):
+            self.create_finder(policy).find((By.ID, 'missing'), 0)
+        # 首轮之后每次退避只探测一次, 总耗时不超出预算太多
+        self.assertTrue(self.driver.sent.count('findElements') >= 3)
+        self.assertTrue(time.time() - start < 1)
+        self.assertEqual(self.stats.failures, 1)
+
+    def test_refresh_retry_finds_element_after_refresh(self):
+        def add_element():
+            form = [node for node in self.driver._root.descendants() if node.attrs.get('id') == 'user-form'][0]
+            form.content.append(Node('span', [('id', 'late')], form))
+
+        page = RefreshingPage(self.driver, add_element)
+        ele = self.create_finder(RefreshRetry(budget=5)).find((By.ID, 'late'), 0, page=page)
+        self.assertEqual(ele.get_attribute('id'), 'late')
+        self.assertEqual(page.refreshes, 1)
+        self.assertEqual((self.stats.slow_path, self.stats.failures), (1, 0))
+
+    def test_retry_policy_argument_overrides_default(self):
+        page = RefreshingPage(self.driver)
+        with self.assertRaises(TimeoutException):
+            self.create_finder().find((By.ID, 'missing'), 0, retry_policy=RefreshRetry(budget=5, retries=2),
+                                      page=page)
+        self.assertEqual(page.refreshes, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
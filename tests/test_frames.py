@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# encoding: utf-8
+import unittest
+from selenium.common.exceptions import NoSuchFrameException
+from selenium.webdriver.common.by import By
+from uitester.benchmark.fake_driver import FakeWebDriver, Node
+from uitester.page import BasePage
+
+FORM_URL = 'http://fixtures.local/form.html'
+OUTER = (By.ID, 'outer')
+INNER = (By.ID, 'inner')
+
+
+class FrameDriver(FakeWebDriver):
+    """
+    页面加载后插入 outer / inner 两个 iframe 节点, 记录frame切换和查找命令
+    FakeWebDriver 的frame切换不改变查找范围, 这里只验证切换次数和 frame_path
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(FrameDriver, self).__init__(*args, **kwargs)
+        self.sent = []
+        self.detached = set()
+
+    def _load(self, url):
+        super(FrameDriver, self)._load(url)
+        body = [node for node in self._root.descendants() if node.tag == 'body'][0]
+        body.content.extend([Node('iframe', [('id', 'outer')], body), Node('iframe', [('id', 'inner')], body)])
+
+    def execute(self, driver_command, params=None):
+        if driver_command in ('switchToFrame', 'switchToParentFrame', 'findElements'):
+            self.sent.append(driver_command)
+        if driver_command == 'switchToFrame' and params['id'] is not None and params['id'].id in self.detached:
+            raise NoSuchFrameException('frame was detached')
+        return super(FrameDriver, self).execute(driver_command, params)
+
+
+class FramePage(BasePage):
+    timing_store = None
+    default_timeout = 0
+
+
+class FramePathTest(unittest.TestCase):
+    def setUp(self):
+        self.driver = FrameDriver()
+        self.driver.get(FORM_URL)
+        self.page = FramePage(self.driver)
+
+    def test_in_frame_restores_previous_path(self):
+        with self.page.in_frame(OUTER, INNER):
+            self.assertEqual(self.page.frame_path, (OUTER, INNER))
+        self.assertEqual(self.page.frame_path, ())
+
+    def test_nested_in_frame_switches_only_the_difference(self):
+        with self.page.in_frame(OUTER):
+            del self.driver.sent[:]
+            with self.page.in_frame(OUTER, INNER):
+                pass
+            self.assertEqual(self.driver.sent, ['findElements', 'switchToFrame', 'switchToParentFrame'])
+        with self.page.in_frame(OUTER, INNER):
+            del self.driver.sent[:]
+            with self.page.in_frame(OUTER, INNER):
+                pass
+            # 已处于目标frame时不切换
+            self.assertEqual(self.driver.sent, [])
+
+    def test_deep_exit_uses_default_content(self):
+        path = [(By.ID, 'outer'), (By.ID, 'inner'), (By.ID, 'outer'), (By.ID, 'inner')]
+        self.page.switch_to_frame_path(path)
+        del self.driver.sent[:]
+        self.page.switch_to_frame_path([OUTER])
+        # 逐级 parent_frame 需要3次, 回到主文档后重新进入只需2次
+        self.assertEqual(self.driver.sent, ['switchToFrame', 'switchToFrame'])
+        self.assertEqual(self.page.frame_path, (OUTER,))
+
+    def test_frame_element_found_once(self):
+        for _ in range(3):
+            with self.page.in_frame(OUTER):
+                pass
+        self.assertEqual(self.driver.sent.count('findElements'), 1)
+
+    def test_navigation_resets_frame_path_and_frame_elements(self):
+        self.page.switch_to_frame_path([OUTER])
+        self.page.get(FORM_URL)
+        self.assertEqual(self.page.frame_path, ())
+        del self.driver.sent[:]
+        with self.page.in_frame(OUTER):
+            pass
+        self.assertEqual(self.driver.sent.count('findElements'), 1)
+
+    def test_detached_frame_element_looked_up_again(self):
+        with self.page.in_frame(OUTER):
+            pass
+        self.driver.detached.add(self.page._frame_elements[((), OUTER)].id)
+        # 模拟 frame 被重建: 旧元素切换失败, 新节点使用新的元素id
+        node = self.driver._elements.pop(self.page._frame_elements[((), OUTER)].id)
+        self.assertEqual(node.attrs['id'], 'outer')
+        del self.driver.sent[:]
+        with self.page.in_frame(OUTER):
+            self.assertEqual(self.page.frame_path, (OUTER,))
+        self.assertEqual(self.driver.sent[:3], ['switchToFrame', 'findElements', 'switchToFrame'])
+
+
+if __name__ == '__main__':
+    unittest.main()
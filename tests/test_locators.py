@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# encoding: utf-8
+import unittest
+from selenium.webdriver.common.by import By
+from uitester.page.locators import rewrite, lint
+
+# XPath -> 等价定位, 按页面级查找(从文档开始)等价
+EQUIVALENT = [
+    ('//*[@id="kw"]', (By.ID, 'kw')),
+    (".//*[@id='kw']", (By.ID, 'kw')),
+    # 位置条件对应同标签兄弟中的序号, 不是全文档第 n 个
+    ('//li[1]', (By.CSS_SELECTOR, 'li:nth-of-type(1)')),
+    ('//ul/li[last()]', (By.CSS_SELECTOR, 'ul > li:last-of-type')),
+    ('//*[2]', (By.CSS_SELECTOR, ':nth-child(2)')),
+    # XPath 的 != 要求属性存在, 只写 :not([a="x"]) 会多匹配没有该属性的元素
+    ('//input[@a!="x"]', (By.CSS_SELECTOR, 'input[a]:not([a="x"])')),
+    ('//input[not(@disabled)]', (By.CSS_SELECTOR, 'input:not([disabled])')),
+    ('//input[contains(@a, "")]', (By.CSS_SELECTOR, 'input[a]')),
+    ('//input[starts-with(@name, "us")]', (By.CSS_SELECTOR, 'input[name^="us"]')),
+    ('//form//input[@name="u" and @type="text"]', (By.CSS_SELECTOR, 'form input[name="u"][type="text"]')),
+    ("//div[contains(concat(' ', normalize-space(@class), ' '), ' row ')]", (By.CSS_SELECTOR, 'div.row')),
+    ('//a[@title=\'say "hi"\']', (By.CSS_SELECTOR, 'a[title="say \\"hi\\""]')),
+    ('/html/body', (By.CSS_SELECTOR, 'html:root > body')),
+]
+
+# 无法等价改写的写法
+UNSUPPORTED = [
+    '//li[@class="a"][1]',
+    "//a[text()='x']",
+    '//a | //b',
+    '//div/following-sibling::p',
+    '/body',
+    '//input[not(@a and @b)]',
+]
+
+
+class RewriteTest(unittest.TestCase):
+    def test_equivalent_rewrites(self):
+        for xpath, expected in EQUIVALENT:
+            self.assertEqual(rewrite((By.XPATH, xpath)), expected, xpath)
+
+    def test_unsupported_xpath_not_rewritten(self):
+        for xpath in UNSUPPORTED:
+            self.assertIsNone(rewrite((By.XPATH, xpath)), xpath)
+
+    def test_non_xpath_not_rewritten(self):
+        self.assertIsNone(rewrite((By.CSS_SELECTOR, '#kw')))
+
+
+class LintTest(unittest.TestCase):
+    def test_issues(self):
+        self.assertEqual(lint((By.XPATH, '//*[2]')), ['wildcard', 'rewrite'])
+        self.assertEqual(lint((By.XPATH, "//a[text()='x']")), ['text'])
+        self.assertEqual(lint((By.XPATH, '/html/body')), ['absolute', 'rewrite'])
+        self.assertIn('deep', lint((By.XPATH, '//a/b/c/d/e/f/g/h')))
+        self.assertEqual(lint((By.ID, 'kw')), [])
+
+    def test_id_predicate_is_not_wildcard(self):
+        self.assertEqual(lint((By.XPATH, '//*[@id="kw"]')), ['rewrite'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# encoding: utf-8
+import unittest
+from collections import OrderedDict
+from selenium.common.exceptions import NoSuchWindowException
+from uitester.page import BasePage
+from uitester.page.tabs import TabManager
+
+TWO_TABS = OrderedDict([('a', 'http://a'), ('b', 'http://b')])
+
+
+class StubSwitchTo(object):
+    def __init__(self, driver):
+        self.driver = driver
+
+    def window(self, handle):
+        self.driver.calls.append(('switch', handle))
+        if handle not in self.driver.handles:
+            raise NoSuchWindowException('no such window: {}'.format(handle))
+        self.driver.current = handle
+
+
+class StubDriver(object):
+    """
+    记录窗口相关命令的 driver, cdp=False 时只能通过 window.open 新建标签页
+    :param prefix: 窗口句柄相对 targetId 的前缀, 旧版 chromedriver 为 'CDwindow-'
+    """
+
+    def __init__(self, cdp=True, prefix=''):
+        self.cdp = cdp
+        self.prefix = prefix
+        self.handles = ['main-handle']
+        self.current = 'main-handle'
+        self.calls = []
+        self.switch_to = StubSwitchTo(self)
+        self._targets = 0
+
+    @property
+    def current_window_handle(self):
+        self.calls.append(('current',))
+        return self.current
+
+    @property
+    def window_handles(self):
+        return list(self.handles)
+
+    def _new_target(self):
+        self._targets += 1
+        target = 'target-{}'.format(self._targets)
+        self.handles.append(self.prefix + target)
+        return target
+
+    def execute_cdp_cmd(self, cmd, params):
+        if not self.cdp:
+            raise Exception('not a chromium driver')
+        self.calls.append(('cdp', cmd))
+        if cmd == 'Target.createTarget':
+            return {'targetId': self._new_target()}
+        if cmd == 'Target.closeTarget':
+            self.handles.remove(self.prefix + params['targetId'])
+        return {}
+
+    def execute_script(self, script, *args):
+        self.calls.append(('script', args[0]))
+        self._new_target()
+
+    def close(self):
+        self.calls.append(('close', self.current))
+        self.handles.remove(self.current)
+
+
+class TabManagerTest(unittest.TestCase):
+    def setUp(self):
+        self.driver = StubDriver()
+        self.tabs = TabManager(self.driver)
+
+    def switches(self):
+        return [call[1] for call in self.driver.calls if call[0] == 'switch']
+
+    def test_open_does_not_switch(self):
+        names = self.tabs.open(TWO_TABS)
+        self.assertEqual(names, ['a', 'b'])
+        self.assertEqual(self.switches(), [])
+        self.assertEqual(self.tabs.handles, {'main': 'main-handle', 'a': 'target-1', 'b': 'target-2'})
+
+    def test_open_matches_prefixed_handles(self):
+        self.driver = StubDriver(prefix='CDwindow-')
+        self.tabs = TabManager(self.driver)
+        self.tabs.open(['http://a'])
+        self.assertEqual(self.tabs.handles['http://a'], 'CDwindow-target-1')
+
+    def test_open_falls_back_to_window_open(self):
+        self.driver = StubDriver(cdp=False)
+        self.tabs = TabManager(self.driver)
+        self.tabs.open(TWO_TABS)
+        self.assertEqual([call for call in self.driver.calls if call[0] == 'script'],
+                         [('script', 'http://a'), ('script', 'http://b')])
+        self.assertEqual((self.tabs.handles['a'], self.tabs.handles['b']), ('target-1', 'target-2'))
+
+    def test_switch_skips_current_tab(self):
+        self.tabs.open({'a': 'http://a'})
+        self.tabs.switch('a')
+        self.tabs.switch('a')
+        self.tabs.switch('main')
+        self.tabs.switch('main')
+        self.assertEqual(self.switches(), ['target-1', 'main-handle'])
+
+    def test_invalidate_forces_next_switch(self):
+        self.tabs.open({'a': 'http://a'})
+        self.tabs.switch('a')
+        # 在 TabManager 之外切回了主窗口
+        self.driver.switch_to.window('main-handle')
+        self.tabs.invalidate()
+        self.tabs.switch('a')
+        self.assertEqual(self.switches(), ['target-1', 'main-handle', 'target-1'])
+        self.assertEqual(self.driver.current, 'target-1')
+
+    def test_for_each_tab_retries_after_window_error(self):
+        self.tabs.open(TWO_TABS)
+        failures = ['a']
+
+        def read(name):
+            if name in failures:
+                failures.remove(name)
+                raise NoSuchWindowException('window switched elsewhere')
+            return self.driver.current
+
+        results = self.tabs.for_each_tab(read, wait=False)
+        self.assertEqual(list(results.items()), [('a', 'target-1'), ('b', 'target-2')])
+        self.assertEqual(self.switches(), ['target-1', 'target-1', 'target-2'])
+
+    def test_close_uses_cdp_for_background_tabs(self):
+        self.tabs.open(TWO_TABS)
+        self.tabs.switch('a')
+        self.tabs.close()
+        self.assertEqual(self.driver.handles, ['main-handle'])
+        self.assertIn(('close', 'target-1'), self.driver.calls)
+        self.assertIn(('cdp', 'Target.closeTarget'), self.driver.calls)
+        self.assertEqual(self.driver.current, 'main-handle')
+        self.assertEqual(list(self.tabs.handles), ['main'])
+
+    def test_page_close_invalidates_current(self):
+        tabs = TabManager.of(self.driver)
+        tabs.open({'a': 'http://a'})
+        tabs.switch('a')
+        BasePage(self.driver).close()
+        self.assertIsNone(tabs.current)
+        self.driver.handles.append('target-1')
+        tabs.switch('a')
+        self.assertEqual(self.switches(), ['target-1', 'target-1'])
+
+    def test_of_returns_one_manager_per_driver(self):
+        self.assertIs(TabManager.of(self.driver), TabManager.of(self.driver))
+        self.assertIsNot(TabManager.of(self.driver), TabManager.of(StubDriver()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# encoding: utf-8
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from selenium.common.exceptions import TimeoutException
+from uitester.common.timing_store import TimingStore, percentile
+from uitester.page.finder import ElementFinder, LookupStats
+
+LOC = ('id', 'grid')
+
+
+class ListPage(object):
+    pass
+
+
+class MissingWait(object):
+    # 首轮等待立即超时的等待策略
+    def until(self, driver, loc, timeout, multiple=False):
+        raise TimeoutException('timed out')
+
+
+class StubDriver(object):
+    def implicitly_wait(self, seconds):
+        pass
+
+
+class TimingStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='uitester-test-')
+        self.path = os.path.join(self.directory, 'timings.json')
+        self.stores = []
+
+    def tearDown(self):
+        # 未保存的样本会在进程退出时写入, 删除目录前先保存
+        for store in self.stores:
+            store.save()
+        shutil.rmtree(self.directory, True)
+
+    def create_store(self, **kwargs):
+        store = TimingStore(path=self.path, **kwargs)
+        self.stores.append(store)
+        return store
+
+    def seed(self, samples):
+        store = self.create_store()
+        for elapsed in samples:
+            store.record(ListPage, LOC, elapsed)
+        store.save()
+
+    def test_percentile_nearest_rank(self):
+        self.assertEqual(percentile([3, 1, 2, 4], 50), 2)
+        self.assertEqual(percentile([3, 1, 2, 4], 99), 4)
+        self.assertIsNone(percentile([], 50))
+
+    def test_default_until_enough_samples(self):
+        self.seed([0.1] * 4)
+        self.assertEqual(self.create_store().timeout(ListPage, LOC, 10), 10)
+
+    def test_timeout_from_history_within_bounds(self):
+        self.seed([0.5] * 5 + [1.0])
+        self.assertEqual(self.create_store().timeout(ListPage, LOC, 10), 3.0)
+        self.assertEqual(self.create_store(floor=5).timeout(ListPage, LOC, 10), 5)
+        self.assertEqual(self.create_store(ceiling=2).timeout(ListPage, LOC, 10), 2)
+
+    def test_timeout_fixed_within_a_run(self):
+        self.seed([0.5] * 5)
+        store = self.create_store(floor=0)
+        self.assertEqual(store.timeout(ListPage, LOC, 10), 1.5)
+        store.record(ListPage, LOC, 5)
+        self.assertEqual(store.timeout(ListPage, LOC, 10), 1.5)
+
+    def test_missed_lookup_falls_back_to_default_in_same_run(self):
+        self.seed([0.5] * 5)
+        store = self.create_store(floor=0)
+        self.assertEqual(store.timeout(ListPage, LOC, 10), 1.5)
+        store.record(ListPage, LOC, 1.5, missed=True)
+        self.assertEqual(store.timeout(ListPage, LOC, 10), 10)
+
+    def test_censored_samples_raise_next_run_timeout(self):
+        self.seed([0.5] * 5)
+        store = self.create_store(floor=0)
+        for _ in range(3):
+            store.record(ListPage, LOC, 1.5, missed=True)
+        store.save()
+        # 删失样本按所用超时计入, 下次运行的 p99 为 1.5s
+        self.assertEqual(self.create_store(floor=0).timeout(ListPage, LOC, 10), 4.5)
+        with open(self.path) as f:
+            runs = json.load(f)['locators'][TimingStore.key(ListPage, LOC)]['runs']
+        self.assertEqual(runs[-1]['missed'], 3)
+
+    def test_regressions_report_slower_and_missed(self):
+        self.seed([0.2] * 5)
+        store = self.create_store()
+        store.record(ListPage, LOC, 2.0)
+        store.record(ListPage, ('id', 'other'), 0.1, missed=True)
+        self.assertEqual([item['key'] for item in store.regressions()], [TimingStore.key(ListPage, LOC)])
+        store.record(ListPage, LOC, 1.0, missed=True)
+        self.assertEqual(store.regressions()[0]['missed'], 1)
+
+    def test_save_merges_with_other_writers(self):
+        first, second = self.create_store(), self.create_store()
+        first.record(ListPage, LOC, 0.1)
+        second.record(ListPage, ('id', 'other'), 0.2)
+        first.save()
+        second.save()
+        with open(self.path) as f:
+            locators = json.load(f)['locators']
+        self.assertEqual(sorted(locators), sorted([TimingStore.key(ListPage, LOC),
+                                                   TimingStore.key(ListPage, ('id', 'other'))]))
+
+    def test_finder_records_first_round_miss_as_censored(self):
+        store = self.create_store()
+        finder = ElementFinder(StubDriver(), wait_strategy=MissingWait(), stats=LookupStats(), timings=store)
+        with self.assertRaises(TimeoutException):
+            finder.find(LOC, 2, page=ListPage())
+        store.save()
+        with open(self.path) as f:
+            entry = json.load(f)['locators'][TimingStore.key(ListPage, LOC)]
+        # 立即超时也按所用超时记录
+        self.assertEqual(entry['samples'], [2])
+        self.assertEqual(entry['runs'][-1]['missed'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()